@@ -0,0 +1,540 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Hashable, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+# Number of MinHash permutations per signature
+DEFAULT_NUM_PERM = 128
+
+# Number of consecutive words per shingle
+DEFAULT_SHINGLE_SIZE = 5
+
+# Estimated Jaccard similarity above which two posts count as near-duplicates
+DEFAULT_THRESHOLD = 0.8
+
+# Largest number of 64-bit values hashed at once when computing a batch of signatures (32 MiB)
+_MAX_BATCH_ELEMENTS = 2 ** 22
+
+# Multipliers used to combine word hashes into shingle hashes and rows into band hashes
+_SHINGLE_PRIME = np.uint64(1099511628211)
+_BAND_PRIME = np.uint64(14029467366897019727)
+
+_EMPTY = np.iinfo(np.uint32).max
+
+
+@lru_cache(maxsize=2 ** 20)
+def _word_hash(word: str) -> int:
+    """
+    Hash a word to 64 bits, identically in every process (unlike hash()).
+
+    Args:
+        word (str): The word
+
+    Returns:
+        int: Unsigned 64-bit hash
+    """
+    return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def lsh_bands(num_perm: int, threshold: float, false_negative_weight: float = 0.7) -> int:
+    """
+    Choose the number of LSH bands for a similarity threshold.
+
+    Two signatures split into b bands of r rows share at least one band
+    with probability 1 - (1 - s^r)^b, an S-curve in the similarity s. The
+    band count is chosen to minimize the weighted area under the curve
+    below the threshold (false positives) plus the area above the curve
+    beyond the threshold (false negatives). Missed duplicates weigh more
+    by default: MinHashIndex verifies candidates, so false positives only
+    cost a comparison there.
+
+    Args:
+        num_perm (int): Signature length
+        threshold (float): Target similarity threshold
+        false_negative_weight (float): Weight of false negatives between 0 and 1 (default: 0.7)
+
+    Returns:
+        int: Number of bands (a divisor of num_perm)
+    """
+    similarities = np.linspace(0, 1, 201)
+    below = similarities < threshold
+
+    def error(bands: int) -> float:
+        collision = 1 - (1 - similarities ** (num_perm // bands)) ** bands
+        return float((1 - false_negative_weight) * np.sum(collision[below])
+                     + false_negative_weight * np.sum(1 - collision[~below]))
+
+    return min((bands for bands in range(1, num_perm + 1) if num_perm % bands == 0), key=error)
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of normalized text.
+
+    A text is represented by the set of its word shingles (runs of
+    shingle_size consecutive words). The fraction of equal values in two
+    signatures estimates the Jaccard similarity of the shingle sets, so
+    reposts, spam templates and bot posts with small edits get similar
+    signatures. The permutations are multiply-shift hashes applied with
+    NumPy to all shingles of a batch of texts at once.
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_size: int = DEFAULT_SHINGLE_SIZE, seed: int = 1):
+        """
+        Initialize the hash functions.
+
+        Args:
+            num_perm (int): Number of permutations, i.e. signature length (default: 128)
+            shingle_size (int): Number of words per shingle (default: 5)
+            seed (int): Seed of the permutations; signatures are only comparable
+                        between hashers with the same seed (default: 1)
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        random = np.random.default_rng(seed)
+        # Odd multipliers make (a * x + b) mod 2^64 a permutation of 64-bit values
+        self._a = random.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = random.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """
+        Hash the distinct word shingles of a text.
+
+        Texts shorter than a shingle form a single shingle.
+
+        Args:
+            text (str): Normalized text
+
+        Returns:
+            np.ndarray: Distinct 64-bit shingle hashes (empty for an empty text)
+        """
+        words = text.split()
+        if not words:
+            return np.empty(0, dtype=np.uint64)
+
+        word_hashes = np.fromiter((_word_hash(word) for word in words), dtype=np.uint64, count=len(words))
+        size = min(self.shingle_size, len(words))
+        count = len(words) - size + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            # Polynomial hash of the words in each window; arithmetic wraps around modulo 2^64
+            shingles = shingles * _SHINGLE_PRIME + word_hashes[offset:offset + count]
+        return np.unique(shingles)
+
+    def signatures(self, texts: list[str]) -> np.ndarray:
+        """
+        Compute the signatures of a batch of texts.
+
+        Args:
+            texts (list[str]): Normalized texts
+
+        Returns:
+            np.ndarray: Array of shape (len(texts), num_perm) of uint32 minimums;
+                        empty texts get a signature that matches nothing but other empty texts
+        """
+        signatures = np.full((len(texts), self.num_perm), _EMPTY, dtype=np.uint32)
+        shingles = [self.shingle_hashes(text) for text in texts]
+        lengths = np.array([len(hashes) for hashes in shingles], dtype=np.int64)
+        rows = np.flatnonzero(lengths)
+        if rows.size == 0:
+            return signatures
+
+        values = np.concatenate([shingles[row] for row in rows])
+        offsets = np.concatenate(([0], np.cumsum(lengths[rows])[:-1]))
+
+        # Hash every shingle of the batch with a block of permutations at a time, bounding memory
+        block = max(1, _MAX_BATCH_ELEMENTS // len(values))
+        for start in range(0, self.num_perm, block):
+            a = self._a[start:start + block, None]
+            b = self._b[start:start + block, None]
+            hashed = (a * values[None, :] + b) >> np.uint64(32)
+            signatures[rows, start:start + block] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        return signatures
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the signature of a single text.
+
+        Args:
+            text (str): Normalized text
+
+        Returns:
+            np.ndarray: uint32 signature of length num_perm
+        """
+        return self.signatures([text])[0]
+
+
+def band_hashes(signatures: np.ndarray, bands: int) -> np.ndarray:
+    """
+    Hash each band of rows of the signatures to a single value.
+
+    Args:
+        signatures (np.ndarray): Signatures of shape (n, num_perm)
+        bands (int): Number of bands; must divide num_perm
+
+    Returns:
+        np.ndarray: uint64 array of shape (n, bands)
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    banded = signatures.reshape(n, bands, rows).astype(np.uint64)
+    hashes = np.zeros((n, bands), dtype=np.uint64)
+    for row in range(rows):
+        hashes = hashes * _BAND_PRIME + banded[:, :, row]
+    return hashes
+
+
+def estimated_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """
+    Estimate the Jaccard similarity of two texts from their signatures.
+
+    Args:
+        first (np.ndarray): Signature of the first text
+        second (np.ndarray): Signature of the second text
+
+    Returns:
+        float: Fraction of equal signature values
+    """
+    return float(np.mean(first == second))
+
+
+def _connected_components(size: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """
+    Union-find over index pairs, vectorized with NumPy.
+
+    Args:
+        size (int): Number of elements
+        first (np.ndarray): First element of each linked pair
+        second (np.ndarray): Second element of each linked pair
+
+    Returns:
+        np.ndarray: For each element, the smallest index in its component
+    """
+    parent = np.arange(size)
+    while True:
+        low = np.minimum(parent[first], parent[second])
+        np.minimum.at(parent, parent[first], low)
+        np.minimum.at(parent, parent[second], low)
+        # Path compression: point every element at its root
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        if np.array_equal(parent[first], parent[second]):
+            return parent
+
+
+def cluster_duplicates(texts: Iterable[str], threshold: float = DEFAULT_THRESHOLD,
+                       hasher: Optional[MinHasher] = None, batch_size: int = 10_000) -> np.ndarray:
+    """
+    Group near-duplicate texts into clusters.
+
+    Signatures are computed in batches and only their band hashes are
+    kept (bands * 8 bytes per text). Texts sharing a band hash in any band
+    are linked, and the links are resolved into clusters with a vectorized
+    union-find, so millions of posts fit in memory and no pair of posts is
+    ever compared directly.
+
+    Args:
+        texts (Iterable[str]): Normalized texts
+        threshold (float): Similarity around which texts start to be clustered together (default: 0.8)
+        hasher (Optional[MinHasher]): Signature hasher (default: a new MinHasher)
+        batch_size (int): Number of texts hashed at once (default: 10,000)
+
+    Returns:
+        np.ndarray: For each text, its cluster ID, which is the index of the first text of its cluster.
+                    Texts with a cluster ID equal to their own index are the ones to keep.
+    """
+    hasher = hasher or MinHasher()
+    bands = lsh_bands(hasher.num_perm, threshold)
+
+    chunks, batch = [], []
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= batch_size:
+            chunks.append(band_hashes(hasher.signatures(batch), bands))
+            batch = []
+    if batch:
+        chunks.append(band_hashes(hasher.signatures(batch), bands))
+    if not chunks:
+        return np.empty(0, dtype=np.int64)
+    hashes = np.concatenate(chunks)
+
+    # In each band, link every text to the first text with the same band hash
+    firsts, seconds = [], []
+    for band in range(bands):
+        order = np.argsort(hashes[:, band], kind='stable')
+        values = hashes[order, band]
+        starts = np.concatenate(([True], values[1:] != values[:-1]))
+        group_first = order[starts][np.cumsum(starts) - 1]
+        linked = order != group_first
+        firsts.append(order[linked])
+        seconds.append(group_first[linked])
+
+    return _connected_components(len(hashes), np.concatenate(firsts), np.concatenate(seconds))
+
+
+class MinHashIndex:
+    """
+    Online near-duplicate index for a stream of texts.
+
+    Signatures are bucketed by band hash; a query only compares the
+    signatures that share a bucket with it, and confirms a match when the
+    estimated similarity reaches the threshold. With a capacity the index
+    keeps the most recently added texts, which bounds memory in a bot that
+    runs indefinitely.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, hasher: Optional[MinHasher] = None,
+                 capacity: Optional[int] = None):
+        """
+        Create an empty index.
+
+        Args:
+            threshold (float): Minimum estimated similarity of a match (default: 0.8)
+            hasher (Optional[MinHasher]): Signature hasher (default: a new MinHasher)
+            capacity (Optional[int]): Maximum number of texts kept; the oldest are evicted
+                                      first (default: None, unbounded)
+        """
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        self.bands = lsh_bands(self.hasher.num_perm, threshold)
+        self.capacity = capacity
+        # key -> (signature, band hashes), oldest first
+        self._entries: OrderedDict[Hashable, tuple[np.ndarray, tuple[int, ...]]] = OrderedDict()
+        self._buckets: list[dict[int, list[Hashable]]] = [{} for _ in range(self.bands)]
+        # The bot queries from the event loop and may add from worker threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _as_signature(self, text_or_signature: Union[str, np.ndarray]) -> np.ndarray:
+        if isinstance(text_or_signature, str):
+            return self.hasher.signature(text_or_signature)
+        return text_or_signature
+
+    def _query(self, signature: np.ndarray, hashes: tuple[int, ...]) -> Optional[Hashable]:
+        """
+        Find the most similar indexed text above the threshold. The lock must be held.
+        """
+        best_key, best_similarity = None, self.threshold
+        checked = set()
+        for bucket, band_hash in zip(self._buckets, hashes):
+            for key in bucket.get(band_hash, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                similarity = estimated_similarity(signature, self._entries[key][0])
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+        return best_key
+
+    def _add(self, key: Hashable, signature: np.ndarray, hashes: tuple[int, ...]):
+        """
+        Index a signature, evicting the oldest entry when full. The lock must be held.
+        """
+        if key in self._entries:
+            return
+        self._entries[key] = (signature, hashes)
+        for bucket, band_hash in zip(self._buckets, hashes):
+            bucket.setdefault(band_hash, []).append(key)
+
+        if self.capacity is not None and len(self._entries) > self.capacity:
+            oldest, (_, oldest_hashes) = self._entries.popitem(last=False)
+            for bucket, band_hash in zip(self._buckets, oldest_hashes):
+                keys = bucket[band_hash]
+                keys.remove(oldest)
+                if not keys:
+                    del bucket[band_hash]
+
+    def query(self, text_or_signature: Union[str, np.ndarray]) -> Optional[Hashable]:
+        """
+        Find an indexed near-duplicate of a text.
+
+        Args:
+            text_or_signature (Union[str, np.ndarray]): Normalized text, or its signature
+
+        Returns:
+            Optional[Hashable]: Key of the most similar indexed text, or None
+        """
+        signature = self._as_signature(text_or_signature)
+        hashes = tuple(band_hashes(signature[None, :], self.bands)[0].tolist())
+        with self._lock:
+            return self._query(signature, hashes)
+
+    def add(self, key: Hashable, text_or_signature: Union[str, np.ndarray]):
+        """
+        Index a text.
+
+        Args:
+            key (Hashable): Key returned by later queries, e.g. a submission ID
+            text_or_signature (Union[str, np.ndarray]): Normalized text, or its signature
+        """
+        signature = self._as_signature(text_or_signature)
+        hashes = tuple(band_hashes(signature[None, :], self.bands)[0].tolist())
+        with self._lock:
+            self._add(key, signature, hashes)
+
+    def query_or_add(self, key: Hashable, text_or_signature: Union[str, np.ndarray]) -> Optional[Hashable]:
+        """
+        Find a near-duplicate of a text, and index the text if there is none.
+
+        Args:
+            key (Hashable): Key of the text, e.g. a submission ID
+            text_or_signature (Union[str, np.ndarray]): Normalized text, or its signature
+
+        Returns:
+            Optional[Hashable]: Key of the earlier near-duplicate, or None if the text is new
+        """
+        signature = self._as_signature(text_or_signature)
+        hashes = tuple(band_hashes(signature[None, :], self.bands)[0].tolist())
+        with self._lock:
+            match = self._query(signature, hashes)
+            if match is None:
+                self._add(key, signature, hashes)
+            elif self.capacity is not None:
+                # A post that keeps being reposted stays in the index
+                self._entries.move_to_end(match)
+            return match
+
+
+def deduplicate(texts: Iterable[str], threshold: float = DEFAULT_THRESHOLD, hasher: Optional[MinHasher] = None,
+                batch_size: int = 1000, index: Optional[MinHashIndex] = None) -> Iterator[str]:
+    """
+    Drop near-duplicates from a stream of texts, keeping the first of each group.
+
+    Signatures are computed in vectorized batches, then checked against an
+    online index in stream order.
+
+    Args:
+        texts (Iterable[str]): Normalized texts
+        threshold (float): Minimum estimated similarity of a duplicate (default: 0.8)
+        hasher (Optional[MinHasher]): Signature hasher (default: a new MinHasher)
+        batch_size (int): Number of texts hashed at once (default: 1000)
+        index (Optional[MinHashIndex]): Index to use, e.g. to inspect it afterwards (default: a new index)
+
+    Returns:
+        generator: Yields the texts that are not near-duplicates of an earlier text
+
+    Note:
+        Memory grows with the number of distinct texts (about 1 KB each);
+        use cluster_duplicates() for very large corpora.
+    """
+    index = index or MinHashIndex(threshold, hasher)
+    position = 0
+    batch = []
+
+    def flush():
+        nonlocal position
+        for text, signature in zip(batch, index.hasher.signatures(batch)):
+            if index.query_or_add(position, signature) is None:
+                yield text
+            position += 1
+        batch.clear()
+
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= batch_size:
+            yield from flush()
+    yield from flush()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the deduplication report.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Find near-duplicate submissions in dumps with MinHash LSH.")
+    parser.add_argument("files", nargs="*", help="Dumps to deduplicate (default: every dump in analysis/resources)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Similarity above which posts are near-duplicates (default: 0.8)")
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM,
+                        help="Number of MinHash permutations (default: 128)")
+    parser.add_argument("--shingle-size", type=int, default=DEFAULT_SHINGLE_SIZE,
+                        help="Number of words per shingle (default: 5)")
+    parser.add_argument("--top", type=int, default=10, help="Number of largest clusters to show (default: 10)")
+    parser.add_argument("--output", help="Write each submission's id, subreddit and cluster as NDJSON to this file")
+    return parser.parse_args(argv)
+
+
+def _preview_texts(file_paths: Optional[list[str]], positions: set[int]) -> dict[int, str]:
+    """
+    Read the normalized texts of a few submissions back from the dumps.
+
+    Args:
+        file_paths (Optional[list[str]]): Dumps that were clustered (default: all bundled dumps)
+        positions (set[int]): Positions of the submissions in the clustering order
+
+    Returns:
+        dict[int, str]: Position -> normalized text
+    """
+    from fact_fetch.analysis.sharded_loader import load_submissions_parallel
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    # Only the previewed posts are normalized; the pass stops after the last of them
+    normalizer = RedditTextNormalizer()
+    texts = {}
+    last = max(positions, default=-1)
+    submissions = load_submissions_parallel(file_paths, fields=['id', 'title', 'selftext'], normalize=False)
+    for position, submission in enumerate(submissions):
+        if position > last:
+            break
+        if position in positions:
+            texts[position] = normalizer.normalize_text(
+                (submission.get('title') or "") + " " + (submission.get('selftext') or ""))
+    return texts
+
+
+def main(argv=None):
+    """
+    Cluster the submissions of dumps and report the largest groups of near-duplicates.
+    """
+    from fact_fetch.analysis.sharded_loader import load_submissions_parallel
+
+    args = parse_args(argv)
+
+    # Only the ids and subreddits are kept; the texts are hashed as they stream in
+    ids, subreddits = [], []
+
+    def texts():
+        for submission in load_submissions_parallel(args.files or None, fields=['id']):
+            ids.append(submission['id'])
+            subreddits.append(submission['subreddit'])
+            yield submission['normalized_text']
+
+    started = time.perf_counter()
+    clusters = cluster_duplicates(texts(), args.threshold, MinHasher(args.num_perm, args.shingle_size))
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            for submission_id, subreddit, cluster in zip(ids, subreddits, clusters.tolist()):
+                file.write(json.dumps({'id': submission_id, 'subreddit': subreddit,
+                                       'cluster': ids[cluster]}) + "\n")
+
+    cluster_ids, sizes = np.unique(clusters, return_counts=True)
+    duplicates = len(clusters) - len(cluster_ids)
+    print(f"{len(clusters)} submissions in {len(cluster_ids)} clusters; {duplicates} near-duplicates "
+          f"({duplicates / max(len(clusters), 1):.1%}) found in {elapsed:.1f}s")
+
+    top = [order for order in np.argsort(-sizes, kind='stable')[:args.top] if sizes[order] >= 2]
+    previews = _preview_texts(args.files or None, {int(cluster_ids[order]) for order in top})
+    for order in top:
+        print(f"{sizes[order]:>6}  {ids[cluster_ids[order]]}  {previews.get(int(cluster_ids[order]), '')[:100]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+from scipy import sparse
+
+from fact_fetch.analysis.json_data_loader import load_json_fields, parse_json_fields
+from fact_fetch.analysis.sharded_loader import DEFAULT_SHARD_SIZE, find_submission_dumps, iter_shard_tasks
+from fact_fetch.utils.parallel import bounded_map
+from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+# Ways of scoring how distinctive a term is for a subreddit
+METHODS = ('log-odds', 'chi2')
+
+# Per-process normalizer and tokenizer, created lazily inside each worker
+_normalizer: Optional[RedditTextNormalizer] = None
+_analyzer = None
+
+
+class TermCounts(NamedTuple):
+    """
+    Term counts of several subreddits over a shared vocabulary.
+
+    Attributes:
+        subreddits (list[str]): Subreddit of each row
+        vocabulary (list[str]): Term of each column
+        counts (sparse.csr_matrix): Occurrences of each term in each subreddit
+        documents (np.ndarray): Number of submissions read per subreddit
+    """
+    subreddits: list[str]
+    vocabulary: list[str]
+    counts: sparse.csr_matrix
+    documents: np.ndarray
+
+
+class TermScore(NamedTuple):
+    """
+    How distinctive a term is for one subreddit.
+
+    Attributes:
+        term (str): The term
+        score (float): z-score of the log-odds ratio, or signed chi-square statistic
+        count (int): Occurrences of the term in the subreddit
+    """
+    term: str
+    score: float
+    count: int
+
+
+def _count_shard(task: tuple) -> tuple[str, Counter, int]:
+    """
+    Count the terms of one byte range or line chunk of a dump inside a worker process.
+
+    Args:
+        task (tuple): Shard task from iter_shard_tasks()
+
+    Returns:
+        tuple: (subreddit, term counts, number of submissions)
+    """
+    global _normalizer, _analyzer
+
+    source, subreddit, start, end, fields, _ = task
+    if _normalizer is None:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        _normalizer = RedditTextNormalizer()
+        # Tokenize like the keyword extraction, without English stop words
+        _analyzer = TfidfVectorizer(stop_words='english').build_analyzer()
+
+    if isinstance(source, bytes):
+        records = parse_json_fields(source.split(b'\n'), fields, subreddit)
+    else:
+        records = load_json_fields(source, fields, start, end)
+
+    counts = Counter()
+    documents = 0
+    for record in records:
+        text = _normalizer.normalize_text((record.get('title') or "") + " " + (record.get('selftext') or ""))
+        counts.update(_analyzer(text))
+        documents += 1
+    return subreddit, counts, documents
+
+
+def count_terms(file_paths: Optional[list[str]] = None, min_count: int = 5, max_workers: Optional[int] = None,
+                shard_size: int = DEFAULT_SHARD_SIZE) -> TermCounts:
+    """
+    Count the terms of every subreddit in a single parallel pass over the dumps.
+
+    Each worker counts the terms of one shard into its own table. The
+    tables are merged per subreddit, and the merged counts are then
+    arranged into a sparse subreddit-by-term matrix over the shared
+    vocabulary.
+
+    Args:
+        file_paths (Optional[list[str]]): Dumps to read (default: all bundled dumps)
+        min_count (int): Terms with fewer occurrences across all subreddits are dropped (default: 5)
+        max_workers (Optional[int]): Number of worker processes (default: number of CPUs)
+        shard_size (int): Approximate size of each shard in bytes (default: 64 MiB)
+
+    Returns:
+        TermCounts: Subreddits, vocabulary and count matrix
+    """
+    if file_paths is None:
+        file_paths = find_submission_dumps()
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File {file_path} does not exist")
+
+    tables: dict[str, Counter] = {}
+    documents: Counter = Counter()
+    tasks = iter_shard_tasks(file_paths, ['title', 'selftext'], True, shard_size)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for subreddit, counts, shard_documents in bounded_map(executor, _count_shard, tasks, 2 * max_workers,
+                                                              ordered=False):
+            if subreddit in tables:
+                tables[subreddit].update(counts)
+            else:
+                tables[subreddit] = counts
+            documents[subreddit] += shard_documents
+
+    subreddits = sorted(tables)
+    totals = Counter()
+    for counts in tables.values():
+        totals.update(counts)
+    vocabulary = sorted(term for term, count in totals.items() if count >= min_count)
+    index = {term: column for column, term in enumerate(vocabulary)}
+
+    rows, columns, values = [], [], []
+    for row, subreddit in enumerate(subreddits):
+        for term, count in tables[subreddit].items():
+            column = index.get(term)
+            if column is not None:
+                rows.append(row)
+                columns.append(column)
+                values.append(count)
+
+    matrix = sparse.csr_matrix((np.array(values, dtype=np.int64), (rows, columns)),
+                               shape=(len(subreddits), len(vocabulary)))
+    return TermCounts(subreddits, vocabulary, matrix,
+                      np.array([documents[subreddit] for subreddit in subreddits], dtype=np.int64))
+
+
+def log_odds_scores(counts: sparse.csr_matrix, prior_strength: Optional[float] = None) -> np.ndarray:
+    """
+    Score each term for each row against all other rows.
+
+    Computes the log-odds ratio with an informative Dirichlet prior (Monroe,
+    Colaresi and Quinn, 2008): the prior is the pooled term distribution,
+    which shrinks the estimates of rare terms towards zero, and the ratio
+    is divided by its estimated standard deviation.
+
+    Args:
+        counts (sparse.csr_matrix): Row-by-term counts
+        prior_strength (Optional[float]): Total pseudo-count of the prior
+                                          (default: the number of tokens in the corpus)
+
+    Returns:
+        np.ndarray: Dense array of z-scores with the shape of counts; positive
+                    scores mark terms over-represented in the row
+    """
+    totals = np.asarray(counts.sum(axis=0), dtype=np.float64).ravel()
+    prior_strength = prior_strength if prior_strength is not None else totals.sum()
+    alpha = prior_strength * totals / totals.sum()
+
+    scores = np.zeros(counts.shape, dtype=np.float64)
+    for row in range(counts.shape[0]):
+        inside = counts[row].toarray().ravel().astype(np.float64)
+        outside = totals - inside
+        inside_total, outside_total = inside.sum(), outside.sum()
+
+        delta = (np.log((inside + alpha) / (inside_total + prior_strength - inside - alpha))
+                 - np.log((outside + alpha) / (outside_total + prior_strength - outside - alpha)))
+        variance = 1 / (inside + alpha) + 1 / (outside + alpha)
+        scores[row] = delta / np.sqrt(variance)
+    return scores
+
+
+def chi_square_scores(counts: sparse.csr_matrix) -> np.ndarray:
+    """
+    Score each term for each row against all other rows with a chi-square test.
+
+    Each term gets a 2x2 contingency table (term or other term, this row or
+    the others). The statistic is signed: negative for terms that are
+    under-represented in the row.
+
+    Args:
+        counts (sparse.csr_matrix): Row-by-term counts
+
+    Returns:
+        np.ndarray: Dense array of signed chi-square statistics with the shape of counts
+    """
+    totals = np.asarray(counts.sum(axis=0), dtype=np.float64).ravel()
+    corpus_total = totals.sum()
+
+    scores = np.zeros(counts.shape, dtype=np.float64)
+    for row in range(counts.shape[0]):
+        a = counts[row].toarray().ravel().astype(np.float64)
+        row_total = a.sum()
+        b = row_total - a
+        c = totals - a
+        d = corpus_total - row_total - c
+
+        denominator = (a + b) * (c + d) * (a + c) * (b + d)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            statistic = np.where(denominator > 0, corpus_total * (a * d - b * c) ** 2 / denominator, 0.0)
+        scores[row] = np.sign(a * d - b * c) * statistic
+    return scores
+
+
+def distinctive_terms(term_counts: TermCounts, top_n: int = 20, method: str = 'log-odds',
+                      prior_strength: Optional[float] = None) -> dict[str, list[TermScore]]:
+    """
+    Rank the terms that most distinguish each subreddit from the others.
+
+    Args:
+        term_counts (TermCounts): Result of count_terms()
+        top_n (int): Number of terms per subreddit (default: 20)
+        method (str): 'log-odds' (with an informative Dirichlet prior) or 'chi2' (default: 'log-odds')
+        prior_strength (Optional[float]): Total pseudo-count of the log-odds prior (default: corpus size)
+
+    Returns:
+        dict: Subreddit -> its most distinctive terms, highest score first
+    """
+    if method == 'log-odds':
+        scores = log_odds_scores(term_counts.counts, prior_strength)
+    elif method == 'chi2':
+        scores = chi_square_scores(term_counts.counts)
+    else:
+        raise ValueError(f"Unknown method {method!r}; expected one of {METHODS}")
+
+    ranked = {}
+    for row, subreddit in enumerate(term_counts.subreddits):
+        row_counts = term_counts.counts[row].toarray().ravel()
+        count = min(top_n, scores.shape[1])
+        if count <= 0:
+            ranked[subreddit] = []
+            continue
+        top = np.argpartition(-scores[row], count - 1)[:count]
+        top = top[np.argsort(-scores[row][top], kind='stable')]
+        ranked[subreddit] = [TermScore(term_counts.vocabulary[column], round(float(scores[row, column]), 3),
+                                       int(row_counts[column]))
+                             for column in top]
+    return ranked
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the distinctive term analysis.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Rank the terms that distinguish each subreddit from the others.")
+    parser.add_argument("files", nargs="*", help="Dumps to compare (default: every dump in analysis/resources)")
+    parser.add_argument("--method", choices=METHODS, default="log-odds",
+                        help="Scoring method (default: log-odds with an informative Dirichlet prior)")
+    parser.add_argument("--top", type=int, default=20, help="Number of terms per subreddit (default: 20)")
+    parser.add_argument("--min-count", type=int, default=5,
+                        help="Minimum number of occurrences of a term across all dumps (default: 5)")
+    parser.add_argument("--prior-strength", type=float,
+                        help="Total pseudo-count of the log-odds prior (default: number of tokens in the corpus)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--output", help="Also write the ranked terms as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Count the terms of every dump in one pass and print each subreddit's most distinctive terms.
+    """
+    args = parse_args(argv)
+
+    started = time.perf_counter()
+    term_counts = count_terms(args.files or None, args.min_count, args.workers)
+    counted = time.perf_counter()
+    ranked = distinctive_terms(term_counts, args.top, args.method, args.prior_strength)
+
+    for subreddit, documents in zip(term_counts.subreddits, term_counts.documents):
+        print(f"r/{subreddit} ({documents} submissions)")
+        for term in ranked[subreddit]:
+            print(f"  {term.term:<24} {term.score:>10.2f} {term.count:>10}")
+
+    print(f"Counted {len(term_counts.vocabulary)} terms in {counted - started:.1f}s, "
+          f"ranked in {time.perf_counter() - counted:.1f}s")
+
+    if args.output:
+        result: dict[str, Any] = {subreddit: [term._asdict() for term in terms] for subreddit, terms in ranked.items()}
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import json
+import logging
+import os
+import re
+from typing import Optional
+
+import numpy as np
+
+from fact_fetch.utils.embeddings import DEFAULT_MODEL_NAME, encode_texts
+from fact_fetch.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+# Default location of the embedding stores, one sub-directory per model
+DEFAULT_CACHE_DIR = cache_path('embeddings')
+
+# Number of rows copied at a time when the store is compacted
+_COPY_BATCH = 65_536
+
+
+class EmbeddingStore:
+    """
+    Persistent, memory-mapped cache of keyword embeddings.
+
+    Embeddings are stored per model as one contiguous matrix on disk with a
+    string index mapping each keyword to its row. Only keywords that are not
+    in the store yet are sent to the model; everything else is read from the
+    memory-mapped matrix. When the store grows past its size limit, the
+    least recently used keywords are evicted.
+
+    The index is only rewritten when keywords are added or evicted. The
+    time each row was last used is kept in a separate memory-mapped array,
+    so lookups that hit the store only touch that array.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, cache_dir: str = DEFAULT_CACHE_DIR,
+                 dtype: str = 'float32', max_entries: Optional[int] = 1_000_000):
+        """
+        Open (or create) the store of a model.
+
+        Args:
+            model_name (str): Name of the sentence-transformers model (default: 'all-MiniLM-L6-v2')
+            cache_dir (str): Root directory of the embedding cache (default: DEFAULT_CACHE_DIR)
+            dtype (str): 'float32' or 'float16' storage precision for new stores (default: 'float32')
+            max_entries (Optional[int]): Maximum number of keywords kept on disk, or None for no limit
+                                         (default: 1,000,000)
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.directory = os.path.join(cache_dir, re.sub(r'[^\w.-]+', '_', model_name))
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._index_path = os.path.join(self.directory, 'index.json')
+        self._vectors_path = os.path.join(self.directory, 'vectors.bin')
+        self._usage_path = os.path.join(self.directory, 'last_used.bin')
+
+        # Row bookkeeping: keyword -> row, and a memory-mapped int64 array holding the
+        # logical clock followed by the time each row was last used
+        self._rows = {}
+        self._usage = None
+        self._dim = None
+        self._dtype = np.dtype(dtype)
+        self._vectors = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load()
+        if self._usage is None:
+            self._map_usage()
+
+    def _load(self):
+        """
+        Load the index and memory-map the vectors and usage times of an existing store.
+        """
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return
+
+        self._dim = index['dim']
+        self._dtype = np.dtype(index['dtype'])
+        self._rows = {keyword: row for row, keyword in enumerate(index['keys'])}
+
+        # Rows appended after the index was last written are simply ignored
+        self._map_vectors()
+
+        migrate = 'last_used' in index and not os.path.exists(self._usage_path)
+        self._map_usage()
+        if migrate:
+            # Stores written before the usage array existed kept the usage times in the index
+            self._usage[0] = index['clock']
+            self._usage[1:] = index['last_used']
+
+    def _map_vectors(self):
+        """
+        Memory-map the rows that are referenced by the index.
+        """
+        if not self._rows:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self._vectors_path, dtype=self._dtype, mode='r', shape=(len(self._rows), self._dim))
+
+    def _map_usage(self):
+        """
+        Memory-map the clock and usage times, growing the file to the number of rows.
+
+        Rows without a recorded use (e.g. after an interrupted run) count as never used.
+        """
+        size = (len(self._rows) + 1) * np.dtype(np.int64).itemsize
+        with open(self._usage_path, 'ab') as file:
+            if file.tell() < size:
+                file.write(bytes(size - file.tell()))
+        self._usage = np.memmap(self._usage_path, dtype=np.int64, mode='r+', shape=(len(self._rows) + 1,))
+
+    def _save_index(self):
+        """
+        Atomically write the index to disk.
+        """
+        keys = [None] * len(self._rows)
+        for keyword, row in self._rows.items():
+            keys[row] = keyword
+
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'model': self.model_name,
+                'dim': self._dim,
+                'dtype': self._dtype.name,
+                'keys': keys,
+            }, file)
+        os.replace(tmp_path, self._index_path)
+
+    def get(self, keywords: list[str]) -> np.ndarray:
+        """
+        Get the embeddings of keywords, encoding only those that are not cached.
+
+        Args:
+            keywords (list[str]): Keywords to embed
+
+        Returns:
+            np.ndarray: float32 array of shape (len(keywords), dimension), in input order
+        """
+        self._usage[0] += 1
+        clock = int(self._usage[0])
+
+        # Count each distinct keyword once, so that misses match the keywords sent to the model
+        unique = list(dict.fromkeys(keywords))
+        missing = [keyword for keyword in unique if keyword not in self._rows]
+        self.hits += len(unique) - len(missing)
+        self.misses += len(missing)
+
+        # Encode each missing keyword once, in a single model call
+        if missing:
+            self._append(missing, encode_texts(missing, self.model_name, normalize=False))
+
+        if not keywords:
+            return np.zeros((0, self._dim or 0), dtype=np.float32)
+
+        rows = np.fromiter((self._rows[keyword] for keyword in keywords), dtype=np.int64, count=len(keywords))
+        self._usage[rows + 1] = clock
+        embeddings = np.asarray(self._vectors[rows], dtype=np.float32)
+
+        # The index only changes when rows are added or evicted
+        if self._evict() or missing:
+            self._save_index()
+        return embeddings
+
+    def _append(self, keywords: list[str], vectors: np.ndarray):
+        """
+        Append new rows to the matrix and the index.
+
+        Args:
+            keywords (list[str]): Keywords not yet in the store
+            vectors (np.ndarray): Their embeddings
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=self._dtype)
+        if self._dim is None:
+            self._dim = vectors.shape[1]
+
+        start = len(self._rows)
+        mode = 'r+b' if os.path.exists(self._vectors_path) else 'wb'
+        with open(self._vectors_path, mode) as file:
+            # Drop rows written after the last index save, e.g. by an interrupted run
+            file.truncate(start * self._dim * self._dtype.itemsize)
+            file.seek(0, os.SEEK_END)
+            file.write(vectors.tobytes())
+
+        for offset, keyword in enumerate(keywords):
+            self._rows[keyword] = start + offset
+        self._map_vectors()
+        self._map_usage()
+        self._usage[start + 1:] = self._usage[0]
+
+    def _evict(self) -> bool:
+        """
+        Evict the least recently used keywords when the store exceeds its size limit.
+
+        Returns:
+            bool: Whether keywords were evicted
+        """
+        if self.max_entries is None or len(self._rows) <= self.max_entries:
+            return False
+
+        clock = int(self._usage[0])
+        last_used = np.array(self._usage[1:])
+        # Keep the most recently used rows, in their current on-disk order
+        kept = np.sort(np.argsort(-last_used, kind='stable')[:self.max_entries])
+        keys = [None] * len(self._rows)
+        for keyword, row in self._rows.items():
+            keys[row] = keyword
+
+        tmp_path = self._vectors_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            for start in range(0, len(kept), _COPY_BATCH):
+                file.write(np.ascontiguousarray(self._vectors[kept[start:start + _COPY_BATCH]]).tobytes())
+
+        self._vectors = None
+        os.replace(tmp_path, self._vectors_path)
+
+        tmp_path = self._usage_path + '.tmp'
+        np.concatenate(([clock], last_used[kept])).astype(np.int64).tofile(tmp_path)
+        self._usage = None
+        os.replace(tmp_path, self._usage_path)
+
+        self.evictions += len(self._rows) - len(kept)
+        self._rows = {keys[row]: new_row for new_row, row in enumerate(kept.tolist())}
+        self._map_vectors()
+        self._map_usage()
+        logger.info(f"Evicted least recently used embeddings, {len(self._rows)} remain")
+        return True
+
+    def stats(self) -> dict:
+        """
+        Report the size of the store and how often it was hit.
+
+        Returns:
+            dict: Counters for this process ('hits', 'misses', 'hit_rate', 'evictions')
+                  and the current size of the store ('entries', 'bytes')
+        """
+        lookups = self.hits + self.misses
+        return {
+            'model': self.model_name,
+            'entries': len(self._rows),
+            'bytes': len(self._rows) * (self._dim or 0) * self._dtype.itemsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
@@ -1,15 +1,185 @@
+import gzip
 import json
+import logging
+import lzma
 import os
+import queue
 import sys
-from typing import Iterator, Any
+import threading
+from typing import Callable, Iterable, Iterator, Any, Optional
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library parser
+    orjson = None
 
-def load_json_line_by_line(file_path) -> Iterator[dict[Any, Any]]:
+try:
+    import zstandard
+except ImportError:  # zstandard is only needed to read .zst dumps
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Size of the binary blocks read from disk by the field-projecting reader
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Number of decompressed blocks buffered ahead of the parser
+DEFAULT_READAHEAD = 4
+
+# Leading bytes of each supported compression format
+COMPRESSION_MAGIC = {
+    'zstd': b'\x28\xb5\x2f\xfd',
+    'gzip': b'\x1f\x8b',
+    'xz': b'\xfd7zXZ\x00',
+}
+
+# Pushshift dumps are compressed with long-distance matching (zstd --long=31), which needs a 2 GiB window
+ZSTD_MAX_WINDOW_SIZE = 2 ** 31
+
+# Fastest available JSON decoder. Both accept raw bytes and raise a ValueError subclass on bad input.
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def detect_compression(file_path) -> Optional[str]:
+    """
+    Detect whether a file is compressed from its leading bytes.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        Optional[str]: 'zstd', 'gzip' or 'xz', or None for an uncompressed file
+    """
+    with open(file_path, 'rb') as file:
+        head = file.read(max(len(magic) for magic in COMPRESSION_MAGIC.values()))
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _open_decompressor(file, compression: str, block_size: int):
+    """
+    Wrap a binary file in a decompressing stream.
+
+    Args:
+        file: Compressed file opened in binary mode; it is not closed with the stream
+        compression (str): 'zstd', 'gzip' or 'xz'
+        block_size (int): Number of compressed bytes read at a time
+
+    Returns:
+        A binary stream of decompressed bytes
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=file, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(file, mode='rb')
+    if zstandard is None:
+        raise ImportError("Reading .zst files requires the zstandard package")
+    decompressor = zstandard.ZstdDecompressor(max_window_size=ZSTD_MAX_WINDOW_SIZE)
+    return decompressor.stream_reader(file, read_size=block_size, read_across_frames=True, closefd=False)
+
+
+def iter_decompressed_blocks(file_path, compression: str, block_size: int = DEFAULT_BLOCK_SIZE,
+                             readahead: int = DEFAULT_READAHEAD) -> Iterator[tuple[bytes, int]]:
+    """
+    Decompress a file in a background thread, block by block.
+
+    Decompression releases the GIL, so it overlaps with parsing the
+    previous blocks in the calling thread. At most 'readahead' blocks are
+    buffered, which bounds memory use regardless of the file size.
+
+    Args:
+        file_path (str): Path to the compressed file
+        compression (str): 'zstd', 'gzip' or 'xz' (see detect_compression)
+        block_size (int): Number of decompressed bytes per block (default: 16 MiB)
+        readahead (int): Number of blocks decompressed ahead of the consumer (default: 4)
+
+    Returns:
+        generator: Yields (block, offset) pairs, where offset is the position reached
+                   in the compressed file once the block was decompressed
+    """
+    blocks = queue.Queue(maxsize=readahead)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        # Give up once the consumer has gone away instead of blocking forever
+        while not stopped.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def decompress():
+        try:
+            with open(file_path, 'rb') as file, _open_decompressor(file, compression, block_size) as stream:
+                while not stopped.is_set():
+                    block = stream.read(block_size)
+                    if not block:
+                        break
+                    put((block, file.tell()))
+        except BaseException as e:
+            put(e)
+        put(done)
+
+    thread = threading.Thread(target=decompress, name='decompress', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = blocks.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def progress_logger(file_path, step: float = 0.1) -> Callable[[int, int], None]:
+    """
+    Create a progress callback for iter_raw_lines() that logs every 'step' of the file.
+
+    Args:
+        file_path (str): Path of the file, used in the log message
+        step (float): Share of the file between two messages (default: 0.1)
+
+    Returns:
+        Callable[[int, int], None]: Callback taking the offset reached and the file size
+    """
+    next_share = [step]
+
+    def log(offset: int, size: int):
+        if size and offset / size >= next_share[0]:
+            logger.info(f"Read {offset / 2 ** 20:.0f} of {size / 2 ** 20:.0f} MiB of {file_path} "
+                        f"({offset / size:.0%})")
+            next_share[0] = (offset / size // step + 1) * step
+
+    return log
+
+
+def load_json_line_by_line(file_path, fields: Optional[list[str]] = None,
+                           progress: Optional[Callable[[int, int], None]] = None) -> Iterator[dict[Any, Any]]:
     """
     Read JSON objects line by line from a file. This is efficient for large files.
 
+    When a list of fields is given, the file is read through the fast
+    field-projecting reader (see load_json_fields) and only those fields
+    are returned for each object.
+
+    Files compressed with zstd, gzip or xz are detected from their leading
+    bytes and decompressed on the fly, so compressed dumps never need to
+    be inflated on disk.
+
     Args:
         file_path (str): Path to the JSON file.
+        fields (Optional[list[str]]): Names of the fields to keep (default: None, keep everything)
+        progress (Optional[Callable[[int, int], None]]): Called with the offset reached in the file
+                                                         (compressed bytes for compressed files) and
+                                                         the file size after each block (default: None)
 
     Returns:
         generator: Yields JSON objects parsed from each line.
@@ -17,11 +187,174 @@ def load_json_line_by_line(file_path) -> Iterator[dict[Any, Any]]:
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File {file_path} does not exist")
 
+    if fields is not None:
+        yield from load_json_fields(file_path, fields, progress=progress)
+        return
+
+    if progress is not None or detect_compression(file_path) is not None:
+        for line in iter_raw_lines(file_path, progress=progress):
+            if line.strip():
+                yield json.loads(line)
+        return
+
     with open(file_path, 'r', encoding='utf-8') as file:
         for line in file:
             yield json.loads(line.strip())  # Parse each line into a JSON object
 
 
+def _iter_file_blocks(file_path, start: int, block_size: int) -> Iterator[tuple[bytes, int]]:
+    """
+    Read an uncompressed file in blocks, starting at the first line beginning at or after 'start'.
+
+    Args:
+        file_path (str): Path to the file
+        start (int): Byte offset where the range begins
+        block_size (int): Number of bytes read at a time
+
+    Returns:
+        generator: Yields (block, offset) pairs, where offset is the file position after the block
+    """
+    with open(file_path, 'rb') as file:
+        if start > 0:
+            # Skip the remainder of a line that started in the previous range
+            file.seek(start - 1)
+            if file.read(1) != b'\n':
+                file.readline()
+
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            yield block, file.tell()
+
+
+def iter_raw_lines(file_path, start: int = 0, end: Optional[int] = None,
+                   block_size: int = DEFAULT_BLOCK_SIZE,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Iterator[bytes]:
+    """
+    Read raw lines from a file in large binary blocks.
+
+    Only lines that start inside the byte range [start, end) are yielded, so
+    a file can be split into arbitrary byte ranges and every line will be
+    returned by exactly one of them.
+
+    Compressed files (see detect_compression) are decompressed in a
+    background thread and can only be read as a whole.
+
+    Args:
+        file_path (str): Path to the file
+        start (int): Byte offset where the range begins (default: 0)
+        end (Optional[int]): Byte offset where the range ends (default: None, end of file)
+        block_size (int): Number of bytes read from disk at a time (default: 16 MiB)
+        progress (Optional[Callable[[int, int], None]]): Called with the offset reached in the
+                                                         file and the file size after each block
+
+    Returns:
+        generator: Yields each line as bytes, without the trailing newline
+
+    Raises:
+        ValueError: If a byte range is requested from a compressed file
+
+    Note:
+        A line that begins before 'start' belongs to the previous range and
+        is skipped, even if it extends into this one.
+    """
+    compression = detect_compression(file_path)
+    if compression is not None:
+        if start > 0 or end is not None:
+            raise ValueError(f"{file_path} is {compression}-compressed and can only be read as a whole")
+        blocks = iter_decompressed_blocks(file_path, compression, block_size)
+    else:
+        blocks = _iter_file_blocks(file_path, start, block_size)
+    size = os.path.getsize(file_path)
+
+    # File offset of the first byte currently held in 'buffer' (only tracked for uncompressed files)
+    line_start = None
+    buffer = b''
+    for block, offset in blocks:
+        if line_start is None:
+            line_start = offset - len(block)
+
+        lines = (buffer + block).split(b'\n')
+        # The last piece is incomplete until the next block (or EOF) arrives
+        buffer = lines.pop()
+        for line in lines:
+            if end is not None and line_start >= end:
+                return
+            line_start += len(line) + 1
+            yield line
+
+        if progress is not None:
+            progress(offset, size)
+
+    # A final line without a trailing newline
+    if buffer and (end is None or line_start < end):
+        yield buffer
+
+
+def parse_json_fields(lines: Iterable[bytes], fields: list[str], source: str = "input") -> Iterator[dict[str, Any]]:
+    """
+    Parse raw NDJSON lines and keep selected fields.
+
+    Malformed or truncated lines are skipped instead of aborting the whole
+    read, which matters for multi-GB dumps where a single bad record is common.
+
+    Args:
+        lines (Iterable[bytes]): Raw lines, e.g. from iter_raw_lines()
+        fields (list[str]): Names of the fields to keep from each object
+        source (str): Name of the input used in the warning about skipped lines (default: 'input')
+
+    Returns:
+        generator: Yields dictionaries containing only the requested fields.
+                   Fields missing from an object are set to None.
+    """
+    skipped = 0
+    for line in lines:
+        try:
+            obj = _loads(line)
+        except ValueError:
+            # Malformed, truncated or blank line
+            if line.strip():
+                skipped += 1
+            continue
+
+        if not isinstance(obj, dict):
+            skipped += 1
+            continue
+
+        yield {field: obj.get(field) for field in fields}
+
+    if skipped:
+        logger.warning(f"Skipped {skipped} malformed lines in {source}")
+
+
+def load_json_fields(file_path, fields: list[str], start: int = 0, end: Optional[int] = None,
+                     block_size: int = DEFAULT_BLOCK_SIZE,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Iterator[dict[str, Any]]:
+    """
+    Read selected fields of newline-delimited JSON objects from a file.
+
+    The file is read in large binary blocks (decompressed on the fly if it
+    is compressed) and decoded with orjson when it is installed (the
+    standard library json module otherwise). Malformed or truncated lines
+    are skipped.
+
+    Args:
+        file_path (str): Path to the JSON file
+        fields (list[str]): Names of the fields to keep from each object
+        start (int): Byte offset where reading begins (default: 0)
+        end (Optional[int]): Byte offset where reading ends (default: None, end of file)
+        block_size (int): Number of bytes read from disk at a time (default: 16 MiB)
+        progress (Optional[Callable[[int, int], None]]): Called with the offset reached in the
+                                                         file and the file size after each block
+
+    Returns:
+        generator: Yields dictionaries containing only the requested fields.
+                   Fields missing from an object are set to None.
+    """
+    yield from parse_json_fields(iter_raw_lines(file_path, start, end, block_size, progress), fields, file_path)
+
+
 def get_x_results(generator: Iterator[dict[Any, Any]], count: int):
     """
     Extract a specified number of results from a generator.
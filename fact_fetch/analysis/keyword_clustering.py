@@ -0,0 +1,293 @@
+import tempfile
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from fact_fetch.utils.embeddings import get_sentence_model
+
+# Clustering backends accepted by cluster_embeddings
+BACKENDS = ('kmeans', 'minibatch', 'graph')
+
+
+class KeywordClusters(NamedTuple):
+    """
+    Result of clustering a keyword vocabulary.
+
+    Attributes:
+        labels (np.ndarray): Cluster id of each keyword, in input order
+        centroids (np.ndarray): Unit-length centroid of each cluster
+        representatives (list[str]): Keyword closest to each centroid, indexed by cluster id
+    """
+    labels: np.ndarray
+    centroids: np.ndarray
+    representatives: list[str]
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale each row to unit length.
+
+    Args:
+        vectors (np.ndarray): 2D array of vectors
+
+    Returns:
+        np.ndarray: float32 copy with rows of length 1 (zero rows are left as is)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def embed_keywords(keywords: list[str], chunk_size: int = 4096, embedding_store=None) -> np.ndarray:
+    """
+    Embed keywords chunk by chunk into unit-length float32 vectors.
+
+    Vocabularies larger than one chunk are written to a temporary
+    memory-mapped file as they are encoded, so only one chunk of
+    embeddings is held in memory at a time.
+
+    Args:
+        keywords (list[str]): Keywords to embed
+        chunk_size (int): Number of keywords encoded at a time (default: 4096)
+        embedding_store (Optional[EmbeddingStore]): Persistent embedding cache to read through
+
+    Returns:
+        np.ndarray: Array (or memory map) of shape (len(keywords), dimension)
+    """
+    def encode(chunk):
+        if embedding_store is not None:
+            return _normalize_rows(embedding_store.get(chunk))
+        return _normalize_rows(get_sentence_model().encode(chunk))
+
+    if len(keywords) <= chunk_size:
+        return encode(list(keywords))
+
+    embeddings = None
+    for start in range(0, len(keywords), chunk_size):
+        chunk = encode(list(keywords[start:start + chunk_size]))
+        if embeddings is None:
+            embeddings = np.memmap(tempfile.TemporaryFile(), dtype=np.float32, mode='w+',
+                                   shape=(len(keywords), chunk.shape[1]))
+        embeddings[start:start + len(chunk)] = chunk
+    return embeddings
+
+
+def _find_roots(parent: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """
+    Find the root of each node in a union-find forest, compressing the paths of those nodes.
+
+    Args:
+        parent (np.ndarray): Parent of every element; roots are their own parent
+        nodes (np.ndarray): Elements to look up
+
+    Returns:
+        np.ndarray: Root of each node
+    """
+    roots = parent[nodes]
+    while True:
+        grandparents = parent[roots]
+        if np.array_equal(grandparents, roots):
+            break
+        roots = grandparents
+    parent[nodes] = roots
+    return roots
+
+
+def _union_edges(parent: np.ndarray, first: np.ndarray, second: np.ndarray):
+    """
+    Merge the components joined by a batch of edges, vectorized with NumPy.
+
+    Roots always point at the smaller index, so the forest stays acyclic.
+
+    Args:
+        parent (np.ndarray): Parent of every element, updated in place
+        first (np.ndarray): First element of each edge
+        second (np.ndarray): Second element of each edge
+    """
+    while True:
+        first_roots, second_roots = _find_roots(parent, first), _find_roots(parent, second)
+        differ = first_roots != second_roots
+        if not differ.any():
+            return
+        first, second = first[differ], second[differ]
+        low = np.minimum(first_roots[differ], second_roots[differ])
+        np.minimum.at(parent, first_roots[differ], low)
+        np.minimum.at(parent, second_roots[differ], low)
+
+
+def _graph_clusters(embeddings: np.ndarray, chunk_size: int, similarity_threshold: float) -> np.ndarray:
+    """
+    Label connected components of the cosine-similarity graph.
+
+    Two keywords are connected when the cosine similarity of their
+    embeddings is at least the threshold. Similarities are computed block
+    by block, and the edges of each block are merged into a union-find
+    forest as soon as they are found, so memory holds one
+    chunk_size x chunk_size block and one parent per keyword, however
+    many edges the graph has.
+
+    Args:
+        embeddings (np.ndarray): Unit-length vectors
+        chunk_size (int): Block size for the similarity computation
+        similarity_threshold (float): Minimum cosine similarity for an edge
+
+    Returns:
+        np.ndarray: Component id of each keyword, numbered from 0
+    """
+    count = len(embeddings)
+    parent = np.arange(count)
+    for start in range(0, count, chunk_size):
+        block = np.asarray(embeddings[start:start + chunk_size])
+        # The graph is undirected, so only blocks on or above the diagonal are needed
+        for other_start in range(start, count, chunk_size):
+            other = block if other_start == start else np.asarray(embeddings[other_start:other_start + chunk_size])
+            block_rows, block_cols = np.nonzero(block @ other.T >= similarity_threshold)
+            rows, cols = block_rows + start, block_cols + other_start
+            linked = rows != cols
+            if linked.any():
+                _union_edges(parent, rows[linked], cols[linked])
+
+    roots = _find_roots(parent, np.arange(count))
+    return np.unique(roots, return_inverse=True)[1].reshape(-1)
+
+
+def cluster_embeddings(embeddings: np.ndarray, num_clusters: int = 100, backend: str = 'minibatch',
+                       chunk_size: int = 4096, similarity_threshold: float = 0.7,
+                       random_state: int = 42) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster unit-length embeddings with a selectable backend.
+
+    Backends:
+        - 'kmeans': full-batch KMeans, the original behaviour; best for small vocabularies
+        - 'minibatch': MiniBatchKMeans fed chunk by chunk; memory stays flat as the vocabulary grows
+        - 'graph': connected components of the cosine-similarity graph; the number of
+                   clusters follows from similarity_threshold instead of num_clusters
+
+    Args:
+        embeddings (np.ndarray): Unit-length float32 vectors (may be a memory map)
+        num_clusters (int): Number of clusters for the k-means backends (default: 100)
+        backend (str): One of BACKENDS (default: 'minibatch')
+        chunk_size (int): Number of vectors processed at a time (default: 4096)
+        similarity_threshold (float): Minimum cosine similarity joining two keywords in 'graph' mode (default: 0.7)
+        random_state (int): Seed for reproducible results (default: 42)
+
+    Returns:
+        tuple: (labels, centroids) where labels holds the cluster id of each vector
+               and centroids holds one unit-length vector per cluster
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend {backend!r}, expected one of {BACKENDS}")
+
+    # scikit-learn is slow to import, so it is only loaded once there is something to cluster
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    count = len(embeddings)
+    if backend == 'kmeans':
+        kmeans = KMeans(n_clusters=num_clusters, random_state=random_state)
+        labels = kmeans.fit_predict(np.asarray(embeddings))
+        return labels.astype(np.int32), _normalize_rows(kmeans.cluster_centers_)
+
+    if backend == 'minibatch':
+        # The first partial_fit call needs at least one sample per cluster
+        chunk_size = max(chunk_size, num_clusters)
+        kmeans = MiniBatchKMeans(n_clusters=num_clusters, random_state=random_state, batch_size=chunk_size)
+        for start in range(0, count, chunk_size):
+            kmeans.partial_fit(np.asarray(embeddings[start:start + chunk_size]))
+
+        labels = np.empty(count, dtype=np.int32)
+        for start in range(0, count, chunk_size):
+            labels[start:start + chunk_size] = kmeans.predict(np.asarray(embeddings[start:start + chunk_size]))
+        return labels, _normalize_rows(kmeans.cluster_centers_)
+
+    labels = _graph_clusters(embeddings, chunk_size, similarity_threshold).astype(np.int32)
+    # Centroid of each component, accumulated chunk by chunk
+    centroids = np.zeros((labels.max() + 1 if count else 0, embeddings.shape[1]), dtype=np.float32)
+    for start in range(0, count, chunk_size):
+        np.add.at(centroids, labels[start:start + chunk_size], np.asarray(embeddings[start:start + chunk_size]))
+    return labels, _normalize_rows(centroids)
+
+
+def nearest_to_centroids(embeddings: np.ndarray, labels: np.ndarray, centroids: np.ndarray,
+                         chunk_size: int = 4096) -> np.ndarray:
+    """
+    Find the member closest to its centroid for every cluster.
+
+    Args:
+        embeddings (np.ndarray): Unit-length vectors
+        labels (np.ndarray): Cluster id of each vector
+        centroids (np.ndarray): Unit-length centroid of each cluster
+        chunk_size (int): Number of vectors processed at a time (default: 4096)
+
+    Returns:
+        np.ndarray: Index of the representative vector of each cluster (-1 for empty clusters)
+    """
+    best_score = np.full(len(centroids), -np.inf, dtype=np.float32)
+    best_index = np.full(len(centroids), -1, dtype=np.int64)
+    for start in range(0, len(embeddings), chunk_size):
+        chunk_labels = labels[start:start + chunk_size]
+        scores = np.einsum('ij,ij->i', np.asarray(embeddings[start:start + chunk_size]), centroids[chunk_labels])
+
+        # Best member of each cluster within this chunk
+        order = np.lexsort((-scores, chunk_labels))
+        clusters, first = np.unique(chunk_labels[order], return_index=True)
+        candidates = order[first]
+
+        better = scores[candidates] > best_score[clusters]
+        best_score[clusters[better]] = scores[candidates[better]]
+        best_index[clusters[better]] = candidates[better] + start
+    return best_index
+
+
+def cluster_keyword_vocabulary(keywords: list[str], num_clusters: int = 100, backend: str = 'minibatch',
+                               chunk_size: int = 4096, embedding_store=None,
+                               similarity_threshold: float = 0.7) -> KeywordClusters:
+    """
+    Embed and cluster a keyword vocabulary of any size.
+
+    Keywords are embedded chunk by chunk, clustered with the selected
+    backend, and summarized by the keyword nearest to each cluster centroid.
+
+    Args:
+        keywords (list[str]): Keywords to cluster
+        num_clusters (int): Number of clusters for the k-means backends (default: 100)
+        backend (str): One of BACKENDS (default: 'minibatch')
+        chunk_size (int): Number of keywords processed at a time (default: 4096)
+        embedding_store (Optional[EmbeddingStore]): Persistent embedding cache to read through
+        similarity_threshold (float): Minimum cosine similarity joining two keywords in 'graph' mode (default: 0.7)
+
+    Returns:
+        KeywordClusters: Label array, centroids and representative keyword of each cluster
+    """
+    keywords = list(keywords)
+    embeddings = embed_keywords(keywords, chunk_size, embedding_store)
+    labels, centroids = cluster_embeddings(embeddings, num_clusters, backend, chunk_size, similarity_threshold)
+    representatives = [keywords[index] if index >= 0 else None
+                       for index in nearest_to_centroids(embeddings, labels, centroids, chunk_size)]
+    return KeywordClusters(labels, centroids, representatives)
+
+
+def group_by_label(keywords: list[str], labels: np.ndarray) -> dict[int, list[str]]:
+    """
+    Group keywords by cluster label.
+
+    Args:
+        keywords (list[str]): Keywords in input order
+        labels (np.ndarray): Cluster id of each keyword
+
+    Returns:
+        dict: Cluster id -> keywords in that cluster, in input order
+    """
+    if len(labels) == 0:
+        return {}
+    order = np.argsort(labels, kind='stable')
+    sorted_labels = labels[order]
+    boundaries = np.flatnonzero(np.diff(sorted_labels)) + 1
+    keyword_array = np.asarray(keywords, dtype=object)[order]
+    return {
+        int(group_labels[0]): group.tolist()
+        for group_labels, group in zip(np.split(sorted_labels, boundaries), np.split(keyword_array, boundaries))
+    }
@@ -1,6 +1,11 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
-from sentence_transformers import SentenceTransformer
+import hashlib
+from collections import Counter
+from typing import Iterable, Optional
+
+import numpy as np
+
+from fact_fetch.analysis.keyword_clustering import cluster_keyword_vocabulary, group_by_label
+from fact_fetch.utils.parallel import chunked
 
 
 def get_interesting_keywords(texts, top_n=10_000):
@@ -23,6 +28,9 @@ def get_interesting_keywords(texts, top_n=10_000):
         The function uses scikit-learn's TfidfVectorizer with English stop words
         removed to focus on meaningful content words rather than common function words.
     """
+    # scikit-learn takes about a second to import, so it is only loaded when keywords are extracted
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
     # Initialize TF-IDF Vectorizer with English stop words removed
     vectorizer = TfidfVectorizer(stop_words='english', max_features=top_n)
 
@@ -35,7 +43,194 @@ def get_interesting_keywords(texts, top_n=10_000):
     return list(feature_names)
 
 
-def cluster_keywords(keywords, num_clusters=100):
+class _CountMinSketch:
+    """
+    Approximate per-term counts for an unbounded vocabulary in fixed memory.
+
+    Each term is hashed into one bucket per row; a term's estimated count is
+    the minimum over its buckets, which never underestimates the true count.
+    """
+
+    def __init__(self, width: int, depth: int):
+        """
+        Allocate the sketch.
+
+        Args:
+            width (int): Number of buckets per row
+            depth (int): Number of rows (independent hash functions)
+        """
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def buckets(self, terms: list[str]) -> np.ndarray:
+        """
+        Compute the bucket of each term in every row.
+
+        Uses one 64-bit hash per term and derives the rows by double hashing,
+        so the cost does not grow with the depth.
+
+        Args:
+            terms (list[str]): Terms to hash
+
+        Returns:
+            np.ndarray: Array of shape (len(terms), depth) with bucket indices
+        """
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little') for term in terms),
+            dtype=np.uint64, count=len(terms),
+        )
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)
+        return ((low[:, None] + rows[None, :] * high[:, None]) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, buckets: np.ndarray, counts: np.ndarray):
+        """
+        Add counts for a set of terms.
+
+        Args:
+            buckets (np.ndarray): Bucket indices from buckets()
+            counts (np.ndarray): Count to add for each term
+        """
+        for row in range(self.depth):
+            np.add.at(self.table[row], buckets[:, row], counts)
+
+    def estimate(self, buckets: np.ndarray) -> np.ndarray:
+        """
+        Estimate the counts of a set of terms.
+
+        Args:
+            buckets (np.ndarray): Bucket indices from buckets()
+
+        Returns:
+            np.ndarray: Estimated count of each term
+        """
+        return self.table[np.arange(self.depth), buckets].min(axis=1)
+
+
+def _tfidf_scores(tf: np.ndarray, df: np.ndarray, num_docs: int) -> np.ndarray:
+    """
+    Score terms by their total TF-IDF weight across the corpus.
+
+    Uses the same smoothed inverse document frequency as TfidfVectorizer.
+
+    Args:
+        tf (np.ndarray): Total number of occurrences of each term
+        df (np.ndarray): Number of documents containing each term
+        num_docs (int): Number of documents in the corpus
+
+    Returns:
+        np.ndarray: Score of each term
+    """
+    return tf * (np.log((1 + num_docs) / (1 + df)) + 1)
+
+
+def stream_interesting_keywords(texts: Iterable[str], top_n=10_000, batch_size=1_000,
+                                refine_texts: Optional[Iterable[str]] = None,
+                                sketch_width=2 ** 20, sketch_depth=4, candidate_factor=4):
+    """
+    Extract interesting keywords from a stream of texts in bounded memory.
+
+    This is the out-of-core counterpart of get_interesting_keywords. Texts are
+    consumed in mini-batches and tokenized the same way TfidfVectorizer does.
+    Term and document frequencies are kept in count-min sketches of fixed
+    size, and only a bounded set of candidate terms with the highest
+    estimated scores is remembered. Neither the corpus nor a document-term
+    matrix is ever held in memory, so entire dumps can be processed.
+
+    Args:
+        texts (Iterable[str]): Normalized strings from titles and descriptions
+        top_n (int): The number of top keywords to extract globally from all texts (default: 10,000)
+        batch_size (int): Number of texts tokenized per mini-batch (default: 1,000)
+        refine_texts (Optional[Iterable[str]]): A second pass over the same texts. When given,
+                                                candidates are re-counted exactly before ranking.
+        sketch_width (int): Buckets per sketch row (default: 2**20)
+        sketch_depth (int): Rows per sketch (default: 4)
+        candidate_factor (int): Candidates kept per requested keyword (default: 4)
+
+    Returns:
+        list: List of top keywords ranked by total TF-IDF weight, highest first
+
+    Note:
+        Memory use is about 16 * sketch_width * sketch_depth bytes for the two
+        sketches (64 MiB with the defaults) plus the candidate set, regardless
+        of corpus size. Sketch estimates can only overestimate counts; the
+        exact refinement pass removes that error from the final ranking.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    analyzer = TfidfVectorizer(stop_words='english').build_analyzer()
+    tf_sketch = _CountMinSketch(sketch_width, sketch_depth)
+    df_sketch = _CountMinSketch(sketch_width, sketch_depth)
+    capacity = candidate_factor * top_n
+    candidates = {}
+    num_docs = 0
+
+    def estimated_scores(terms):
+        buckets = np.array([candidates[term] for term in terms]).reshape(len(terms), sketch_depth)
+        return _tfidf_scores(tf_sketch.estimate(buckets), df_sketch.estimate(buckets), num_docs)
+
+    def top_terms(terms, scores, count):
+        if len(terms) <= count:
+            order = np.argsort(-scores, kind='stable')
+        else:
+            order = np.argpartition(-scores, count - 1)[:count]
+            order = order[np.argsort(-scores[order], kind='stable')]
+        return [terms[i] for i in order]
+
+    for batch in chunked(texts, batch_size):
+        term_counts = Counter()
+        doc_counts = Counter()
+        for text in batch:
+            tokens = analyzer(text)
+            term_counts.update(tokens)
+            doc_counts.update(set(tokens))
+        num_docs += len(batch)
+
+        if not term_counts:
+            continue
+
+        terms = list(term_counts)
+        buckets = tf_sketch.buckets(terms)
+        tf_sketch.add(buckets, np.fromiter((term_counts[term] for term in terms), dtype=np.int64, count=len(terms)))
+        df_sketch.add(buckets, np.fromiter((doc_counts[term] for term in terms), dtype=np.int64, count=len(terms)))
+        for term, term_buckets in zip(terms, buckets):
+            candidates[term] = term_buckets
+
+        # Let the candidate set grow a little before pruning so pruning is amortized
+        if len(candidates) > 2 * capacity:
+            terms = list(candidates)
+            kept = top_terms(terms, estimated_scores(terms), capacity)
+            candidates = {term: candidates[term] for term in kept}
+
+    if not candidates:
+        return []
+
+    terms = list(candidates)
+    if refine_texts is None:
+        return top_terms(terms, estimated_scores(terms), top_n)
+
+    # Exact counts for the candidates only, in a second pass over the texts
+    index = {term: i for i, term in enumerate(terms)}
+    tf = np.zeros(len(terms), dtype=np.int64)
+    df = np.zeros(len(terms), dtype=np.int64)
+    num_docs = 0
+    for text in refine_texts:
+        num_docs += 1
+        seen = set()
+        for token in analyzer(text):
+            position = index.get(token)
+            if position is not None:
+                tf[position] += 1
+                if position not in seen:
+                    seen.add(position)
+                    df[position] += 1
+
+    return top_terms(terms, _tfidf_scores(tf, df, num_docs), top_n)
+
+
+def cluster_keywords(keywords, num_clusters=100, embedding_store=None, backend='kmeans', chunk_size=4096):
     """
     Cluster keywords into groups using embeddings and KMeans.
     
@@ -46,6 +241,11 @@ def cluster_keywords(keywords, num_clusters=100):
     Args:
         keywords (list): List of keywords to cluster
         num_clusters (int): Number of clusters to create (default: 100)
+        embedding_store (Optional[EmbeddingStore]): Persistent embedding cache. When given,
+                                                   only keywords missing from it are encoded.
+        backend (str): Clustering backend, 'kmeans', 'minibatch' or 'graph' (default: 'kmeans').
+                       Use 'minibatch' for vocabularies of many thousands of keywords.
+        chunk_size (int): Number of keywords embedded and clustered at a time (default: 4096)
         
     Returns:
         dict: A dictionary where the key is the cluster ID and the value is a list
@@ -54,24 +254,15 @@ def cluster_keywords(keywords, num_clusters=100):
     Note:
         The function uses the 'all-MiniLM-L6-v2' model for generating embeddings,
         which provides a good balance between performance and accuracy for keyword
-        clustering tasks. K-means is used with a fixed random state for reproducible
-        results.
+        clustering tasks. The model is loaded once per process and shared.
+        K-means is used with a fixed random state for reproducible results.
+        See keyword_clustering.cluster_keyword_vocabulary for label arrays and
+        representative keywords instead of a dictionary.
     """
-    # Load pre-trained embedding model for converting keywords to vectors
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    # Generate embeddings for the keywords
-    embeddings = model.encode(keywords)
+    keywords = list(keywords)
 
-    # Perform K-means clustering on the embeddings
-    kmeans = KMeans(n_clusters=num_clusters, random_state=42)
-    labels = kmeans.fit_predict(embeddings)
+    # Embed and cluster the keywords, chunk by chunk for the scalable backends
+    result = cluster_keyword_vocabulary(keywords, num_clusters, backend, chunk_size, embedding_store)
 
     # Group keywords by their assigned cluster
-    clusters = {}
-    for keyword, label in zip(keywords, labels):
-        if label not in clusters:
-            clusters[label] = []
-        clusters[label].append(keyword)
-
-    return clusters
\ No newline at end of file
+    return group_by_label(keywords, result.labels)
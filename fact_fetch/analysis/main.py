@@ -1,11 +1,112 @@
-import sys
+import argparse
+from itertools import islice
+from typing import Iterator, Optional
 
-from fact_fetch.analysis.json_data_loader import load_json_line_by_line, get_x_results
-from fact_fetch.analysis.keyword_extraction import get_interesting_keywords, cluster_keywords
+from fact_fetch.analysis.dedup import DEFAULT_THRESHOLD, deduplicate
+from fact_fetch.analysis.embedding_cache import EmbeddingStore
+from fact_fetch.analysis.json_data_loader import load_json_line_by_line, progress_logger
+from fact_fetch.analysis.keyword_clustering import BACKENDS
+from fact_fetch.analysis.keyword_extraction import get_interesting_keywords, cluster_keywords, stream_interesting_keywords
+from fact_fetch.analysis.sampling import TIME_BUCKETS, reservoir_sample, sample_submissions, stratified_sample
+from fact_fetch.analysis.submission_store import DEFAULT_CACHE_DIR, open_store
 from fact_fetch.utils.text_normalizer import RedditTextNormalizer
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the analysis entry point.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Extract and cluster keywords from Reddit submission dumps.")
+    parser.add_argument("json_file_path",
+                        help="Path to the JSON file containing Reddit submission data (optionally zstd-, "
+                             "gzip- or xz-compressed)")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Number of submissions to analyze (default: 1000, or the whole file with --streaming)")
+    parser.add_argument("--sample", choices=("first", "uniform", "time"), default="first",
+                        help="Which submissions to analyze: the first --limit of the file, a uniform random "
+                             "sample, or a sample stratified by creation time (default: first)")
+    parser.add_argument("--time-bucket", choices=TIME_BUCKETS, default="month",
+                        help="Width of the time strata with --sample time (default: month). 'day' gives "
+                             "thousands of strata over multi-year dumps, most of which get at most one submission")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random sample (default: 0)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Drop reposts and other near-duplicate submissions before extracting keywords")
+    parser.add_argument("--dedup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Similarity above which submissions are near-duplicates (default: 0.8)")
+    parser.add_argument("--keywords", type=int, default=100,
+                        help="Number of keywords to extract (default: 100)")
+    parser.add_argument("--clusters", type=int, default=10,
+                        help="Number of keyword clusters (default: 10)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Number of processes used for normalization (default: 1)")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Read normalized text from the columnar cache, ingesting the file first if needed")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Directory of the columnar cache")
+    parser.add_argument("--cluster-backend", choices=BACKENDS, default="kmeans",
+                        help="Clustering backend; use 'minibatch' for large keyword sets (default: kmeans)")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="Encode every keyword instead of reusing embeddings cached on disk")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Extract keywords from a stream in bounded memory instead of loading the texts")
+    return parser.parse_args(argv)
+
+
+def iter_normalized_texts(args: argparse.Namespace, limit: Optional[int]) -> Iterator[str]:
+    """
+    Lazily produce the normalized title and body of each submission.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments
+        limit (Optional[int]): Maximum number of submissions, or None for all of them
+
+    Returns:
+        generator: Yields one normalized string per submission
+    """
+    if args.use_cache:
+        # Normalized text was produced once by the ingest step
+        store = open_store(args.json_file_path, args.cache_dir)
+        if args.sample == "first":
+            yield from islice(store.iter_texts(), limit)
+            return
+
+        # Sample on the ID and timestamp columns, then read only the sampled texts
+        records = ({'id': store.get_id(index), 'created_utc': int(store.created_utc[index]), 'index': index}
+                   for index in range(len(store)))
+        if args.sample == "uniform":
+            sample = reservoir_sample(records, limit, args.seed)
+        else:
+            sample = stratified_sample(records, limit, 'time', args.time_bucket, args.seed, total=limit)
+        for record in sample:
+            yield store.get_text(record['index'])
+        return
+
+    # Initialize text normalizer for cleaning Reddit content
+    text_normalizer = RedditTextNormalizer()
+
+    if args.sample == "first":
+        # Only the title and body are used, so skip decoding everything else
+        generator = islice(load_json_line_by_line(args.json_file_path, fields=["title", "selftext"],
+                                                  progress=progress_logger(args.json_file_path)), limit)
+    else:
+        # One parallel pass over the whole file, keeping only the sample in memory
+        generator = sample_submissions([args.json_file_path], limit, None if args.sample == "uniform" else "time",
+                                       args.time_bucket, args.seed, max_workers=args.processes)
+
+    # Normalize text content by combining title and body text
+    yield from text_normalizer.normalize_iter(
+        ((x['title'] or "") + " " + (x['selftext'] or "") for x in generator),
+        processes=args.processes,
+    )
+
+
+def main(argv=None):
     """
     Main analysis function for processing Reddit submission data.
     
@@ -14,45 +115,60 @@ def main():
     keywords, and clusters them to identify common themes and topics.
     
     The analysis process:
-    1. Loads Reddit submission data from a JSON file
+    1. Loads Reddit submission data from a JSON file (or its columnar cache)
     2. Normalizes text content using RedditTextNormalizer
     3. Extracts the most interesting keywords from the content
     4. Clusters keywords to identify topic groups
     5. Prints the clustering results
     
     Usage:
-        python main.py <json_file_path>
+        python main.py <json_file_path> [--limit N] [--sample first|uniform|time] [--keywords N] [--clusters N]
+                       [--use-cache] [--streaming] [--dedup]
         
     Args (via command line):
         json_file_path: Path to the JSON file containing Reddit submission data
         
     Note:
-        The function processes the first 1000 submissions from the file
+        By default the function processes the first 1000 submissions from the file
+        (--sample draws them at random instead, or stratified by creation time)
         and extracts the top 100 most interesting keywords, clustering
-        them into 10 groups.
+        them into 10 groups. With --use-cache, normalized text is read from a
+        memory-mapped store built once per dump, so reruns skip parsing and
+        normalization entirely. With --streaming, keywords are extracted from
+        the whole file in bounded memory. With --dedup, near-duplicate
+        submissions are dropped before keywords are extracted.
     """
-    # Initialize text normalizer for cleaning Reddit content
-    text_normalizer = RedditTextNormalizer()
+    args = parse_args(argv)
 
-    # Load data from command line argument
-    filename = sys.argv[1]
-    generator = load_json_line_by_line(filename)
-    
-    # Get the first 1000 submissions for analysis
-    top_n = get_x_results(generator, 1000)
-    
-    # Normalize text content by combining title and body text
-    normalized_strings = list(map(lambda x: text_normalizer.normalize_text(x['title'] + " " + x['selftext']), top_n))
+    # The in-memory extractor only handles a sample; the streaming one reads everything
+    limit = args.limit if args.limit is not None else (None if args.streaming and args.sample == "first" else 1000)
+
+    def texts():
+        normalized = iter_normalized_texts(args, limit)
+        # Reposts and spam templates would inflate document frequencies
+        return deduplicate(normalized, args.dedup_threshold) if args.dedup else normalized
+
+    if args.streaming:
+        # With the cache a second pass is cheap, so use it to rank candidates exactly
+        interesting_keywords = stream_interesting_keywords(
+            texts(),
+            top_n=args.keywords,
+            refine_texts=texts() if args.use_cache else None,
+        )
+    else:
+        normalized_strings = list(texts())
 
-    # Extract the most interesting keywords from the normalized content
-    interesting_keywords = get_interesting_keywords(normalized_strings, top_n=100)
+        # Extract the most interesting keywords from the normalized content
+        interesting_keywords = get_interesting_keywords(normalized_strings, top_n=args.keywords)
     
     # Cluster the keywords into topic groups
-    clusters = cluster_keywords(interesting_keywords, num_clusters=10)
+    embedding_store = None if args.no_embedding_cache else EmbeddingStore()
+    clusters = cluster_keywords(interesting_keywords, num_clusters=args.clusters, embedding_store=embedding_store,
+                                backend=args.cluster_backend)
 
     # Print the clustering results
     print(clusters)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
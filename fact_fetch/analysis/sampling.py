@@ -0,0 +1,578 @@
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from fact_fetch.analysis.json_data_loader import load_json_fields, parse_json_fields
+from fact_fetch.analysis.sharded_loader import (DEFAULT_FIELDS, DEFAULT_SHARD_SIZE, find_submission_dumps,
+                                                iter_shard_tasks)
+from fact_fetch.utils.parallel import bounded_map
+
+logger = logging.getLogger(__name__)
+
+# Ways of dividing submissions into strata
+STRATIFICATIONS = ('time', 'subreddit')
+
+# Widths of the created_utc buckets used for time stratification
+TIME_BUCKETS = ('year', 'month', 'week', 'day')
+
+# Ways of dividing the sample between strata
+ALLOCATIONS = ('proportional', 'equal')
+
+# With proportional allocation, the strata together keep this many times the sample size,
+# and every stratum keeps at least this many items, so that no stratum comes up short
+_PROPORTIONAL_SLACK = 3
+_STRATUM_FLOOR = 16
+
+
+def sample_key(record: dict[str, Any], seed: int = 0, position: Optional[int] = None) -> float:
+    """
+    Derive the random key of a record for bottom-k sampling.
+
+    The key is a hash of the seed and the record's ID, so a record gets the
+    same key in every shard and every run with the same seed. Records
+    without an ID fall back to their position in the stream, or to their
+    content.
+
+    Args:
+        record (dict): Submission record
+        seed (int): Sampling seed (default: 0)
+        position (Optional[int]): Position of the record in the stream, used if it has no ID
+
+    Returns:
+        float: Key uniformly distributed in [0, 1)
+    """
+    identity = record.get('id')
+    if identity is None:
+        identity = position if position is not None else json.dumps(record, sort_keys=True, default=str)
+    digest = hashlib.blake2b(f"{seed}:{identity}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+class Reservoir:
+    """
+    Uniform random sample of at most k items from a stream, in O(k) memory.
+
+    Every item gets a random key and the reservoir keeps the k items with
+    the smallest keys (bottom-k sampling). Because keys come from a hash
+    of the item rather than from the order of arrival, reservoirs filled
+    from different shards of the same data can be merged exactly: the k
+    smallest keys of the union are the sample of the whole stream.
+
+    The reservoir also remembers the smallest key it ever discarded and
+    rejects items at or above it, so every item with a smaller key is kept.
+    Reservoirs trimmed to different thresholds (see shrink_below()) thus
+    still merge exactly.
+    """
+
+    def __init__(self, k: int):
+        """
+        Create an empty reservoir.
+
+        Args:
+            k (int): Maximum number of items kept
+        """
+        self.k = k
+        self.seen = 0
+        self.threshold = math.inf
+        # Max-heap on the key (keys are negated), so the largest kept key is at the top
+        self._heap: list[tuple[float, int, Any]] = []
+        self._counter = itertools.count()
+
+    def add(self, key: float, item: Any):
+        """
+        Offer an item to the reservoir.
+
+        Args:
+            key (float): Random key of the item
+            item (Any): The item
+        """
+        self.seen += 1
+        self._push(key, item)
+
+    def _push(self, key: float, item: Any):
+        if key >= self.threshold:
+            return
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (-key, next(self._counter), item))
+        elif self._heap and key < -self._heap[0][0]:
+            evicted = heapq.heapreplace(self._heap, (-key, next(self._counter), item))
+            self.threshold = -evicted[0]
+        else:
+            self.threshold = key
+
+    def merge(self, other: 'Reservoir'):
+        """
+        Add the sample of another reservoir, e.g. one filled from another shard.
+
+        Args:
+            other (Reservoir): Reservoir filled from a disjoint part of the stream
+        """
+        self.seen += other.seen
+        if other.threshold < self.threshold:
+            # Items of this reservoir above the other's threshold may not be among the smallest keys
+            self.shrink_below(other.threshold)
+        for negated_key, _, item in other._heap:
+            self._push(-negated_key, item)
+
+    def shrink_below(self, threshold: float):
+        """
+        Drop the items whose key is at least threshold.
+
+        Args:
+            threshold (float): New upper bound of the kept keys
+        """
+        while self._heap and -self._heap[0][0] >= threshold:
+            heapq.heappop(self._heap)
+        self.threshold = min(self.threshold, threshold)
+
+    def shrink(self, k: int):
+        """
+        Keep only the k items with the smallest keys, which is still a uniform sample.
+
+        Args:
+            k (int): New maximum number of items
+        """
+        self.k = k
+        while len(self._heap) > max(k, 0):
+            self.threshold = -heapq.heappop(self._heap)[0]
+
+    def keys(self) -> list[float]:
+        """
+        Get the keys of the sampled items.
+
+        Returns:
+            list[float]: Keys in increasing order
+        """
+        return sorted(-entry[0] for entry in self._heap)
+
+    def items(self) -> list[Any]:
+        """
+        Get the sampled items.
+
+        Returns:
+            list: Items ordered by key, i.e. in random order
+        """
+        return [item for _, _, item in sorted(self._heap, key=lambda entry: (-entry[0], entry[1]))]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __getstate__(self):
+        # itertools.count cannot be pickled; reservoirs travel back from worker processes
+        state = self.__dict__.copy()
+        state['_counter'] = len(self._heap)
+        return state
+
+    def __setstate__(self, state):
+        state['_counter'] = itertools.count(state['_counter'])
+        self.__dict__.update(state)
+
+
+class StratifiedReservoir:
+    """
+    One reservoir per stratum, e.g. per month or per subreddit.
+
+    Once the stream has been read, the number of items seen in each stratum
+    is known, so sample() can divide a total sample size equally or
+    proportionally between the strata without a second pass.
+
+    Without an allocation, each stratum keeps up to k items, i.e. up to
+    k * strata items in total. With an allocation, k is the total sample
+    size and the strata share a budget of O(k + strata) items:
+
+    - equal: a stratum can never get more than k / strata items, and the
+      number of strata only grows, so each stratum is capped at that share.
+    - proportional: the strata together keep the items whose key is below
+      a common level, chosen so that about _PROPORTIONAL_SLACK * k items
+      are kept, and each stratum also keeps its _STRATUM_FLOOR smallest
+      keys. A stratum then holds about _PROPORTIONAL_SLACK times its share
+      of the sample, whatever order the records arrive in.
+
+    The reservoirs are trimmed whenever the kept items exceed the budget.
+    Trimming keeps the items with the smallest keys, so the sample of each
+    stratum stays exact; sample() reports the (unlikely) case of a
+    proportional stratum holding fewer items than its share.
+    """
+
+    def __init__(self, k: int, stratum: Callable[[dict[str, Any]], Hashable], allocation: Optional[str] = None):
+        """
+        Create an empty stratified reservoir.
+
+        Args:
+            k (int): Total sample size with an allocation, otherwise maximum number of items kept per stratum
+            stratum (Callable): Function mapping a record to its stratum (must be picklable
+                                to fill reservoirs in worker processes)
+            allocation (Optional[str]): 'proportional' or 'equal' to share a budget between the strata,
+                                        or None to keep k items per stratum (default: None)
+        """
+        if allocation is not None and allocation not in ALLOCATIONS:
+            raise ValueError(f"Unknown allocation {allocation!r}; expected one of {ALLOCATIONS}")
+        self.k = k
+        self.stratum = stratum
+        self.allocation = allocation
+        self.reservoirs: dict[Hashable, Reservoir] = {}
+        self._stored = 0
+
+    def _budget(self) -> float:
+        """
+        Get the number of kept items above which the reservoirs are trimmed.
+
+        The budget is twice what the reservoirs hold after trimming, so
+        trimming happens at most once per that many additions.
+        """
+        if self.allocation == 'equal':
+            return 2 * (self.k + len(self.reservoirs))
+        if self.allocation == 'proportional':
+            return 2 * (_PROPORTIONAL_SLACK * self.k + _STRATUM_FLOOR * len(self.reservoirs))
+        return math.inf
+
+    def _trim(self):
+        """
+        Trim every stratum to its share of the budget.
+        """
+        if self.allocation == 'equal':
+            share = math.ceil(self.k / len(self.reservoirs))
+            for reservoir in self.reservoirs.values():
+                reservoir.shrink(min(reservoir.k, share))
+        elif self.allocation == 'proportional':
+            kept = _PROPORTIONAL_SLACK * self.k
+            keys = [key for reservoir in self.reservoirs.values() for key in reservoir.keys()]
+            level = heapq.nsmallest(kept + 1, keys)[-1] if len(keys) > kept else math.inf
+            for reservoir in self.reservoirs.values():
+                keys = reservoir.keys()
+                reservoir.shrink_below(max(level, keys[_STRATUM_FLOOR] if len(keys) > _STRATUM_FLOOR else math.inf))
+        self._stored = sum(len(reservoir) for reservoir in self.reservoirs.values())
+
+    def add(self, key: float, record: dict[str, Any]):
+        """
+        Offer a record to the reservoir of its stratum.
+
+        Args:
+            key (float): Random key of the record
+            record (dict): The record
+        """
+        stratum = self.stratum(record)
+        reservoir = self.reservoirs.get(stratum)
+        if reservoir is None:
+            reservoir = self.reservoirs[stratum] = Reservoir(self.k)
+            if self.allocation == 'equal':
+                reservoir.k = math.ceil(self.k / len(self.reservoirs))
+
+        kept = len(reservoir)
+        reservoir.add(key, record)
+        self._stored += len(reservoir) - kept
+        if self._stored > self._budget():
+            self._trim()
+
+    def merge(self, other: 'StratifiedReservoir'):
+        """
+        Add the samples of another stratified reservoir, stratum by stratum.
+
+        Args:
+            other (StratifiedReservoir): Reservoir filled from a disjoint part of the stream
+        """
+        for stratum, reservoir in other.reservoirs.items():
+            if stratum in self.reservoirs:
+                self.reservoirs[stratum].merge(reservoir)
+            else:
+                self.reservoirs[stratum] = reservoir
+        self._trim()
+
+    def counts(self) -> dict[Hashable, int]:
+        """
+        Count the records seen in each stratum.
+
+        Returns:
+            dict: Stratum -> number of records seen
+        """
+        return {stratum: reservoir.seen for stratum, reservoir in sorted(self.reservoirs.items())}
+
+    def sample(self, total: Optional[int] = None, allocation: str = 'proportional') -> list[dict[str, Any]]:
+        """
+        Draw the stratified sample.
+
+        Args:
+            total (Optional[int]): Total sample size (default: k per stratum)
+            allocation (str): 'proportional' to the size of each stratum, or 'equal' (default: 'proportional')
+
+        Returns:
+            list: Records grouped by stratum, in stratum order
+        """
+        strata = sorted(self.reservoirs)
+        if total is not None and len(strata) > total:
+            logger.warning(f"{len(strata)} strata for a sample of {total}: most strata get at most one record, "
+                           f"consider wider strata")
+        if total is None:
+            sizes = {stratum: self.k for stratum in strata}
+        elif allocation == 'equal':
+            sizes = {stratum: total // len(strata) + (index < total % len(strata))
+                     for index, stratum in enumerate(strata)}
+        else:
+            # Largest remainder method, so the sizes add up to the total
+            seen = sum(self.reservoirs[stratum].seen for stratum in strata)
+            quotas = {stratum: total * self.reservoirs[stratum].seen / seen for stratum in strata}
+            sizes = {stratum: int(quota) for stratum, quota in quotas.items()}
+            for stratum in sorted(strata, key=lambda s: sizes[s] - quotas[s])[:total - sum(sizes.values())]:
+                sizes[stratum] += 1
+
+        records = []
+        shortfall = 0
+        for stratum in strata:
+            reservoir = self.reservoirs[stratum]
+            shortfall += max(0, min(sizes[stratum], reservoir.seen) - len(reservoir))
+            reservoir.shrink(min(sizes[stratum], len(reservoir)))
+            records.extend(reservoir.items())
+        if shortfall:
+            logger.warning(f"Stratified sample is {shortfall} records short: some strata kept fewer records "
+                           f"than their share")
+        return records
+
+
+def time_bucket(record: dict[str, Any], bucket: str = 'month') -> str:
+    """
+    Get the created_utc bucket of a submission.
+
+    Args:
+        record (dict): Submission record with a 'created_utc' field
+        bucket (str): 'year', 'month', 'week' or 'day' (default: 'month')
+
+    Returns:
+        str: Bucket label such as '2021-03', or 'unknown' without a timestamp
+    """
+    try:
+        created = datetime.fromtimestamp(float(record.get('created_utc')), tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return 'unknown'
+    if bucket == 'year':
+        return f"{created.year:04d}"
+    if bucket == 'month':
+        return f"{created.year:04d}-{created.month:02d}"
+    if bucket == 'week':
+        year, week, _ = created.isocalendar()
+        return f"{year:04d}-W{week:02d}"
+    return created.strftime('%Y-%m-%d')
+
+
+class _TimeStratum:
+    """
+    Picklable stratum function for time stratification.
+    """
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+
+    def __call__(self, record: dict[str, Any]) -> str:
+        return time_bucket(record, self.bucket)
+
+
+def _subreddit_stratum(record: dict[str, Any]) -> str:
+    return record.get('subreddit') or 'unknown'
+
+
+def _new_reservoir(k: int, stratify: Optional[str], bucket: str, allocation: Optional[str] = None):
+    """
+    Create the reservoir for a sampling mode.
+
+    Args:
+        k (int): Sample size (per stratum when stratified without an allocation)
+        stratify (Optional[str]): None, 'time' or 'subreddit'
+        bucket (str): Width of the time buckets
+        allocation (Optional[str]): How a stratified sample of k is divided, or None for k per stratum
+
+    Returns:
+        Reservoir or StratifiedReservoir: An empty reservoir
+    """
+    if stratify is None:
+        return Reservoir(k)
+    if stratify == 'time':
+        return StratifiedReservoir(k, _TimeStratum(bucket), allocation)
+    if stratify == 'subreddit':
+        return StratifiedReservoir(k, _subreddit_stratum, allocation)
+    raise ValueError(f"Unknown stratification {stratify!r}; expected one of {STRATIFICATIONS}")
+
+
+def reservoir_sample(records: Iterable[dict[str, Any]], k: int, seed: int = 0) -> list[dict[str, Any]]:
+    """
+    Draw a uniform sample of k records from a stream in one pass.
+
+    Args:
+        records (Iterable[dict]): Records, e.g. from load_json_line_by_line()
+        k (int): Sample size
+        seed (int): Sampling seed (default: 0)
+
+    Returns:
+        list: Up to k records in random order
+    """
+    reservoir = Reservoir(k)
+    for position, record in enumerate(records):
+        reservoir.add(sample_key(record, seed, position), record)
+    return reservoir.items()
+
+
+def stratified_sample(records: Iterable[dict[str, Any]], k: int, stratify: str = 'time', bucket: str = 'month',
+                      seed: int = 0, total: Optional[int] = None,
+                      allocation: str = 'proportional') -> list[dict[str, Any]]:
+    """
+    Draw a stratified sample from a stream in one pass.
+
+    Args:
+        records (Iterable[dict]): Records with 'created_utc' (time) or 'subreddit' fields
+        k (int): Maximum sample size per stratum
+        stratify (str): 'time' or 'subreddit' (default: 'time')
+        bucket (str): Width of the time buckets (default: 'month')
+        seed (int): Sampling seed (default: 0)
+        total (Optional[int]): Total sample size divided between the strata (default: k per stratum)
+        allocation (str): 'proportional' or 'equal' (default: 'proportional')
+
+    Returns:
+        list: Records grouped by stratum
+    """
+    if total is None:
+        reservoir = _new_reservoir(k, stratify, bucket)
+    else:
+        reservoir = _new_reservoir(total, stratify, bucket, allocation)
+    for position, record in enumerate(records):
+        reservoir.add(sample_key(record, seed, position), record)
+    return reservoir.sample(total, allocation)
+
+
+def _sample_shard(task: tuple) -> Any:
+    """
+    Fill a reservoir from one byte range or line chunk of a dump inside a worker process.
+
+    Args:
+        task (tuple): (shard task from iter_shard_tasks(), k, stratify, bucket, allocation, seed)
+
+    Returns:
+        Reservoir or StratifiedReservoir: The shard's reservoir
+    """
+    (source, subreddit, start, end, fields, _), k, stratify, bucket, allocation, seed = task
+    if isinstance(source, bytes):
+        records = parse_json_fields(source.split(b'\n'), fields, subreddit)
+    else:
+        records = load_json_fields(source, fields, start, end)
+
+    reservoir = _new_reservoir(k, stratify, bucket, allocation)
+    for record in records:
+        record['subreddit'] = subreddit
+        reservoir.add(sample_key(record, seed), record)
+    return reservoir
+
+
+def sample_submissions(file_paths: Optional[list[str]] = None, k: int = 1000, stratify: Optional[str] = None,
+                       bucket: str = 'month', seed: int = 0, allocation: str = 'proportional',
+                       fields: Optional[list[str]] = None, max_workers: Optional[int] = None,
+                       shard_size: int = DEFAULT_SHARD_SIZE) -> list[dict[str, Any]]:
+    """
+    Sample submissions from several dumps in one parallel pass.
+
+    Every shard of every dump fills its own reservoir in a worker process,
+    and the reservoirs are merged as they arrive. Keys are derived from
+    submission IDs, so the sample depends only on the seed, not on the
+    sharding or the number of workers.
+
+    Args:
+        file_paths (Optional[list[str]]): Dumps to sample (default: all bundled dumps)
+        k (int): Total sample size (default: 1000)
+        stratify (Optional[str]): None for a uniform sample, 'time' to stratify by created_utc bucket,
+                                  or 'subreddit' to stratify by dump (default: None)
+        bucket (str): Width of the time buckets: 'year', 'month', 'week' or 'day' (default: 'month')
+        seed (int): Sampling seed (default: 0)
+        allocation (str): How a stratified sample is divided: 'proportional' or 'equal' (default: 'proportional')
+        fields (Optional[list[str]]): Fields to keep from each submission (default: DEFAULT_FIELDS)
+        max_workers (Optional[int]): Number of worker processes (default: number of CPUs)
+        shard_size (int): Approximate size of each shard in bytes (default: 64 MiB)
+
+    Returns:
+        list: Sampled submission records with an added 'subreddit' field
+
+    Note:
+        Stratified reservoirs share one budget of k records between the
+        strata, so each worker holds O(k + strata) records: memory depends
+        on k and the number of strata, not on the size of the dumps.
+    """
+    if file_paths is None:
+        file_paths = find_submission_dumps()
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File {file_path} does not exist")
+
+    fields = list(fields or DEFAULT_FIELDS)
+    # Keys need the ID and time strata need the timestamp
+    fields += [field for field in ('id', 'created_utc') if field not in fields]
+
+    tasks = ((shard, k, stratify, bucket, allocation, seed) for shard in iter_shard_tasks(file_paths, fields, False, shard_size))
+
+    reservoir = _new_reservoir(k, stratify, bucket, allocation)
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for shard_reservoir in bounded_map(executor, _sample_shard, tasks, 2 * max_workers, ordered=False):
+            reservoir.merge(shard_reservoir)
+
+    if stratify is None:
+        return reservoir.items()
+    return reservoir.sample(k, allocation)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the sampler.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Draw a reproducible random sample of submissions from dumps.")
+    parser.add_argument("files", nargs="*", help="Dumps to sample (default: every dump in analysis/resources)")
+    parser.add_argument("-k", "--size", type=int, default=1000, help="Sample size (default: 1000)")
+    parser.add_argument("--stratify", choices=STRATIFICATIONS,
+                        help="Stratify by created_utc bucket or by subreddit (default: uniform sample)")
+    parser.add_argument("--bucket", choices=TIME_BUCKETS, default="month",
+                        help="Width of the time buckets (default: month). Memory grows with k plus the number "
+                             "of strata; 'day' gives thousands of strata over multi-year dumps, most of which "
+                             "then get at most one record")
+    parser.add_argument("--allocation", choices=ALLOCATIONS, default="proportional",
+                        help="How a stratified sample is divided between strata (default: proportional)")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed (default: 0)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--output", help="Write the sample as NDJSON to this file (default: print a summary)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Sample submissions and write them as NDJSON, or summarize the sample by stratum.
+    """
+    args = parse_args(argv)
+
+    started = time.perf_counter()
+    sample = sample_submissions(args.files or None, args.size, args.stratify, args.bucket, args.seed,
+                                args.allocation, max_workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            for record in sample:
+                file.write(json.dumps(record) + "\n")
+
+    strata = {}
+    for record in sample:
+        stratum = time_bucket(record, args.bucket) if args.stratify == 'time' else record['subreddit']
+        strata[stratum] = strata.get(stratum, 0) + 1
+    print(json.dumps(dict(sorted(strata.items())), indent=2))
+    print(f"Sampled {len(sample)} submissions in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, Optional
+
+from fact_fetch.analysis.json_data_loader import detect_compression, iter_raw_lines, load_json_fields, parse_json_fields
+from fact_fetch.utils.parallel import bounded_map
+from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+# Directory holding the bundled subreddit dumps
+DEFAULT_RESOURCES_DIR = os.path.join(os.path.dirname(__file__), 'resources')
+
+# Fields loaded from each submission unless others are requested
+DEFAULT_FIELDS = ['id', 'created_utc', 'title', 'selftext']
+
+# File name suffixes of compressed dumps, e.g. 'vegan_submissions.zst'
+COMPRESSED_SUFFIXES = ('.zst', '.gz', '.xz')
+
+# Target size of each byte range handed to a worker
+DEFAULT_SHARD_SIZE = 64 * 1024 * 1024
+
+# Per-process normalizer, created lazily inside each worker
+_normalizer: Optional[RedditTextNormalizer] = None
+
+
+def find_submission_dumps(directory: str = DEFAULT_RESOURCES_DIR) -> list[str]:
+    """
+    Find all subreddit submission dumps in a directory.
+
+    Args:
+        directory (str): Directory to search (default: the bundled analysis resources)
+
+    Returns:
+        list: Sorted paths of every '*_submissions' file in the directory, compressed or not
+    """
+    return sorted(path for suffix in ('',) + COMPRESSED_SUFFIXES
+                  for path in glob.glob(os.path.join(directory, '*_submissions' + suffix)))
+
+
+def subreddit_from_path(file_path: str) -> str:
+    """
+    Derive the subreddit name from a dump file name.
+
+    Args:
+        file_path (str): Path such as 'resources/vegan_submissions' or 'vegan_submissions.zst'
+
+    Returns:
+        str: The subreddit name, e.g. 'vegan'
+    """
+    name = os.path.basename(file_path)
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name[:-len('_submissions')] if name.endswith('_submissions') else name
+
+
+def split_byte_ranges(file_path: str, shard_size: int = DEFAULT_SHARD_SIZE) -> list[tuple[int, int]]:
+    """
+    Split a file into newline-aligned byte ranges.
+
+    Every range starts at the beginning of a line and ends just after a
+    newline (or at the end of the file), so ranges can be parsed
+    independently of each other.
+
+    Args:
+        file_path (str): Path to the file to split
+        shard_size (int): Approximate size of each range in bytes (default: 64 MiB)
+
+    Returns:
+        list: (start, end) byte offsets covering the whole file
+    """
+    size = os.path.getsize(file_path)
+    ranges = []
+    start = 0
+    with open(file_path, 'rb') as file:
+        while start < size:
+            # Move the tentative cut forward to the end of the line it falls in
+            file.seek(min(start + shard_size, size))
+            file.readline()
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def iter_line_chunks(file_path: str, chunk_size: int = DEFAULT_SHARD_SIZE) -> Iterator[bytes]:
+    """
+    Read a (typically compressed) file as chunks of whole lines.
+
+    Compressed files cannot be split into byte ranges, so the parent
+    process decompresses them as a stream and hands the workers chunks of
+    raw lines instead.
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Approximate size of each chunk in decompressed bytes (default: 64 MiB)
+
+    Returns:
+        generator: Yields newline-separated lines as bytes
+    """
+    lines, size = [], 0
+    for line in iter_raw_lines(file_path):
+        lines.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield b'\n'.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b'\n'.join(lines)
+
+
+def iter_shard_tasks(file_paths: list[str], fields: list[str], normalize: bool,
+                shard_size: int) -> Iterator[tuple[Any, str, int, Optional[int], list[str], bool]]:
+    """
+    Split dumps into worker tasks: byte ranges of uncompressed dumps, line chunks of compressed ones.
+
+    Args:
+        file_paths (list[str]): Dumps to load
+        fields (list[str]): Fields to keep from each submission
+        normalize (bool): Whether workers add a 'normalized_text' field
+        shard_size (int): Approximate size of each task in bytes
+
+    Returns:
+        generator: Yields (source, subreddit, start, end, fields, normalize) tuples, where
+                   source is a file path or a chunk of raw lines
+    """
+    for file_path in file_paths:
+        subreddit = subreddit_from_path(file_path)
+        if detect_compression(file_path) is not None:
+            for chunk in iter_line_chunks(file_path, shard_size):
+                yield chunk, subreddit, 0, None, fields, normalize
+        else:
+            for start, end in split_byte_ranges(file_path, shard_size):
+                yield file_path, subreddit, start, end, fields, normalize
+
+
+def _load_shard(task: tuple[Any, str, int, Optional[int], list[str], bool]) -> list[dict[str, Any]]:
+    """
+    Parse (and optionally normalize) one byte range or line chunk of a dump inside a worker process.
+
+    Args:
+        task (tuple): (file_path or chunk of raw lines, subreddit, start, end, fields, normalize)
+
+    Returns:
+        list: Records from the range, tagged with their source subreddit
+    """
+    global _normalizer
+
+    source, subreddit, start, end, fields, normalize = task
+    if normalize and _normalizer is None:
+        _normalizer = RedditTextNormalizer()
+
+    if isinstance(source, bytes):
+        parsed = parse_json_fields(source.split(b'\n'), fields, subreddit)
+    else:
+        parsed = load_json_fields(source, fields, start, end)
+
+    records = []
+    for record in parsed:
+        record['subreddit'] = subreddit
+        if normalize:
+            # Combine title and body the same way the analysis entry point does
+            text = (record.get('title') or "") + " " + (record.get('selftext') or "")
+            record['normalized_text'] = _normalizer.normalize_text(text)
+        records.append(record)
+    return records
+
+
+def load_submissions_parallel(file_paths: Optional[list[str]] = None, fields: Optional[list[str]] = None,
+                              normalize: bool = True, ordered: bool = True, max_workers: Optional[int] = None,
+                              shard_size: int = DEFAULT_SHARD_SIZE) -> Iterator[dict[str, Any]]:
+    """
+    Load and normalize submissions from several dumps using a process pool.
+
+    Each dump is split into newline-aligned byte ranges which are parsed and
+    normalized by worker processes, so a full pass over all dumps scales with
+    the number of cores instead of running on a single one. Compressed dumps
+    are decompressed as a stream in this process and sent to the workers as
+    chunks of lines.
+
+    Args:
+        file_paths (Optional[list[str]]): Dumps to load (default: all bundled '*_submissions' files)
+        fields (Optional[list[str]]): Fields to keep from each submission (default: DEFAULT_FIELDS)
+        normalize (bool): Add a 'normalized_text' field built from title and selftext (default: True)
+        ordered (bool): Yield records in file order (default: True). Unordered
+                        streaming yields each range as soon as it is done.
+        max_workers (Optional[int]): Number of worker processes (default: number of CPUs)
+        shard_size (int): Approximate size of each byte range in bytes (default: 64 MiB)
+
+    Returns:
+        generator: Yields submission dictionaries with an added 'subreddit' field
+
+    Note:
+        At most two ranges per worker are held in memory at a time, so memory
+        use depends on shard_size and max_workers, not on the size of the dumps.
+    """
+    if file_paths is None:
+        file_paths = find_submission_dumps()
+    fields = list(fields or DEFAULT_FIELDS)
+    if normalize:
+        # Normalization needs the text fields even if the caller did not ask for them
+        fields += [field for field in ('title', 'selftext') if field not in fields]
+
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File {file_path} does not exist")
+
+    tasks = iter_shard_tasks(file_paths, fields, normalize, shard_size)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for records in bounded_map(executor, _load_shard, tasks, 2 * max_workers, ordered):
+            yield from records
+
+
+if __name__ == "__main__":
+    """
+    Test function to measure parallel loading throughput.
+
+    Loads every dump given on the command line (or all bundled dumps)
+    and prints the number of submissions per subreddit.
+
+    Usage:
+        python -m fact_fetch.analysis.sharded_loader [file_path ...]
+    """
+    started = time.perf_counter()
+    counts = {}
+    for submission in load_submissions_parallel(sys.argv[1:] or None, ordered=False):
+        counts[submission['subreddit']] = counts.get(submission['subreddit'], 0) + 1
+
+    elapsed = time.perf_counter() - started
+    print(counts)
+    print(f"Loaded {sum(counts.values())} submissions in {elapsed:.1f}s")
@@ -0,0 +1,387 @@
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from typing import Iterator, Optional
+
+import numpy as np
+
+from fact_fetch.analysis.sharded_loader import load_submissions_parallel
+from fact_fetch.utils.paths import cache_path
+from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+logger = logging.getLogger(__name__)
+
+# Default location of the columnar stores, one sub-directory per source dump
+DEFAULT_CACHE_DIR = cache_path('submissions')
+
+# Bump when the on-disk layout changes
+STORE_FORMAT = 1
+
+# Number of records buffered in memory before they are appended to the column files
+_WRITE_BATCH = 50_000
+
+
+def _sha256(file_path: str, block_size: int = 16 * 1024 * 1024) -> str:
+    """
+    Hash a file in large blocks.
+
+    Args:
+        file_path (str): Path to the file
+        block_size (int): Number of bytes hashed at a time (default: 16 MiB)
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _store_dir(source_path: str, cache_dir: str) -> str:
+    """
+    Get the directory holding the store for a source dump.
+
+    Args:
+        source_path (str): Path to the source dump
+        cache_dir (str): Root directory of the cache
+
+    Returns:
+        str: Directory of the store for this dump
+    """
+    name = os.path.basename(source_path)
+    # Disambiguate dumps with the same file name in different directories
+    suffix = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{name}-{suffix}")
+
+
+def _read_meta(directory: str) -> Optional[dict]:
+    """
+    Read the metadata of a store, if it exists.
+
+    Args:
+        directory (str): Directory of the store
+
+    Returns:
+        Optional[dict]: The metadata, or None if the store is missing or unreadable
+    """
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_store_valid(source_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> bool:
+    """
+    Check whether the cached store of a dump is up to date.
+
+    A store is valid when it was written with the current store format and
+    normalizer version from a source file with the same content hash. The
+    hash is only recomputed when the size or modification time of the source
+    changed, so the check is cheap for untouched dumps.
+
+    Args:
+        source_path (str): Path to the source dump
+        cache_dir (str): Root directory of the cache (default: DEFAULT_CACHE_DIR)
+
+    Returns:
+        bool: True if the store can be used as is
+    """
+    meta = _read_meta(_store_dir(source_path, cache_dir))
+    if meta is None:
+        return False
+    if meta.get('format') != STORE_FORMAT or meta.get('normalizer_version') != RedditTextNormalizer.VERSION:
+        return False
+
+    stat = os.stat(source_path)
+    if meta.get('source_size') == stat.st_size and meta.get('source_mtime_ns') == stat.st_mtime_ns:
+        return True
+    return meta.get('source_sha256') == _sha256(source_path)
+
+
+def ingest(source_path: str, cache_dir: str = DEFAULT_CACHE_DIR, max_workers: Optional[int] = None) -> str:
+    """
+    Parse and normalize a dump once and write it as a columnar store.
+
+    The store holds one file per column:
+        - ids.bin / ids.offsets: submission ids as a contiguous UTF-8 buffer plus int64 offsets
+        - created_utc: int64 creation timestamps
+        - subreddit: uint16 codes into the 'subreddits' list of meta.json
+        - text.bin / text.offsets: normalized text as a contiguous UTF-8 buffer plus int64 offsets
+
+    Args:
+        source_path (str): Path to the source dump
+        cache_dir (str): Root directory of the cache (default: DEFAULT_CACHE_DIR)
+        max_workers (Optional[int]): Number of worker processes used for parsing (default: number of CPUs)
+
+    Returns:
+        str: Directory of the written store
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"File {source_path} does not exist")
+
+    directory = _store_dir(source_path, cache_dir)
+    tmp_directory = directory + '.tmp'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    stat = os.stat(source_path)
+    subreddits = {}
+    count = 0
+    id_offset = 0
+    text_offset = 0
+
+    columns = {name: open(os.path.join(tmp_directory, name), 'wb')
+               for name in ('ids.bin', 'ids.offsets', 'created_utc', 'subreddit', 'text.bin', 'text.offsets')}
+    try:
+        # Offset arrays hold n + 1 entries, starting with 0
+        np.zeros(1, dtype=np.int64).tofile(columns['ids.offsets'])
+        np.zeros(1, dtype=np.int64).tofile(columns['text.offsets'])
+
+        def flush(batch):
+            nonlocal id_offset, text_offset
+            ids = [submission_id.encode('utf-8') for submission_id, _, _, _ in batch]
+            texts = [text.encode('utf-8') for _, _, _, text in batch]
+
+            columns['ids.bin'].write(b''.join(ids))
+            columns['text.bin'].write(b''.join(texts))
+            id_offsets = id_offset + np.cumsum([len(value) for value in ids], dtype=np.int64)
+            text_offsets = text_offset + np.cumsum([len(value) for value in texts], dtype=np.int64)
+            id_offsets.tofile(columns['ids.offsets'])
+            text_offsets.tofile(columns['text.offsets'])
+            id_offset = int(id_offsets[-1])
+            text_offset = int(text_offsets[-1])
+
+            np.array([created for _, created, _, _ in batch], dtype=np.int64).tofile(columns['created_utc'])
+            np.array([code for _, _, code, _ in batch], dtype=np.uint16).tofile(columns['subreddit'])
+
+        batch = []
+        for submission in load_submissions_parallel([source_path], fields=['id', 'created_utc'],
+                                                    max_workers=max_workers):
+            code = subreddits.setdefault(submission['subreddit'], len(subreddits))
+            try:
+                created = int(float(submission.get('created_utc') or 0))
+            except (TypeError, ValueError):
+                created = 0
+
+            batch.append((str(submission.get('id') or ""), created, code, submission['normalized_text']))
+            if len(batch) >= _WRITE_BATCH:
+                flush(batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            flush(batch)
+            count += len(batch)
+    finally:
+        for column in columns.values():
+            column.close()
+
+    meta = {
+        'format': STORE_FORMAT,
+        'normalizer_version': RedditTextNormalizer.VERSION,
+        'source_path': os.path.abspath(source_path),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_sha256': _sha256(source_path),
+        'count': count,
+        'subreddits': list(subreddits),
+    }
+    with open(os.path.join(tmp_directory, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, indent=2)
+
+    # Replace the previous store only once the new one is complete
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    logger.info(f"Ingested {count} submissions from {source_path} into {directory}")
+    return directory
+
+
+class SubmissionStore:
+    """
+    Read-only, memory-mapped view of a columnar submission store.
+
+    Columns are memory-mapped rather than loaded, so opening a store is
+    instant and only the pages that are actually read are brought into
+    memory. Numeric columns are exposed as numpy arrays backed by the
+    mapped files; text is sliced straight out of the mapped buffer.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Open a store written by ingest().
+
+        Args:
+            directory (str): Directory of the store
+
+        Raises:
+            FileNotFoundError: If the directory does not contain a store
+        """
+        meta = _read_meta(directory)
+        if meta is None:
+            raise FileNotFoundError(f"No submission store in {directory}")
+
+        self.directory = directory
+        self.meta = meta
+        self.subreddits = meta['subreddits']
+        self._count = meta['count']
+
+        self.created_utc = self._map_array('created_utc', np.int64, self._count)
+        self.subreddit_codes = self._map_array('subreddit', np.uint16, self._count)
+        self._id_offsets = self._map_array('ids.offsets', np.int64, self._count + 1)
+        self._text_offsets = self._map_array('text.offsets', np.int64, self._count + 1)
+        self._ids = self._map_buffer('ids.bin')
+        self._text = self._map_buffer('text.bin')
+
+    def _map_array(self, name: str, dtype, length: int) -> np.ndarray:
+        """
+        Memory-map a fixed-width column.
+
+        Args:
+            name (str): File name of the column
+            dtype: numpy dtype of the column
+            length (int): Number of entries in the column
+
+        Returns:
+            np.ndarray: Read-only array backed by the file
+        """
+        if length == 0:
+            # Empty files cannot be memory-mapped
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode='r', shape=(length,))
+
+    def _map_buffer(self, name: str) -> memoryview:
+        """
+        Memory-map a variable-width buffer.
+
+        Args:
+            name (str): File name of the buffer
+
+        Returns:
+            memoryview: Read-only view of the file contents
+        """
+        with open(os.path.join(self.directory, name), 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return memoryview(b'')
+            return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get_id(self, index: int) -> str:
+        """
+        Get the submission id of a record.
+
+        Args:
+            index (int): Position of the record in the store
+
+        Returns:
+            str: The submission id
+        """
+        return str(self._ids[self._id_offsets[index]:self._id_offsets[index + 1]], 'utf-8')
+
+    def get_subreddit(self, index: int) -> str:
+        """
+        Get the subreddit of a record.
+
+        Args:
+            index (int): Position of the record in the store
+
+        Returns:
+            str: The subreddit name
+        """
+        return self.subreddits[self.subreddit_codes[index]]
+
+    def text_view(self, index: int) -> memoryview:
+        """
+        Get the normalized text of a record without copying it.
+
+        Args:
+            index (int): Position of the record in the store
+
+        Returns:
+            memoryview: UTF-8 encoded text, backed by the mapped buffer
+        """
+        return self._text[self._text_offsets[index]:self._text_offsets[index + 1]]
+
+    def get_text(self, index: int) -> str:
+        """
+        Get the normalized text of a record.
+
+        Args:
+            index (int): Position of the record in the store
+
+        Returns:
+            str: The normalized title and body
+        """
+        return str(self.text_view(index), 'utf-8')
+
+    def iter_texts(self) -> Iterator[str]:
+        """
+        Iterate over the normalized text of every record in store order.
+
+        Returns:
+            generator: Yields each normalized text
+        """
+        offsets = self._text_offsets.tolist() if self._count else [0]
+        text = self._text
+        for start, end in zip(offsets, offsets[1:]):
+            yield str(text[start:end], 'utf-8')
+
+
+def open_store(source_path: str, cache_dir: str = DEFAULT_CACHE_DIR, max_workers: Optional[int] = None) -> SubmissionStore:
+    """
+    Open the store of a dump, ingesting the dump first if the store is missing or stale.
+
+    Args:
+        source_path (str): Path to the source dump
+        cache_dir (str): Root directory of the cache (default: DEFAULT_CACHE_DIR)
+        max_workers (Optional[int]): Number of worker processes used if ingestion is needed
+
+    Returns:
+        SubmissionStore: Memory-mapped view of the normalized submissions
+    """
+    if not is_store_valid(source_path, cache_dir):
+        ingest(source_path, cache_dir, max_workers)
+    return SubmissionStore(_store_dir(source_path, cache_dir))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the ingestion entry point.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Ingest submission dumps into the columnar cache.")
+    parser.add_argument("files", nargs="+", help="Dumps to ingest (optionally zstd-, gzip- or xz-compressed)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Root directory of the cache")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: number of CPUs)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Ingest submission dumps into the columnar cache, skipping dumps whose store is up to date.
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    for path in args.files:
+        started = time.perf_counter()
+        store = open_store(path, args.cache_dir, args.workers)
+        print(f"{path}: {len(store)} submissions ready in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
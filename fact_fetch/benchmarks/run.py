@@ -0,0 +1,565 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, NamedTuple, Optional
+
+from fact_fetch.benchmarks.synthetic import generate_posts, generate_records, sample_dump_texts, write_ndjson
+from fact_fetch.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+# Default locations of the results and of the baseline they are compared with
+DEFAULT_RESULTS_PATH = cache_path('benchmarks', 'results.json')
+DEFAULT_BASELINE_PATH = cache_path('benchmarks', 'baseline.json')
+
+# Sub-steps of RedditTextNormalizer benchmarked on their own
+NORMALIZER_STEPS = ('remove_urls', 'remove_reddit_formatting', 'remove_html', 'remove_deleted', 'remove_emojis',
+                    'normalize_whitespace', 'normalize_unicode')
+
+# Modules whose import time in a fresh interpreter is benchmarked, with the most seconds it may take.
+# Exceeding a budget is a regression even without a baseline, so heavy imports creeping back into
+# the command line or the TF-IDF path are caught.
+IMPORT_BUDGETS = {
+    'fact_fetch.cli': 0.25,
+    'fact_fetch.analysis.keyword_extraction': 0.5,
+    'fact_fetch.analysis.main': 0.75,
+}
+
+# Temporary input files, removed when the benchmark process exits
+_TEMPORARY_DIRECTORIES: list[tempfile.TemporaryDirectory] = []
+
+
+class BenchmarkConfig(NamedTuple):
+    """
+    Settings shared by all benchmarks.
+
+    Attributes:
+        posts (int): Number of synthetic posts in the corpus
+        seed (int): Seed of the synthetic corpus and of the dump samples
+        dumps (tuple[str, ...]): Dumps to sample real posts from, in addition to the synthetic ones
+        dump_sample (int): Number of posts sampled from each dump
+        min_time (float): Minimum number of seconds spent timing each benchmark
+        min_rounds (int): Minimum number of timed rounds
+    """
+    posts: int = 2000
+    seed: int = 0
+    dumps: tuple[str, ...] = ()
+    dump_sample: int = 1000
+    min_time: float = 1.0
+    min_rounds: int = 3
+
+
+class BenchmarkSkipped(Exception):
+    """
+    Raised by a benchmark setup when the benchmark cannot run in this environment.
+    """
+
+
+def _corpus(config: BenchmarkConfig) -> list[str]:
+    """
+    Build the text corpus: synthetic posts plus posts sampled from the dumps.
+
+    Args:
+        config (BenchmarkConfig): Benchmark settings
+
+    Returns:
+        list[str]: Post texts
+    """
+    texts = generate_posts(config.posts, seed=config.seed)
+    for file_path in config.dumps:
+        texts.extend(sample_dump_texts(file_path, config.dump_sample, seed=config.seed))
+    return texts
+
+
+def _setup_normalize_text(config: BenchmarkConfig):
+    """Normalize the whole corpus; one operation per post."""
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    normalizer = RedditTextNormalizer()
+    texts = _corpus(config)
+    return lambda: [normalizer.normalize_text(text) for text in texts], len(texts)
+
+
+def _setup_normalize_giant(config: BenchmarkConfig):
+    """Normalize giant posts only; one operation per post."""
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    normalizer = RedditTextNormalizer()
+    texts = generate_posts(20, seed=config.seed, giant_every=1)
+    return lambda: [normalizer.normalize_text(text) for text in texts], len(texts)
+
+
+def _make_step_setup(step: str) -> Callable:
+    """
+    Create the setup of a benchmark for one normalizer sub-step.
+
+    Args:
+        step (str): Name of the RedditTextNormalizer method
+
+    Returns:
+        Callable: The benchmark setup
+    """
+    def setup(config: BenchmarkConfig):
+        from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+        method = getattr(RedditTextNormalizer(), step)
+        texts = _corpus(config)
+        return lambda: [method(text) for text in texts], len(texts)
+
+    return setup
+
+
+def _write_records(config: BenchmarkConfig) -> str:
+    """
+    Write synthetic records to a temporary NDJSON file that lives until the process exits.
+
+    Args:
+        config (BenchmarkConfig): Benchmark settings
+
+    Returns:
+        str: Path to the file
+    """
+    directory = tempfile.TemporaryDirectory()
+    _TEMPORARY_DIRECTORIES.append(directory)
+    file_path = os.path.join(directory.name, 'submissions')
+    write_ndjson(generate_records(config.posts, seed=config.seed), file_path)
+    return file_path
+
+
+def _setup_load_json(config: BenchmarkConfig):
+    """Load complete records from NDJSON; one operation per line."""
+    from fact_fetch.analysis.json_data_loader import load_json_line_by_line
+
+    file_path = _write_records(config)
+    return lambda: list(load_json_line_by_line(file_path)), config.posts
+
+
+def _setup_load_json_fields(config: BenchmarkConfig):
+    """Load a projection of the fields the analysis uses; one operation per line."""
+    from fact_fetch.analysis.json_data_loader import load_json_line_by_line
+
+    file_path = _write_records(config)
+    fields = ['id', 'created_utc', 'title', 'selftext']
+    return lambda: list(load_json_line_by_line(file_path, fields=fields)), config.posts
+
+
+def _make_compressed_setup(compression: str):
+    """
+    Create the setup of a benchmark reading a compressed NDJSON file.
+
+    Args:
+        compression (str): 'zstd', 'gzip' or 'xz'
+
+    Returns:
+        Callable: Setup loading the field projection from the compressed file; one operation per line
+    """
+    def setup(config: BenchmarkConfig):
+        import gzip
+        import lzma
+
+        from fact_fetch.analysis.json_data_loader import load_json_line_by_line
+
+        file_path = _write_records(config)
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        if compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise BenchmarkSkipped("zstandard is not installed")
+            compressed = zstandard.ZstdCompressor(level=3).compress(data)
+        else:
+            compressed = gzip.compress(data) if compression == 'gzip' else lzma.compress(data)
+        with open(file_path, 'wb') as file:
+            file.write(compressed)
+
+        fields = ['id', 'created_utc', 'title', 'selftext']
+        return lambda: list(load_json_line_by_line(file_path, fields=fields)), config.posts
+
+    return setup
+
+
+def _setup_dedup(config: BenchmarkConfig):
+    """Compute MinHash signatures and LSH clusters of the normalized corpus; one operation per post."""
+    from fact_fetch.analysis.dedup import cluster_duplicates
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    normalizer = RedditTextNormalizer()
+    texts = [normalizer.normalize_text(text) for text in _corpus(config)]
+    return lambda: cluster_duplicates(texts), len(texts)
+
+
+def _setup_distinctive_terms(config: BenchmarkConfig):
+    """Rank distinctive terms of the corpus split into seven subreddits; one operation per vocabulary term."""
+    from collections import Counter
+
+    import numpy as np
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    from fact_fetch.analysis.distinctive_terms import TermCounts, distinctive_terms
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    analyzer = TfidfVectorizer(stop_words='english').build_analyzer()
+    tables = [Counter() for _ in range(7)]
+    for index, text in enumerate(RedditTextNormalizer().normalize_batch(_corpus(config))):
+        tables[index % len(tables)].update(analyzer(text))
+
+    vocabulary = sorted(set().union(*tables))
+    matrix = sparse.csr_matrix([[table[term] for term in vocabulary] for table in tables], dtype=np.int64)
+    term_counts = TermCounts([f'subreddit{index}' for index in range(len(tables))], vocabulary, matrix,
+                             np.zeros(len(tables), dtype=np.int64))
+    return lambda: distinctive_terms(term_counts), len(vocabulary)
+
+
+def _setup_interesting_keywords(config: BenchmarkConfig):
+    """Extract TF-IDF keywords from the normalized corpus; one operation per post."""
+    from fact_fetch.analysis.keyword_extraction import get_interesting_keywords
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    texts = RedditTextNormalizer().normalize_batch(_corpus(config))
+    return lambda: get_interesting_keywords(texts, top_n=1000), len(texts)
+
+
+def _random_embeddings(count: int, dimensions: int, seed: int):
+    """Generate reproducible random unit vectors standing in for keyword embeddings."""
+    import numpy as np
+
+    vectors = np.random.default_rng(seed).standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _make_cluster_setup(backend: str) -> Callable:
+    """
+    Create the setup of a benchmark clustering random embeddings with one backend.
+
+    Args:
+        backend (str): Clustering backend
+
+    Returns:
+        Callable: The benchmark setup
+    """
+    def setup(config: BenchmarkConfig):
+        from fact_fetch.analysis.keyword_clustering import cluster_embeddings
+
+        embeddings = _random_embeddings(5000, 384, config.seed)
+        return lambda: cluster_embeddings(embeddings, num_clusters=50, backend=backend), len(embeddings)
+
+    return setup
+
+
+def _setup_cluster_keywords(config: BenchmarkConfig):
+    """Embed and cluster extracted keywords; one operation per keyword."""
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        raise BenchmarkSkipped("sentence-transformers is not installed")
+
+    from fact_fetch.analysis.keyword_extraction import cluster_keywords, get_interesting_keywords
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    keywords = get_interesting_keywords(RedditTextNormalizer().normalize_batch(_corpus(config)), top_n=1000)
+    return lambda: cluster_keywords(keywords, num_clusters=20), len(keywords)
+
+
+def _make_import_setup(module: str) -> Callable:
+    """
+    Create the setup of a benchmark importing a module in a fresh interpreter.
+
+    Args:
+        module (str): Module to import
+
+    Returns:
+        Callable: Setup starting Python and importing the module; one operation per interpreter
+    """
+    def setup(config: BenchmarkConfig):
+        # Make the package importable from any working directory
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+        command = [sys.executable, '-c', f'import {module}']
+        return lambda: subprocess.run(command, env=env, check=True), 1
+
+    return setup
+
+
+# Benchmark name -> setup returning (function running one round, number of operations per round)
+BENCHMARKS: dict[str, Callable[[BenchmarkConfig], tuple[Callable[[], Any], int]]] = {
+    'normalize_text': _setup_normalize_text,
+    'normalize_text.giant_posts': _setup_normalize_giant,
+    **{f'normalize.{step}': _make_step_setup(step) for step in NORMALIZER_STEPS},
+    'load_json_line_by_line': _setup_load_json,
+    'load_json_line_by_line.fields': _setup_load_json_fields,
+    **{f'load_json_line_by_line.{compression}': _make_compressed_setup(compression)
+       for compression in ('zstd', 'gzip', 'xz')},
+    'get_interesting_keywords': _setup_interesting_keywords,
+    'cluster_duplicates': _setup_dedup,
+    'distinctive_terms': _setup_distinctive_terms,
+    'cluster_embeddings.kmeans': _make_cluster_setup('kmeans'),
+    'cluster_embeddings.minibatch': _make_cluster_setup('minibatch'),
+    'cluster_keywords': _setup_cluster_keywords,
+    **{f"import.{module.removeprefix('fact_fetch.')}": _make_import_setup(module) for module in IMPORT_BUDGETS},
+}
+
+# Benchmarks whose work runs in child processes, so their peak RSS is measured on the children
+CHILD_PROCESS_BENCHMARKS = frozenset(f"import.{module.removeprefix('fact_fetch.')}" for module in IMPORT_BUDGETS)
+
+
+def _peak_rss_mb(children: bool = False) -> float:
+    """
+    Get the peak resident set size of the current process, or of its largest child process.
+
+    Args:
+        children (bool): Measure the terminated child processes instead of this one (default: False)
+
+    Returns:
+        float: Peak RSS in megabytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_benchmark(name: str, config: BenchmarkConfig) -> dict:
+    """
+    Run a single benchmark in the current process.
+
+    The benchmark is warmed up once, then timed for at least min_rounds
+    rounds and min_time seconds. A final round runs under tracemalloc to
+    measure allocations; it is not timed since tracing slows it down.
+
+    Args:
+        name (str): Name of the benchmark (a key of BENCHMARKS)
+        config (BenchmarkConfig): Benchmark settings
+
+    Returns:
+        dict: ops/sec of the best and the median round, peak RSS, and the peak traced
+              memory and number of memory blocks held by the round's result,
+              or {'skipped': reason}
+    """
+    try:
+        fn, ops = BENCHMARKS[name](config)
+    except BenchmarkSkipped as e:
+        return {'skipped': str(e)}
+
+    fn()
+
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < config.min_rounds or time.perf_counter() - started < config.min_time:
+        round_started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - round_started)
+
+    tracemalloc.start()
+    result = fn()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    alloc_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del result
+
+    return {
+        'ops_per_round': ops,
+        'rounds': len(durations),
+        'ops_per_sec': ops / min(durations),
+        'median_ops_per_sec': ops / statistics.median(durations),
+        'peak_rss_mb': round(_peak_rss_mb(name in CHILD_PROCESS_BENCHMARKS), 1),
+        'alloc_peak_bytes': alloc_peak,
+        'alloc_blocks': alloc_blocks,
+    }
+
+
+def run_suite(names: Optional[list[str]] = None, config: BenchmarkConfig = BenchmarkConfig()) -> dict:
+    """
+    Run benchmarks, each in a fresh process.
+
+    A fresh (spawned) process per benchmark keeps the peak RSS of one
+    benchmark from leaking into the next and keeps caches warmed by one
+    benchmark from flattering another.
+
+    Args:
+        names (Optional[list[str]]): Benchmarks to run (default: all)
+        config (BenchmarkConfig): Benchmark settings
+
+    Returns:
+        dict: 'metadata' about the run and 'benchmarks' mapping each name to its results
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            try:
+                results[name] = executor.submit(run_benchmark, name, config).result()
+            except Exception as e:
+                logger.error(f"Benchmark {name} failed: {str(e)}")
+                results[name] = {'error': str(e)}
+        logger.info(f"{name}: {results[name]}")
+
+    return {
+        'metadata': {
+            'time': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': config._asdict(),
+        },
+        'benchmarks': results,
+    }
+
+
+def compare(results: dict, baseline: Optional[dict], tolerance: float = 0.10) -> list[str]:
+    """
+    Compare benchmark results against a baseline and the import time budgets.
+
+    A benchmark regresses when its best ops/sec drops, or its peak RSS or
+    peak traced memory grows, by more than the tolerance. An import
+    benchmark also regresses when its median import time exceeds the
+    budget in IMPORT_BUDGETS, with or without a baseline.
+
+    Args:
+        results (dict): Results of run_suite()
+        baseline (Optional[dict]): Earlier results of run_suite()
+        tolerance (float): Allowed relative change (default: 0.10)
+
+    Returns:
+        list[str]: A description of every regression
+    """
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        budget = IMPORT_BUDGETS.get(f"fact_fetch.{name.removeprefix('import.')}") if name.startswith('import.') else None
+        if budget is not None and 'median_ops_per_sec' in current and 1 / current['median_ops_per_sec'] > budget:
+            regressions.append(f"{name}: {1 / current['median_ops_per_sec']:.3f}s to import, budget {budget}s")
+
+        previous = (baseline or {}).get('benchmarks', {}).get(name)
+        if not previous or 'ops_per_sec' not in previous or 'ops_per_sec' not in current:
+            continue
+
+        if current['ops_per_sec'] < previous['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['ops_per_sec']:.1f} ops/sec, "
+                               f"baseline {previous['ops_per_sec']:.1f}")
+        for metric in ('peak_rss_mb', 'alloc_peak_bytes'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {current[metric]}, baseline {previous[metric]}")
+    return regressions
+
+
+def format_results(results: dict, baseline: Optional[dict] = None) -> str:
+    """
+    Format results as a table, with the change against a baseline when given.
+
+    Args:
+        results (dict): Results of run_suite()
+        baseline (Optional[dict]): Earlier results of run_suite()
+
+    Returns:
+        str: One line per benchmark
+    """
+    lines = [f"{'benchmark':<40} {'ops/sec':>12} {'change':>8} {'peak RSS MB':>12} {'alloc peak':>12}"]
+    for name, current in results['benchmarks'].items():
+        if 'ops_per_sec' not in current:
+            lines.append(f"{name:<40} {current.get('skipped') or current.get('error')}")
+            continue
+
+        change = ""
+        previous = (baseline or {}).get('benchmarks', {}).get(name) or {}
+        if 'ops_per_sec' in previous:
+            change = f"{current['ops_per_sec'] / previous['ops_per_sec'] - 1:+.1%}"
+        lines.append(f"{name:<40} {current['ops_per_sec']:>12.1f} {change:>8} {current['peak_rss_mb']:>12.1f} "
+                     f"{current['alloc_peak_bytes']:>12}")
+    return "\n".join(lines)
+
+
+def _save(data: dict, file_path: str):
+    """
+    Write JSON results, creating the directory if needed.
+
+    Args:
+        data (dict): Results to write
+        file_path (str): Destination file
+    """
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the benchmark suite.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Run the Fact Fetch benchmark suite.")
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--posts", type=int, default=2000, help="Number of synthetic posts (default: 2000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus (default: 0)")
+    parser.add_argument("--dumps", nargs="+", default=[], help="Dumps to sample real posts from")
+    parser.add_argument("--dump-sample", type=int, default=1000,
+                        help="Number of posts sampled from each dump (default: 1000)")
+    parser.add_argument("--min-time", type=float, default=1.0,
+                        help="Minimum seconds spent timing each benchmark (default: 1.0)")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH, help="Where to write the results JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Also store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative change tolerated before flagging a regression (default: 0.10)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with status 1 when a regression is found")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """
+    Run the suite, store the results and compare them with the baseline.
+
+    Returns:
+        int: Exit status; 1 if --fail-on-regression is set and a regression was found
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    config = BenchmarkConfig(posts=args.posts, seed=args.seed, dumps=tuple(args.dumps),
+                             dump_sample=args.dump_sample, min_time=args.min_time)
+    results = run_suite(args.benchmarks or None, config)
+    _save(results, args.output)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+
+    print(format_results(results, baseline))
+    print(f"Results written to {args.output}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if baseline is None and not args.save_baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions))
+    elif baseline is not None:
+        print("No regressions against the baseline")
+
+    if args.save_baseline:
+        _save(results, args.baseline)
+
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import json
+import os
+import random
+from typing import Optional
+
+# Building blocks of synthetic posts
+_WORDS = """
+vegan plant based diet protein iron calcium b12 vitamin omega meat dairy milk eggs cheese soy tofu beans
+lentils nuts study research health heart disease cancer risk climate emissions land water farm animal
+welfare cow pig chicken fish nutrition deficiency supplement doctor weight muscle energy people think
+really just because actually never always every some most many the a of and to in is that it for on
+with as this was but not are have be they you i we my your their our
+""".split()
+_EMOJIS = ["🌱", "🥦", "🐄", "😂", "❤️", "👍", "🔥", "🙄", "🥩", "👨‍👩‍👧"]
+_UNICODE_WORDS = ["café", "naïve", "jalapeño", "crème brûlée", "ﬁsh", "ﬂour", "“quoted”", "it’s", "豆腐",
+                  "Müsli", "½ cup", "10–15 g", "Ⅻ", "ｆｕｌｌｗｉｄｔｈ"]
+_ENTITIES = ["&amp;", "&lt;", "&gt;", "&quot;", "&#39;", "&nbsp;", "&#x200B;", "&eacute;"]
+_HTML = ["<br>", "<p>", "</p>", "<b>", "</b>", "<span class=\"md\">", "</span>"]
+_URLS = ["https://www.ncbi.nlm.nih.gov/pmc/articles/PMC{n}/", "http://example.com/post?id={n}&ref=reddit",
+         "https://i.redd.it/{n}.jpg", "www.youtube.com/watch?v={n}"]
+_DELETED = ["[deleted]", "[removed]"]
+
+
+def _sentence(rng: random.Random, markup: float) -> str:
+    """
+    Generate one sentence, decorated with Reddit markup with probability markup per word.
+
+    Args:
+        rng (random.Random): Random number generator
+        markup (float): Probability of decorating each word
+
+    Returns:
+        str: The sentence
+    """
+    words = []
+    for _ in range(rng.randint(5, 25)):
+        word = rng.choice(_WORDS)
+        if rng.random() < markup:
+            kind = rng.randrange(10)
+            if kind == 0:
+                word = f"**{word}**"
+            elif kind == 1:
+                word = f"*{word}*"
+            elif kind == 2:
+                word = f"~~{word}~~"
+            elif kind == 3:
+                word = f"[{word}]({rng.choice(_URLS).format(n=rng.randrange(10 ** 6))})"
+            elif kind == 4:
+                word = rng.choice(_URLS).format(n=rng.randrange(10 ** 6))
+            elif kind == 5:
+                word = rng.choice(["/r/vegan", "/r/nutrition", "/u/someone", "r/DebateAVegan"])
+            elif kind == 6:
+                word = rng.choice(_EMOJIS)
+            elif kind == 7:
+                word = rng.choice(_UNICODE_WORDS)
+            elif kind == 8:
+                word = rng.choice(_ENTITIES) + word
+            else:
+                word = rng.choice(_HTML) + word
+        words.append(word)
+
+    return " ".join(words).capitalize() + rng.choice([".", ".", "!", "?", "..."])
+
+
+def generate_post(rng: random.Random, paragraphs: Optional[int] = None, markup: float = 0.08) -> str:
+    """
+    Generate the body of a synthetic Reddit post.
+
+    Posts mix plain prose with markdown, HTML tags and entities, URLs,
+    subreddit and user references, emojis and non-ASCII text, the kinds
+    of content RedditTextNormalizer has to handle.
+
+    Args:
+        rng (random.Random): Random number generator
+        paragraphs (Optional[int]): Number of paragraphs (default: random, 1 to 6)
+        markup (float): Probability of decorating each word with markup (default: 0.08)
+
+    Returns:
+        str: The post text
+    """
+    if rng.random() < 0.02:
+        return rng.choice(_DELETED)
+
+    blocks = []
+    for _ in range(paragraphs if paragraphs is not None else rng.randint(1, 6)):
+        paragraph = " ".join(_sentence(rng, markup) for _ in range(rng.randint(1, 5)))
+        prefix = rng.choice(["", "", "", "> ", "* ", "1. ", "# "])
+        blocks.append(prefix + paragraph)
+    return rng.choice(["\n\n", "\n", "  \n"]).join(blocks)
+
+
+def generate_posts(count: int, seed: int = 0, giant_every: int = 500, giant_paragraphs: int = 400,
+                   markup: float = 0.08) -> list[str]:
+    """
+    Generate a reproducible corpus of synthetic post texts.
+
+    Args:
+        count (int): Number of posts
+        seed (int): Random seed (default: 0)
+        giant_every (int): Every giant_every-th post is a giant post; 0 disables them (default: 500)
+        giant_paragraphs (int): Number of paragraphs of a giant post (default: 400)
+        markup (float): Probability of decorating each word with markup (default: 0.08)
+
+    Returns:
+        list[str]: Title and body of each post, combined as in the bot
+    """
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        giant = giant_every and i % giant_every == giant_every - 1
+        body = generate_post(rng, giant_paragraphs if giant else None, markup)
+        posts.append("title: " + _sentence(rng, markup) + "\n body: " + body)
+    return posts
+
+
+def generate_records(count: int, seed: int = 0, **kwargs) -> list[dict]:
+    """
+    Generate synthetic submission records in the format of the Reddit dumps.
+
+    Args:
+        count (int): Number of records
+        seed (int): Random seed (default: 0)
+        **kwargs: Passed to generate_post()
+
+    Returns:
+        list[dict]: Records with id, created_utc, subreddit, title, selftext and a few extra fields
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        records.append({
+            'id': f"{i:x}",
+            'created_utc': 1_500_000_000 + i * 60,
+            'subreddit': rng.choice(["vegan", "DebateAVegan", "AskVegans", "exvegans"]),
+            'author': f"user{rng.randrange(10_000)}",
+            'score': rng.randrange(-10, 500),
+            'num_comments': rng.randrange(200),
+            'title': _sentence(rng, 0.05),
+            'selftext': generate_post(rng, **kwargs),
+        })
+    return records
+
+
+def write_ndjson(records: list[dict], file_path: str):
+    """
+    Write records as newline-delimited JSON.
+
+    Args:
+        records (list[dict]): Records to write
+        file_path (str): Destination file
+    """
+    with open(file_path, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+
+
+def sample_dump_lines(file_path: str, count: int, seed: int = 0) -> list[str]:
+    """
+    Sample complete lines from random positions of a large NDJSON dump.
+
+    Seeks to random byte offsets instead of reading the file, so sampling
+    a multi-gigabyte dump takes milliseconds. Longer lines are slightly
+    more likely to be sampled, which is fine for benchmarking.
+
+    Args:
+        file_path (str): Path to the dump
+        count (int): Number of lines to sample
+        seed (int): Random seed (default: 0)
+
+    Returns:
+        list[str]: Sampled lines, without their newline
+    """
+    rng = random.Random(seed)
+    size = os.path.getsize(file_path)
+    lines = []
+    with open(file_path, 'rb') as file:
+        for _ in range(count):
+            file.seek(rng.randrange(size) if size else 0)
+            file.readline()  # Skip the partial line
+            line = file.readline()
+            if not line:
+                file.seek(0)
+                line = file.readline()
+            if line.strip():
+                lines.append(line.rstrip(b'\n').decode('utf-8', errors='replace'))
+    return lines
+
+
+def sample_dump_texts(file_path: str, count: int, seed: int = 0) -> list[str]:
+    """
+    Sample post texts from a dump, combined as in the bot.
+
+    Args:
+        file_path (str): Path to the dump
+        count (int): Number of posts to sample
+        seed (int): Random seed (default: 0)
+
+    Returns:
+        list[str]: Title and body of each sampled post; unparsable lines are skipped
+    """
+    texts = []
+    for line in sample_dump_lines(file_path, count, seed):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            texts.append("title: " + (record.get('title') or "") + "\n body: " + (record.get('selftext') or ""))
+    return texts
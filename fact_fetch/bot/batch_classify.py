@@ -0,0 +1,516 @@
+import argparse
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+from itertools import islice
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from openai import OpenAI
+
+from fact_fetch.analysis.sharded_loader import load_submissions_parallel
+from fact_fetch.bot.openai_client import get_openai_client
+from fact_fetch.bot.openai_query import build_request
+from fact_fetch.bot.retrieval_index import RetrievalIndex
+from fact_fetch.utils.paths import cache_path
+from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+logger = logging.getLogger(__name__)
+
+# Default working directory: state database and request files
+DEFAULT_WORK_DIR = cache_path('batch_classify')
+
+# Endpoint the batched requests are sent to; the same one query() uses
+BATCH_ENDPOINT = '/v1/responses'
+
+# Limits of a single batch input file
+MAX_REQUESTS_PER_CHUNK = 50_000
+MAX_BYTES_PER_CHUNK = 190 * 1024 * 1024
+
+# Batch statuses after which a batch will not change anymore
+_FINAL_BATCH_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    custom_id TEXT PRIMARY KEY,
+    submission_id TEXT NOT NULL,
+    subreddit TEXT,
+    chunk INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_chunk_index ON posts (chunk);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    file_id TEXT,
+    batch_id TEXT,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class BatchResult(NamedTuple):
+    """
+    Verdict of one archived post.
+
+    Attributes:
+        custom_id (str): ID of the request in the batch
+        submission_id (str): Reddit submission ID
+        subreddit (Optional[str]): Subreddit of the post
+        result (dict): The same JSON object as query()
+    """
+    custom_id: str
+    submission_id: str
+    subreddit: Optional[str]
+    result: dict
+
+
+def response_output_text(body: dict) -> str:
+    """
+    Extract the output text from a raw Responses API response body.
+
+    The SDK exposes this as response.output_text; batch output files
+    contain the raw JSON instead.
+
+    Args:
+        body (dict): Response body from a batch output line
+
+    Returns:
+        str: Concatenated text of the output messages
+    """
+    return "".join(content.get('text', '')
+                   for item in body.get('output', []) if item.get('type') == 'message'
+                   for content in item.get('content', []) if content.get('type') == 'output_text')
+
+
+class BatchClassifier:
+    """
+    Classify archived posts in bulk with the OpenAI Batch API.
+
+    Batch requests cost half as much as synchronous ones and are not
+    subject to the same rate limits, which makes them suited to auditing
+    hundreds of thousands of archived posts. Requests are built with
+    build_request(), so they use exactly the same prompt, model and JSON
+    schema as query().
+
+    Work is split into chunks, each one batch input file. All progress is
+    kept in a SQLite state database: which posts were written to which
+    chunk, the uploaded file and batch of each chunk, and the merged
+    results. Every step can be interrupted and re-run; posts already
+    written are skipped, chunks already submitted are not submitted again,
+    and results already merged are kept.
+    """
+
+    def __init__(self, client: OpenAI, work_dir: str = DEFAULT_WORK_DIR,
+                 normalizer: Optional[RedditTextNormalizer] = None, min_words: int = 100,
+                 chunk_size: int = 10_000, retrieval_index: Optional[RetrievalIndex] = None, top_k: int = 3):
+        """
+        Open (or create) the working directory.
+
+        Args:
+            client (OpenAI): OpenAI client; pass base_url to it to use a local stand-in server
+            work_dir (str): Directory of the state database and request files (default: DEFAULT_WORK_DIR)
+            normalizer (Optional[RedditTextNormalizer]): Text normalizer (default: a new instance)
+            min_words (int): Posts with this many spaces or fewer are skipped, as in the bot (default: 100)
+            chunk_size (int): Maximum number of requests per batch (default: 10,000; at most 50,000)
+            retrieval_index (Optional[RetrievalIndex]): Local evidence index; when given, retrieved
+                                                        passages are included in each request
+            top_k (int): Number of passages retrieved per post (default: 3)
+        """
+        self.client = client
+        self.work_dir = work_dir
+        self.normalizer = normalizer or RedditTextNormalizer()
+        self.min_words = min_words
+        self.chunk_size = min(chunk_size, MAX_REQUESTS_PER_CHUNK)
+        self.retrieval_index = retrieval_index
+        self.top_k = top_k
+
+        os.makedirs(work_dir, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(work_dir, 'state.sqlite3'))
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def _chunk_path(self, chunk: int) -> str:
+        return os.path.join(self.work_dir, f'chunk-{chunk:05d}.jsonl')
+
+    def _next_chunk(self) -> int:
+        return self._connection.execute("SELECT COALESCE(MAX(chunk), 0) + 1 FROM chunks").fetchone()[0]
+
+    def _request_line(self, custom_id: str, text: str) -> str:
+        """
+        Build one line of a batch input file.
+
+        Args:
+            custom_id (str): ID used to match the result to the post
+            text (str): Normalized post text
+
+        Returns:
+            str: The JSON line, without newline
+        """
+        passages = self.retrieval_index.search(text, k=self.top_k) if self.retrieval_index is not None else None
+        return json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT,
+                           'body': build_request(text, passages)})
+
+    def _write_chunk(self, lines: list[tuple[str, str, Optional[str], str]]):
+        """
+        Write a chunk file and register its posts in one transaction.
+
+        The file is complete before it is registered, so an interruption
+        never leaves a partially written chunk behind; its posts are simply
+        written again on the next run. Posts already registered (when
+        requeued) are moved to the new chunk.
+
+        Args:
+            lines (list[tuple]): (custom_id, submission_id, subreddit, request line) of each post
+        """
+        chunk = self._next_chunk()
+        path = self._chunk_path(chunk)
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            for *_, line in lines:
+                file.write(line + "\n")
+        os.replace(path + '.tmp', path)
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO posts (custom_id, submission_id, subreddit, chunk, status) VALUES (?, ?, ?, ?, 'pending') "
+                "ON CONFLICT (custom_id) DO UPDATE SET chunk = excluded.chunk, status = 'pending', error = NULL",
+                [(custom_id, submission_id, subreddit, chunk) for custom_id, submission_id, subreddit, _ in lines])
+            self._connection.execute("INSERT INTO chunks (chunk, path, status, updated_at) VALUES (?, ?, 'written', ?)",
+                                     (chunk, path, time.time()))
+        logger.info(f"Wrote chunk {chunk} with {len(lines)} requests")
+
+    def prepare(self, submissions: Iterable[dict]) -> int:
+        """
+        Write batch request files for the posts that are not in the state database yet.
+
+        Args:
+            submissions (Iterable[dict]): Records with 'id', 'title', 'selftext' and optionally
+                                          'subreddit', e.g. from load_submissions_parallel()
+
+        Returns:
+            int: Number of new requests written
+        """
+        pending: list[tuple[str, str, Optional[str], str]] = []
+        pending_bytes = 0
+        pending_ids = set()
+        written = 0
+
+        for submission in submissions:
+            subreddit = submission.get('subreddit')
+            custom_id = f"{subreddit}-{submission['id']}" if subreddit else str(submission['id'])
+            if custom_id in pending_ids or self._connection.execute(
+                    "SELECT 1 FROM posts WHERE custom_id = ?", (custom_id,)).fetchone():
+                continue
+
+            # Combine title and body text as the bot does
+            text = "title: " + (submission.get('title') or "") + "\n body: " + (submission.get('selftext') or "")
+            normalized = self.normalizer.normalize_text(text)
+            if normalized.count(" ") <= self.min_words:
+                continue
+
+            line = self._request_line(custom_id, normalized)
+            size = len(line.encode('utf-8')) + 1
+            if pending and (len(pending) >= self.chunk_size or pending_bytes + size > MAX_BYTES_PER_CHUNK):
+                self._write_chunk(pending)
+                written += len(pending)
+                pending, pending_bytes, pending_ids = [], 0, set()
+
+            pending.append((custom_id, str(submission['id']), subreddit, line))
+            pending_bytes += size
+            pending_ids.add(custom_id)
+
+        if pending:
+            self._write_chunk(pending)
+            written += len(pending)
+        return written
+
+    def _set_chunk(self, chunk: int, **fields):
+        """
+        Update a chunk and commit.
+
+        Args:
+            chunk (int): Chunk number
+            **fields: Columns to set
+        """
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connection:
+            self._connection.execute(f"UPDATE chunks SET {assignments}, updated_at = ? WHERE chunk = ?",
+                                     (*fields.values(), time.time(), chunk))
+
+    def _find_batch(self, file_id: str, since: float) -> Optional[Any]:
+        """
+        Look for a batch already created from an uploaded chunk file.
+
+        Batches are listed newest first, so the search stops at batches
+        created before the file was uploaded.
+
+        Args:
+            file_id (str): ID of the uploaded chunk file
+            since (float): Time the file id was saved
+
+        Returns:
+            Optional[Any]: The batch, or None if there is none
+        """
+        for batch in self.client.batches.list(limit=100):
+            if getattr(batch, 'input_file_id', None) == file_id:
+                return batch
+            created_at = getattr(batch, 'created_at', None)
+            # Allow for clock differences between this machine and the API
+            if created_at is not None and created_at < since - 3600:
+                break
+        return None
+
+    def submit(self) -> int:
+        """
+        Upload and submit every chunk that was written but not submitted yet.
+
+        The file id is saved before the batch is created, so an interrupted
+        submission does not upload the file again. If the interruption came
+        after the batch was created, the existing batch is adopted instead
+        of paying for a second one.
+
+        Returns:
+            int: Number of batches created
+        """
+        submitted = 0
+        chunks = self._connection.execute(
+            "SELECT chunk, path, file_id, updated_at FROM chunks WHERE status = 'written' ORDER BY chunk").fetchall()
+        for chunk, path, file_id, updated_at in chunks:
+            if file_id is None:
+                with open(path, 'rb') as file:
+                    file_id = self.client.files.create(file=file, purpose='batch').id
+                self._set_chunk(chunk, file_id=file_id)
+            else:
+                batch = self._find_batch(file_id, updated_at)
+                if batch is not None:
+                    self._set_chunk(chunk, batch_id=batch.id, status='submitted')
+                    logger.info(f"Resumed chunk {chunk} with its existing batch {batch.id}")
+                    continue
+
+            batch = self.client.batches.create(input_file_id=file_id, endpoint=BATCH_ENDPOINT,
+                                               completion_window='24h', metadata={'chunk': str(chunk)})
+            self._set_chunk(chunk, batch_id=batch.id, status='submitted')
+            logger.info(f"Submitted chunk {chunk} as batch {batch.id}")
+            submitted += 1
+        return submitted
+
+    def _download(self, file_id: Optional[str]) -> Iterator[dict]:
+        """
+        Download and parse a batch output or error file.
+
+        Args:
+            file_id (Optional[str]): ID of the file, or None
+
+        Yields:
+            dict: Parsed lines
+        """
+        if not file_id:
+            return
+        content = self.client.files.content(file_id).text
+        for line in io.StringIO(content):
+            if line.strip():
+                yield json.loads(line)
+
+    def _merge(self, chunk: int, batch: Any):
+        """
+        Merge the output of a finished batch into the state database.
+
+        Args:
+            chunk (int): Chunk number
+            batch (Any): Batch object returned by batches.retrieve()
+        """
+        done, failed = [], []
+        for line in self._download(getattr(batch, 'output_file_id', None)):
+            response = line.get('response') or {}
+            try:
+                if line.get('error') or response.get('status_code') != 200:
+                    raise ValueError(json.dumps(line.get('error') or response.get('body')))
+                result = json.loads(response_output_text(response['body']))
+                done.append((json.dumps(result), line['custom_id']))
+            except (ValueError, KeyError) as e:
+                failed.append((str(e), line['custom_id']))
+        for line in self._download(getattr(batch, 'error_file_id', None)):
+            failed.append((json.dumps(line.get('error') or line.get('response')), line['custom_id']))
+
+        with self._connection:
+            self._connection.executemany("UPDATE posts SET status = 'done', result = ?, error = NULL "
+                                         "WHERE custom_id = ?", done)
+            self._connection.executemany("UPDATE posts SET status = 'failed', error = ? "
+                                         "WHERE custom_id = ? AND status != 'done'", failed)
+        logger.info(f"Merged chunk {chunk}: {len(done)} results, {len(failed)} failures")
+
+    def poll(self) -> dict[str, int]:
+        """
+        Check every submitted batch once and merge the results of finished ones.
+
+        Batches that failed, expired or were cancelled are merged as far as
+        they produced output; requeue_failed() resubmits what is missing.
+
+        Returns:
+            dict: Number of chunks per status
+        """
+        chunks = self._connection.execute(
+            "SELECT chunk, batch_id FROM chunks WHERE status = 'submitted' ORDER BY chunk").fetchall()
+        for chunk, batch_id in chunks:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status not in _FINAL_BATCH_STATUSES:
+                continue
+
+            self._merge(chunk, batch)
+            self._set_chunk(chunk, status='merged' if batch.status == 'completed' else 'failed')
+            if batch.status != 'completed':
+                logger.warning(f"Batch {batch_id} of chunk {chunk} ended as {batch.status}")
+
+        return dict(self._connection.execute("SELECT status, COUNT(*) FROM chunks GROUP BY status").fetchall())
+
+    def requeue_failed(self) -> int:
+        """
+        Write new chunks for posts of failed batches that have no result.
+
+        Posts whose individual request failed inside a completed batch are
+        requeued as well.
+
+        Returns:
+            int: Number of requests requeued
+        """
+        rows = self._connection.execute(
+            "SELECT posts.custom_id, posts.submission_id, posts.subreddit, chunks.path FROM posts "
+            "JOIN chunks ON posts.chunk = chunks.chunk "
+            "WHERE posts.status = 'failed' OR (posts.status = 'pending' AND chunks.status = 'failed')").fetchall()
+        if not rows:
+            return 0
+
+        # Reuse the request lines of the original chunk files
+        wanted = {custom_id: (submission_id, subreddit) for custom_id, submission_id, subreddit, _ in rows}
+        lines = []
+        for path in sorted({path for *_, path in rows}):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    custom_id = json.loads(line)['custom_id']
+                    if custom_id in wanted:
+                        lines.append((custom_id, *wanted[custom_id], line.rstrip("\n")))
+
+        for start in range(0, len(lines), self.chunk_size):
+            self._write_chunk(lines[start:start + self.chunk_size])
+        with self._connection:
+            self._connection.execute("UPDATE chunks SET status = 'requeued' WHERE status = 'failed'")
+        return len(lines)
+
+    def run(self, submissions: Optional[Iterable[dict]] = None, poll_interval: float = 60.0,
+            max_attempts: int = 3) -> dict:
+        """
+        Prepare, submit and poll until every batch has finished.
+
+        Args:
+            submissions (Optional[Iterable[dict]]): Posts to add before submitting (default: none,
+                                                    only resume earlier work)
+            poll_interval (float): Seconds between polls (default: 60)
+            max_attempts (int): Number of times failed requests are submitted again (default: 3)
+
+        Returns:
+            dict: Progress, as returned by progress()
+        """
+        if submissions is not None:
+            self.prepare(submissions)
+
+        for attempt in range(max_attempts + 1):
+            self.submit()
+            while self.poll().get('submitted'):
+                time.sleep(poll_interval)
+            if attempt == max_attempts or not self.requeue_failed():
+                break
+
+        return self.progress()
+
+    def progress(self) -> dict:
+        """
+        Count posts by status and verdict.
+
+        Returns:
+            dict: Number of posts per status and number of results per verdict
+        """
+        statuses = dict(self._connection.execute("SELECT status, COUNT(*) FROM posts GROUP BY status").fetchall())
+        verdicts = dict(self._connection.execute(
+            "SELECT json_extract(result, '$.result'), COUNT(*) FROM posts WHERE status = 'done' "
+            "GROUP BY 1").fetchall())
+        return {'posts': statuses, 'verdicts': verdicts}
+
+    def results(self) -> Iterator[BatchResult]:
+        """
+        Iterate over the merged results.
+
+        Yields:
+            BatchResult: One result per successfully classified post
+        """
+        cursor = self._connection.execute(
+            "SELECT custom_id, submission_id, subreddit, result FROM posts WHERE status = 'done' ORDER BY custom_id")
+        for custom_id, submission_id, subreddit, result in cursor:
+            yield BatchResult(custom_id, submission_id, subreddit, json.loads(result))
+
+    def close(self):
+        """
+        Close the state database.
+        """
+        self._connection.close()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the bulk classification.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Classify archived posts in bulk with the OpenAI Batch API.")
+    parser.add_argument("files", nargs="*", help="NDJSON dumps to classify (default: none, only resume earlier work)")
+    parser.add_argument("--limit", type=int, help="Maximum number of posts read from the dumps")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR,
+                        help="Directory of the state database and request files")
+    parser.add_argument("--chunk-size", type=int, default=10_000,
+                        help="Maximum number of requests per batch (default: 10,000)")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds between polls (default: 60)")
+    parser.add_argument("--base-url", help="Base URL of an OpenAI-compatible server, e.g. a local stand-in")
+    parser.add_argument("--local-retrieval", action="store_true",
+                        help="Include passages from the local retrieval index in each request")
+    parser.add_argument("--prepare-only", action="store_true", help="Only write the request files")
+    parser.add_argument("--output", help="Write the merged results as NDJSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Classify the posts of the given dumps, resuming any earlier run in the same working directory.
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    client = get_openai_client(base_url=args.base_url)
+    retrieval_index = RetrievalIndex.build() if args.local_retrieval else None
+    classifier = BatchClassifier(client, args.work_dir, chunk_size=args.chunk_size, retrieval_index=retrieval_index)
+
+    submissions = None
+    if args.files:
+        submissions = islice(load_submissions_parallel(args.files, normalize=False), args.limit)
+
+    if args.prepare_only:
+        print(f"Wrote {classifier.prepare(submissions or [])} requests")
+    else:
+        print(classifier.run(submissions, poll_interval=args.poll_interval))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            for result in classifier.results():
+                file.write(json.dumps(result._asdict()) + "\n")
+    classifier.close()
+
+
+if __name__ == "__main__":
+    main()
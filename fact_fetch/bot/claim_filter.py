@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+
+from fact_fetch.utils.embeddings import DEFAULT_MODEL_NAME, encode_texts
+from fact_fetch.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+RESOURCES_DIR = os.path.join(os.path.dirname(__file__), 'resources')
+
+# Claim and off-topic example sentences the posts are compared against
+DEFAULT_EXEMPLARS_PATH = os.path.join(RESOURCES_DIR, 'claim_exemplars.json')
+
+# Titles and descriptions of the research papers, used as topic exemplars
+DEFAULT_TOPICS_PATH = os.path.join(RESOURCES_DIR, 'resources.json')
+
+# Default location of the decision log
+DEFAULT_LOG_PATH = cache_path('claim_filter', 'decisions.jsonl')
+
+# Sentence boundaries in normalized text
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+class GateDecision(NamedTuple):
+    """
+    Outcome of scoring one post.
+
+    Attributes:
+        score (float): Claim score of the post; higher means more likely to contain a factual claim
+        escalated (bool): Whether the post should be sent to query()
+        audited (bool): True if the post scored below the threshold but was escalated anyway
+                        to measure recall
+    """
+    score: float
+    escalated: bool
+    audited: bool
+
+
+class ClaimFilter:
+    """
+    Local, CPU-only gate deciding which posts are worth a fact-checking call.
+
+    Each sentence of a post is embedded with the shared MiniLM model and
+    compared with example claims, the research topics the bot has evidence
+    for, and examples of off-topic posts (recipes, photos, personal stories).
+    A post's score is its best claim/topic similarity minus its best
+    off-topic similarity. Only posts scoring at or above the threshold are
+    escalated to OpenAI.
+
+    Every decision is appended to a JSONL log, together with the verdict of
+    escalated posts, so the number of saved API calls and the precision and
+    recall of the gate can be measured with summarize_decisions(). A small
+    share of posts below the threshold is escalated anyway ("audited") so
+    that recall can be estimated.
+    """
+
+    def __init__(self, threshold: float = 0.05, exemplars_path: str = DEFAULT_EXEMPLARS_PATH,
+                 topics_path: str = DEFAULT_TOPICS_PATH, log_path: Optional[str] = DEFAULT_LOG_PATH,
+                 audit_rate: float = 0.02, max_sentences: int = 64,
+                 embed: Optional[Callable[[list[str]], np.ndarray]] = None, seed: Optional[int] = None):
+        """
+        Load the exemplars and embed them.
+
+        Args:
+            threshold (float): Minimum score for a post to be escalated (default: 0.05)
+            exemplars_path (str): JSON file with 'claims' and 'off_topic' example sentences
+            topics_path (str): JSON list of research papers whose titles and descriptions are topic exemplars
+            log_path (Optional[str]): JSONL file decisions are appended to, or None to disable logging
+            audit_rate (float): Share of below-threshold posts escalated anyway to estimate recall (default: 0.02)
+            max_sentences (int): Maximum number of sentences scored per post (default: 64)
+            embed (Optional[Callable]): Function returning unit-length embeddings for a list of
+                                        texts (default: the shared MiniLM model)
+            seed (Optional[int]): Seed for the audit sampling
+        """
+        self.threshold = threshold
+        self.log_path = log_path
+        self.audit_rate = audit_rate
+        self.max_sentences = max_sentences
+        self.embed = embed or (lambda texts: encode_texts(texts, DEFAULT_MODEL_NAME))
+        self._random = random.Random(seed)
+        self._log_lock = threading.Lock()
+
+        with open(exemplars_path, 'r', encoding='utf-8') as file:
+            exemplars = json.load(file)
+        with open(topics_path, 'r', encoding='utf-8') as file:
+            topics = [f"{paper['title']}. {paper['description']}" for paper in json.load(file)]
+
+        self._claim_vectors = self.embed(exemplars['claims'] + topics)
+        self._off_topic_vectors = self.embed(exemplars['off_topic'])
+
+        if log_path is not None:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+
+    def score(self, text: str) -> float:
+        """
+        Score how likely a normalized post is to contain a checkable claim.
+
+        Args:
+            text (str): Normalized post text
+
+        Returns:
+            float: Best claim/topic similarity minus best off-topic similarity of its sentences
+        """
+        sentences = [sentence for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+        if not sentences:
+            return float('-inf')
+
+        vectors = self.embed(sentences[:self.max_sentences])
+        claim = float((vectors @ self._claim_vectors.T).max())
+        off_topic = float((vectors @ self._off_topic_vectors.T).max())
+        return claim - off_topic
+
+    def check(self, submission_id: str, text: str, subreddit: Optional[str] = None) -> GateDecision:
+        """
+        Decide whether a post should be escalated to query(), and log the decision.
+
+        Args:
+            submission_id (str): Reddit submission ID
+            text (str): Normalized post text
+            subreddit (Optional[str]): Subreddit of the post, recorded in the log
+
+        Returns:
+            GateDecision: The score and whether the post is escalated
+        """
+        score = self.score(text)
+        escalated = score >= self.threshold
+        audited = not escalated and self._random.random() < self.audit_rate
+        decision = GateDecision(score, escalated or audited, audited)
+
+        self._log({
+            'time': time.time(),
+            'id': submission_id,
+            'subreddit': subreddit,
+            'score': score,
+            'threshold': self.threshold,
+            'escalated': decision.escalated,
+            'audited': audited,
+        })
+        return decision
+
+    def record_verdict(self, submission_id: str, verdict: str):
+        """
+        Log the verdict query() returned for an escalated post.
+
+        Args:
+            submission_id (str): Reddit submission ID
+            verdict (str): "misinformation", "unverifiable" or "verified"
+        """
+        self._log({'time': time.time(), 'id': submission_id, 'verdict': verdict})
+
+    def _log(self, record: dict):
+        """
+        Append a record to the decision log.
+
+        Args:
+            record (dict): JSON-serializable record
+        """
+        if self.log_path is None:
+            return
+        line = json.dumps(record) + "\n"
+        with self._log_lock:
+            with open(self.log_path, 'a', encoding='utf-8') as file:
+                file.write(line)
+
+
+def summarize_decisions(log_path: str = DEFAULT_LOG_PATH, positive_verdict: str = "misinformation") -> dict:
+    """
+    Measure the effect of the claim filter from its decision log.
+
+    A post counts as positive when query() classified it as
+    positive_verdict. Precision is measured on posts that passed the
+    threshold. Recall is estimated from audited posts: each audited
+    positive stands for 1 / audit_rate positives the gate skipped.
+
+    Args:
+        log_path (str): Decision log written by ClaimFilter (default: DEFAULT_LOG_PATH)
+        positive_verdict (str): Verdict that counts as a positive (default: "misinformation")
+
+    Returns:
+        dict: Number of posts, escalations and saved API calls, plus precision and
+              estimated recall (None when there is not enough data)
+    """
+    decisions = {}
+    verdicts = {}
+    with open(log_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            record = json.loads(line)
+            if 'verdict' in record:
+                verdicts[record['id']] = record['verdict']
+            else:
+                decisions[record['id']] = record
+
+    passed = [record for record in decisions.values() if record['escalated'] and not record['audited']]
+    audited = [record for record in decisions.values() if record['audited']]
+    skipped = sum(1 for record in decisions.values() if not record['escalated'])
+
+    passed_judged = [record for record in passed if record['id'] in verdicts]
+    true_positives = sum(1 for record in passed_judged if verdicts[record['id']] == positive_verdict)
+    audited_positives = sum(1 for record in audited if verdicts.get(record['id']) == positive_verdict)
+
+    # Audited posts are a random sample of everything below the threshold
+    below_threshold = skipped + len(audited)
+    estimated_misses = audited_positives * below_threshold / len(audited) if audited else None
+
+    precision = true_positives / len(passed_judged) if passed_judged else None
+    recall = None
+    if estimated_misses is not None and true_positives + estimated_misses > 0:
+        recall = true_positives / (true_positives + estimated_misses)
+
+    return {
+        'posts': len(decisions),
+        'escalated': len(passed) + len(audited),
+        'api_calls_saved': skipped,
+        'saved_ratio': skipped / len(decisions) if decisions else 0.0,
+        'precision': precision,
+        'estimated_recall': recall,
+    }
+
+
+if __name__ == "__main__":
+    """
+    Print a summary of the claim filter's decision log.
+
+    Usage:
+        python -m fact_fetch.bot.claim_filter [log_path]
+    """
+    print(summarize_decisions(*sys.argv[1:]))
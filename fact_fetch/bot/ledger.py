@@ -0,0 +1,261 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from fact_fetch.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+# Default location of the ledger database
+DEFAULT_LEDGER_PATH = cache_path('ledger.sqlite3')
+
+# Verdicts recorded for posts that never reached OpenAI
+SKIPPED_TOO_SHORT = "too_short"
+SKIPPED_FILTERED = "filtered"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed (
+    submission_id TEXT PRIMARY KEY,
+    content_hash TEXT,
+    verdict TEXT,
+    reply_id TEXT,
+    processed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS processed_at_index ON processed (processed_at);
+"""
+
+# Later records of the same submission fill in fields without erasing earlier ones
+_UPSERT = """
+INSERT INTO processed (submission_id, content_hash, verdict, reply_id, processed_at)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (submission_id) DO UPDATE SET
+    content_hash = COALESCE(excluded.content_hash, content_hash),
+    verdict = COALESCE(excluded.verdict, verdict),
+    reply_id = COALESCE(excluded.reply_id, reply_id),
+    processed_at = excluded.processed_at
+"""
+
+
+class LedgerEntry(NamedTuple):
+    """
+    What the bot did with one submission.
+
+    Attributes:
+        submission_id (str): Reddit submission ID
+        content_hash (Optional[str]): SHA-256 of the submission text
+        verdict (Optional[str]): Verdict returned by query(), or why the post was skipped
+        reply_id (Optional[str]): ID of the bot's reply, if it replied
+        processed_at (float): Timestamp of the last update
+    """
+    submission_id: str
+    content_hash: Optional[str]
+    verdict: Optional[str]
+    reply_id: Optional[str]
+    processed_at: float
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash the text of a submission.
+
+    Args:
+        text (str): Submission text
+
+    Returns:
+        str: Hex digest of the text
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class Ledger:
+    """
+    Persistent record of the submissions the bot has already handled.
+
+    Reddit streams replay their most recent items whenever they restart,
+    so without a record every restart would query OpenAI again for posts
+    that were already judged, and could reply to them twice. The ledger is
+    an embedded SQLite database in WAL mode, keyed (and therefore indexed)
+    by submission id, that the pipeline consults before doing any work on
+    a post.
+
+    Writes are buffered and committed in batches. Pending records are
+    visible to seen() immediately; a crash loses at most one batch, which
+    only costs repeated classifications. Replies are committed at once,
+    since replying twice is worse. The pipeline records misinformation only
+    once its reply is posted or queued, so a post whose reply failed is not
+    seen() and is retried after a restart. Entries older than the retention period
+    are removed by compact().
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH, batch_size: int = 50, flush_interval: float = 5.0,
+                 retention_days: Optional[float] = 90):
+        """
+        Open (or create) the ledger.
+
+        Args:
+            path (str): Path of the SQLite database (default: DEFAULT_LEDGER_PATH)
+            batch_size (int): Number of pending records that triggers a commit (default: 50)
+            flush_interval (float): Seconds after which pending records are committed anyway (default: 5)
+            retention_days (Optional[float]): Age after which compact() removes entries;
+                                              None keeps them forever (default: 90)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        # The pipeline records from worker threads, so access is serialized by a lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+        # submission_id -> row not yet committed
+        self._pending: dict[str, tuple] = {}
+        self._last_flush = time.monotonic()
+
+    def seen(self, submission_id: str) -> bool:
+        """
+        Check whether a submission was already handled.
+
+        Args:
+            submission_id (str): Reddit submission ID
+
+        Returns:
+            bool: True if the submission is in the ledger
+        """
+        with self._lock:
+            if submission_id in self._pending:
+                return True
+            row = self._connection.execute("SELECT 1 FROM processed WHERE submission_id = ?",
+                                           (submission_id,)).fetchone()
+        return row is not None
+
+    def get(self, submission_id: str) -> Optional[LedgerEntry]:
+        """
+        Look up what the bot did with a submission.
+
+        Args:
+            submission_id (str): Reddit submission ID
+
+        Returns:
+            Optional[LedgerEntry]: The entry, or None if the submission was never handled
+        """
+        self.flush()
+        with self._lock:
+            row = self._connection.execute("SELECT submission_id, content_hash, verdict, reply_id, processed_at "
+                                           "FROM processed WHERE submission_id = ?", (submission_id,)).fetchone()
+        return LedgerEntry(*row) if row is not None else None
+
+    def record(self, submission_id: str, content_hash: Optional[str] = None, verdict: Optional[str] = None,
+               reply_id: Optional[str] = None, commit: bool = False):
+        """
+        Record (or update) what the bot did with a submission.
+
+        Fields left as None keep the value recorded earlier.
+
+        Args:
+            submission_id (str): Reddit submission ID
+            content_hash (Optional[str]): SHA-256 of the submission text
+            verdict (Optional[str]): Verdict, or SKIPPED_TOO_SHORT / SKIPPED_FILTERED
+            reply_id (Optional[str]): ID of the bot's reply
+            commit (bool): Commit immediately instead of waiting for the batch (default: False)
+        """
+        with self._lock:
+            previous = self._pending.get(submission_id)
+            if previous is not None:
+                # Merge with the pending record, as the upsert does for committed ones
+                content_hash = content_hash if content_hash is not None else previous[1]
+                verdict = verdict if verdict is not None else previous[2]
+                reply_id = reply_id if reply_id is not None else previous[3]
+            self._pending[submission_id] = (submission_id, content_hash, verdict, reply_id, time.time())
+
+            due = (commit or len(self._pending) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Commit all pending records in a single transaction.
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            rows = list(self._pending.values())
+            with self._connection:
+                self._connection.executemany(_UPSERT, rows)
+            self._pending.clear()
+
+    def compact(self, retention_days: Optional[float] = None) -> int:
+        """
+        Remove entries older than the retention period and shrink the write-ahead log.
+
+        Reddit streams only replay recent posts, so old entries are never
+        needed to prevent repeated work.
+
+        Args:
+            retention_days (Optional[float]): Retention period (default: the one given to the constructor)
+
+        Returns:
+            int: Number of removed entries
+        """
+        retention_days = retention_days if retention_days is not None else self.retention_days
+        self.flush()
+        if retention_days is None:
+            return 0
+
+        cutoff = time.time() - retention_days * 24 * 3600
+        with self._lock:
+            with self._connection:
+                removed = self._connection.execute("DELETE FROM processed WHERE processed_at < ?",
+                                                   (cutoff,)).rowcount
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        if removed:
+            logger.info(f"Removed {removed} ledger entries older than {retention_days} days")
+        return removed
+
+    def stats(self) -> dict:
+        """
+        Count the entries of the ledger.
+
+        Returns:
+            dict: Total number of entries, number of replies and number of entries per verdict
+        """
+        self.flush()
+        with self._lock:
+            total, replies = self._connection.execute("SELECT COUNT(*), COUNT(reply_id) FROM processed").fetchone()
+            verdicts = dict(self._connection.execute("SELECT COALESCE(verdict, 'none'), COUNT(*) "
+                                                     "FROM processed GROUP BY verdict").fetchall())
+        return {'entries': total, 'replies': replies, 'verdicts': verdicts}
+
+    def close(self):
+        """
+        Commit pending records and close the database.
+        """
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+
+if __name__ == "__main__":
+    """
+    Print the number of handled submissions by verdict.
+
+    Usage:
+        python -m fact_fetch.bot.ledger [ledger_path]
+    """
+    ledger = Ledger(*sys.argv[1:])
+    print(ledger.stats())
+    ledger.close()
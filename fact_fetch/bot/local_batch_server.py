@@ -0,0 +1,261 @@
+import argparse
+import email.parser
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from fact_fetch.bot.replay import fake_verdict
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBatchState:
+    """
+    Files and batches held by the local stand-in server.
+
+    Batches complete completion_delay seconds after they are created.
+    Their output is computed on completion: each request gets a verdict
+    derived from a hash of its prompt (see fake_verdict()), and a share
+    error_rate of the requests fail and are written to the error file.
+    """
+
+    def __init__(self, completion_delay: float = 1.0, error_rate: float = 0.0, misinformation_rate: float = 0.3,
+                 seed: Optional[int] = None):
+        """
+        Create an empty state.
+
+        Args:
+            completion_delay (float): Seconds before a batch completes (default: 1.0)
+            error_rate (float): Share of requests that fail (default: 0.0)
+            misinformation_rate (float): Share of posts classified as misinformation (default: 0.3)
+            seed (Optional[int]): Seed for the simulated failures
+        """
+        self.completion_delay = completion_delay
+        self.error_rate = error_rate
+        self.misinformation_rate = misinformation_rate
+        self._random = random.Random(seed)
+        self.files: dict[str, dict] = {}
+        self.contents: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, filename: str, purpose: str, content: bytes) -> dict:
+        """
+        Store an uploaded (or generated) file.
+
+        Args:
+            filename (str): Name of the file
+            purpose (str): Purpose given on upload, e.g. 'batch'
+            content (bytes): File content
+
+        Returns:
+            dict: The file object
+        """
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.files[file_id] = {'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                               'filename': filename, 'purpose': purpose, 'status': 'processed'}
+        self.contents[file_id] = content
+        return self.files[file_id]
+
+    def create_batch(self, request: dict) -> dict:
+        """
+        Create a batch from an uploaded input file.
+
+        Args:
+            request (dict): Body of the create request
+
+        Returns:
+            dict: The batch object
+        """
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        self.batches[batch_id] = {
+            'id': batch_id, 'object': 'batch', 'endpoint': request['endpoint'], 'errors': None,
+            'input_file_id': request['input_file_id'], 'completion_window': request['completion_window'],
+            'status': 'in_progress', 'output_file_id': None, 'error_file_id': None,
+            'created_at': int(time.time()), 'metadata': request.get('metadata'),
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0},
+        }
+        return self.batches[batch_id]
+
+    def list_batches(self) -> dict:
+        """
+        List every batch, newest first, as a single page.
+
+        Returns:
+            dict: A list object with the batches in 'data'
+        """
+        batches = [self.retrieve_batch(batch_id) for batch_id in reversed(list(self.batches))]
+        return {'object': 'list', 'data': batches, 'has_more': False,
+                'first_id': batches[0]['id'] if batches else None, 'last_id': batches[-1]['id'] if batches else None}
+
+    def retrieve_batch(self, batch_id: str) -> Optional[dict]:
+        """
+        Get a batch, completing it once its delay has passed.
+
+        Args:
+            batch_id (str): ID of the batch
+
+        Returns:
+            Optional[dict]: The batch object, or None if it does not exist
+        """
+        batch = self.batches.get(batch_id)
+        if batch is not None and batch['status'] == 'in_progress' \
+                and time.time() - batch['created_at'] >= self.completion_delay:
+            self._complete(batch)
+        return batch
+
+    def _complete(self, batch: dict):
+        """
+        Compute the output of a batch and mark it completed.
+
+        Args:
+            batch (dict): The batch object
+        """
+        outputs, errors = [], []
+        for line in self.contents[batch['input_file_id']].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if self._random.random() < self.error_rate:
+                errors.append({'id': f"batch_req_{uuid.uuid4().hex}", 'custom_id': request['custom_id'],
+                               'response': None, 'error': {'code': 'server_error', 'message': "Simulated error"}})
+                continue
+
+            text = json.dumps(fake_verdict(request['body']['input'][-1]['content'], self.misinformation_rate))
+            body = {
+                'id': f"resp_{uuid.uuid4().hex}", 'object': 'response', 'status': 'completed',
+                'model': request['body'].get('model'),
+                'output': [{'type': 'message', 'id': f"msg_{uuid.uuid4().hex}", 'role': 'assistant',
+                            'status': 'completed',
+                            'content': [{'type': 'output_text', 'text': text, 'annotations': []}]}],
+                'usage': {'input_tokens': len(line) // 4, 'output_tokens': len(text) // 4,
+                          'total_tokens': (len(line) + len(text)) // 4},
+            }
+            outputs.append({'id': f"batch_req_{uuid.uuid4().hex}", 'custom_id': request['custom_id'],
+                            'response': {'status_code': 200, 'request_id': uuid.uuid4().hex, 'body': body},
+                            'error': None})
+
+        def jsonl(lines):
+            return "".join(json.dumps(line) + "\n" for line in lines).encode('utf-8')
+
+        batch['output_file_id'] = self.add_file('output.jsonl', 'batch_output', jsonl(outputs))['id']
+        if errors:
+            batch['error_file_id'] = self.add_file('errors.jsonl', 'batch_output', jsonl(errors))['id']
+        batch['request_counts'] = {'total': len(outputs) + len(errors), 'completed': len(outputs),
+                                   'failed': len(errors)}
+        batch['status'] = 'completed'
+        batch['completed_at'] = int(time.time())
+
+
+class _BatchHandler(BaseHTTPRequestHandler):
+    """
+    Implements the subset of the OpenAI API used by BatchClassifier.
+    """
+    state: LocalBatchState
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self):
+        self._send_json(404, {'error': {'message': f"Unknown path {self.path}", 'type': 'invalid_request_error'}})
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        with self.state.lock:
+            if path.endswith('/files'):
+                # Multipart form with the fields 'purpose' and 'file'
+                message = email.parser.BytesParser().parsebytes(
+                    b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + self._body())
+                fields = {part.get_param('name', header='content-disposition'): part
+                          for part in message.get_payload()}
+                upload = fields['file']
+                self._send_json(200, self.state.add_file(upload.get_filename() or 'upload.jsonl',
+                                                         fields['purpose'].get_payload(decode=True).decode(),
+                                                         upload.get_payload(decode=True)))
+            elif path.endswith('/batches'):
+                self._send_json(200, self.state.create_batch(json.loads(self._body())))
+            else:
+                self._not_found()
+
+    def do_GET(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        with self.state.lock:
+            if parts[-1] == 'batches':
+                self._send_json(200, self.state.list_batches())
+            elif len(parts) >= 2 and parts[-2] == 'batches':
+                batch = self.state.retrieve_batch(parts[-1])
+                if batch is None:
+                    self._not_found()
+                    return
+                self._send_json(200, batch)
+            elif len(parts) >= 3 and parts[-3] == 'files' and parts[-1] == 'content':
+                content = self.state.contents.get(parts[-2])
+                if content is None:
+                    self._not_found()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+            else:
+                self._not_found()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_local_batch_server(port: int = 0, host: str = '127.0.0.1',
+                             state: Optional[LocalBatchState] = None) -> ThreadingHTTPServer:
+    """
+    Run a local stand-in for the OpenAI files and batches endpoints in a daemon thread.
+
+    Point an OpenAI client at it with base_url=f"http://{host}:{port}/v1".
+
+    Args:
+        port (int): Port to listen on; 0 picks a free port (default: 0)
+        host (str): Address to bind to (default: '127.0.0.1')
+        state (Optional[LocalBatchState]): Server state (default: a new LocalBatchState)
+
+    Returns:
+        ThreadingHTTPServer: The running server; server.server_address holds the actual port
+    """
+    handler = type('BatchHandler', (_BatchHandler,), {'state': state or LocalBatchState()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='local-batch-server', daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    """
+    Run the stand-in server in the foreground.
+
+    Usage:
+        python -m fact_fetch.bot.local_batch_server --port 8089
+        python -m fact_fetch.bot.batch_classify dump --base-url http://127.0.0.1:8089/v1 --poll-interval 1
+    """
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Batch API.")
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on (default: 8089)")
+    parser.add_argument("--completion-delay", type=float, default=1.0,
+                        help="Seconds before a batch completes (default: 1.0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail (default: 0.0)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server = start_local_batch_server(args.port, state=LocalBatchState(args.completion_delay, args.error_rate))
+    logger.info(f"Serving the batch API on http://127.0.0.1:{server.server_address[1]}/v1")
+    threading.Event().wait()
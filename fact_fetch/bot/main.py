@@ -1,49 +1,165 @@
+import argparse
+import asyncio
+import signal
+
+from fact_fetch.analysis.dedup import MinHashIndex
+from fact_fetch.bot.claim_filter import ClaimFilter
+from fact_fetch.bot.ledger import Ledger
 from fact_fetch.bot.reddit_client import get_reddit_client
-from fact_fetch.bot.reddit_observer import observe_subreddit
-from fact_fetch.bot.openai_client import get_openai_client
-from fact_fetch.bot.openai_query import query
+from fact_fetch.bot.reddit_observer import DEFAULT_SUBREDDITS, observe_subreddits
+from fact_fetch.bot.openai_client import get_async_openai_client
+from fact_fetch.bot.pipeline import BotPipeline
+from fact_fetch.bot.prompt_compaction import METHODS, PromptCompactor
 from fact_fetch.bot.reddit_bot import RedditBot
+from fact_fetch.bot.reply_queue import ReplyQueue
+from fact_fetch.bot.retrieval_index import RetrievalIndex
+from fact_fetch.bot.verdict_cache import VerdictCache
+from fact_fetch.utils.metrics import enable_tracing, start_metrics_server
 from fact_fetch.utils.text_normalizer import RedditTextNormalizer
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the bot.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Run the Fact Fetch Reddit bot.")
+    parser.add_argument("--subreddits", nargs="+", default=list(DEFAULT_SUBREDDITS),
+                        help="Subreddits to monitor, polled as one combined stream (default: vegan)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of OpenAI requests in flight (default: 4)")
+    parser.add_argument("--queue-size", type=int, default=100,
+                        help="Capacity of each queue between pipeline stages (default: 100)")
+    parser.add_argument("--no-verdict-cache", action="store_true",
+                        help="Query OpenAI for every post instead of reusing verdicts of identical or similar posts")
+    parser.add_argument("--similarity-threshold", type=float, default=0.93,
+                        help="Minimum cosine similarity for reusing the verdict of a similar post (default: 0.93)")
+    parser.add_argument("--no-claim-filter", action="store_true",
+                        help="Send every long enough post to OpenAI instead of only those scored as likely claims")
+    parser.add_argument("--claim-threshold", type=float, default=0.05,
+                        help="Minimum claim filter score for a post to be sent to OpenAI (default: 0.05)")
+    parser.add_argument("--local-retrieval", action="store_true",
+                        help="Retrieve evidence from a local index of the research papers instead of the "
+                             "remote OpenAI vector store; the index is built or refreshed on startup")
+    parser.add_argument("--no-repost-filter", action="store_true",
+                        help="Classify reposts and near-duplicate posts again instead of reusing the verdict "
+                             "of the original post")
+    parser.add_argument("--repost-threshold", type=float, default=0.8,
+                        help="Estimated shingle similarity above which a post counts as a repost (default: 0.8)")
+    parser.add_argument("--token-budget", type=int, default=1000,
+                        help="Maximum tokens of post text sent to OpenAI; longer posts keep their most "
+                             "claim-like sentences (default: 1000, 0 disables compaction)")
+    parser.add_argument("--compaction-method", choices=METHODS, default="embedding",
+                        help="How sentences of long posts are ranked (default: embedding)")
+    parser.add_argument("--no-ledger", action="store_true",
+                        help="Do not record handled posts; posts replayed after a restart are checked again")
+    parser.add_argument("--ledger-retention-days", type=float, default=90,
+                        help="Age after which handled posts are removed from the ledger (default: 90)")
+    parser.add_argument("--no-reply-queue", action="store_true",
+                        help="Post replies directly instead of through the persistent, rate-limited reply queue")
+    parser.add_argument("--replies-per-minute", type=float, default=1.0,
+                        help="Sustained rate at which queued replies are posted (default: 1)")
+    parser.add_argument("--reply-burst", type=int, default=1,
+                        help="Number of queued replies that may be posted back to back (default: 1)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on this port at /metrics (default: disabled)")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="Address the metrics endpoint binds to (default: 127.0.0.1)")
+    parser.add_argument("--tracing", action="store_true",
+                        help="Record OpenTelemetry spans (requires opentelemetry-api and a configured SDK)")
+    return parser.parse_args(argv)
+
+
+async def run_pipeline(pipeline: BotPipeline):
+    """
+    Run a pipeline until it finishes or the process receives SIGINT/SIGTERM.
+
+    On a signal the pipeline stops reading new submissions and drains the
+    work already in flight before returning.
+
+    Args:
+        pipeline (BotPipeline): The pipeline to run
+    """
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, pipeline.stop)
+        except NotImplementedError:
+            # Signal handlers are not available on every platform (e.g. Windows)
+            pass
+
+    await pipeline.run()
+
+
+def main(argv=None):
     """
     Main entry point for the Fact Fetch Reddit bot.
-    
+
     This function orchestrates the entire bot workflow:
     1. Initializes Reddit and OpenAI clients
     2. Creates bot and text normalizer instances
-    3. Monitors the 'vegan' subreddit for new posts
+    3. Monitors the selected subreddits (default: 'vegan') for new posts
     4. Analyzes posts for misinformation using AI
     5. Automatically responds with evidence-based counterarguments
-    
+
     The bot processes posts with more than 100 words to ensure
     sufficient content for meaningful analysis.
+
+    Posts flow through a concurrent pipeline (see BotPipeline), so several
+    OpenAI requests can be in flight while new posts keep arriving.
     """
+    args = parse_args(argv)
+
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port, args.metrics_host)
+    if args.tracing:
+        enable_tracing()
+
     reddit = get_reddit_client()
-    openai = get_openai_client()
+    openai = get_async_openai_client()
     bot = RedditBot()
     normalizer = RedditTextNormalizer()
+    verdict_cache = None if args.no_verdict_cache else VerdictCache(similarity_threshold=args.similarity_threshold)
+    claim_filter = None if args.no_claim_filter else ClaimFilter(threshold=args.claim_threshold)
+    retrieval_index = RetrievalIndex.build() if args.local_retrieval else None
+    repost_index = None if args.no_repost_filter else MinHashIndex(args.repost_threshold, capacity=50_000)
+    compactor = PromptCompactor(args.token_budget, args.compaction_method) if args.token_budget > 0 else None
+    ledger = None if args.no_ledger else Ledger(retention_days=args.ledger_retention_days)
+    if ledger is not None:
+        ledger.compact()
 
-    for i in observe_subreddit(reddit, "vegan"):
-        submission = reddit.submission(i)
+    reply_queue = None
+    if not args.no_reply_queue:
+        # Replies are recorded in the ledger once the queue has actually posted them
+        def record_reply(submission_id, reply):
+            if ledger is not None:
+                ledger.record(submission_id, reply_id=getattr(reply, 'id', None), commit=True)
 
-        # Combine title and body text for analysis
-        submission_text = "title: " + submission.title + "\n body: " + submission.selftext
-        
-        submission_normalized = normalizer.normalize_text(submission_text)
+        reply_queue = ReplyQueue(bot, replies_per_minute=args.replies_per_minute, burst=args.reply_burst,
+                                 on_posted=record_reply)
+        reply_queue.start()
 
-        # Only analyze posts with sufficient content (more than 100 words)
-        if submission_normalized.count(" ") > 100:
-            # Use AI to analyze the post for misinformation
-            result = query(openai, submission_normalized)
-            print(result["result"])
+    # Submissions come populated from the combined listing, so no further fetch is needed per post
+    submissions = observe_subreddits(reddit, args.subreddits)
 
-            # If misinformation is detected, respond with counterargument
-            if result["result"] == "misinformation":
-                print(result["counterargument"])
-                bot.submit_response(submission_id=submission.id, response=result["counterargument"])
+    pipeline = BotPipeline(submissions, openai, bot, normalizer,
+                           concurrency=args.concurrency, queue_size=args.queue_size, verdict_cache=verdict_cache,
+                           claim_filter=claim_filter, retrieval_index=retrieval_index, ledger=ledger,
+                           compactor=compactor, reply_queue=reply_queue, repost_index=repost_index)
+    try:
+        asyncio.run(run_pipeline(pipeline))
+    finally:
+        if reply_queue is not None:
+            # Replies not yet posted stay queued for the next start
+            reply_queue.close()
+        if ledger is not None:
+            ledger.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,10 +1,12 @@
 import os
+from typing import Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
+from fact_fetch.utils.environment import load_environment
 
-def get_openai_client() -> OpenAI:
+
+def get_openai_client(base_url: Optional[str] = None) -> OpenAI:
     """
     Create and return an authenticated OpenAI client instance.
     
@@ -14,6 +16,10 @@ def get_openai_client() -> OpenAI:
     Required environment variables:
         - OPENAI_API_KEY: OpenAI API key for authentication
         
+    Args:
+        base_url (Optional[str]): Base URL of an OpenAI-compatible server, e.g. a local
+                                  stand-in for testing (default: OPENAI_BASE_URL or the OpenAI API)
+        
     Returns:
         OpenAI: Authenticated OpenAI client instance
         
@@ -26,6 +32,24 @@ def get_openai_client() -> OpenAI:
         with the appropriate OpenAI API key. The API key should have
         access to the GPT-4 model and file search capabilities.
     """
-    load_dotenv()
+    load_environment()
+
+    return OpenAI(api_key=os.environ.get('OPENAI_API_KEY'), base_url=base_url)
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Create and return an authenticated asynchronous OpenAI client instance.
+
+    Same configuration as get_openai_client(), for use from asyncio code
+    such as the bot pipeline.
+
+    Required environment variables:
+        - OPENAI_API_KEY: OpenAI API key for authentication
+
+    Returns:
+        AsyncOpenAI: Authenticated asynchronous OpenAI client instance
+    """
+    load_environment()
 
-    return OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
\ No newline at end of file
+    return AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
\ No newline at end of file
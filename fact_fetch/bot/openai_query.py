@@ -1,12 +1,129 @@
+import asyncio
 import json
+import time
+from typing import Optional
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from fact_fetch.bot.openai_client import get_openai_client
+from fact_fetch.bot.retrieval_index import Passage, RetrievalIndex
+from fact_fetch.utils.metrics import Counter, Gauge, Histogram, span
+
+OPENAI_REQUESTS = Counter('fact_fetch_openai_requests_total', "OpenAI requests by outcome", ('outcome',))
+OPENAI_ERRORS = Counter('fact_fetch_openai_errors_total', "Failed OpenAI requests by error type", ('error',))
+OPENAI_LATENCY = Histogram('fact_fetch_openai_request_seconds', "Latency of OpenAI requests")
+OPENAI_IN_FLIGHT = Gauge('fact_fetch_openai_requests_in_flight', "OpenAI requests currently in flight")
+OPENAI_TOKENS = Counter('fact_fetch_openai_tokens_total', "OpenAI tokens used, by kind", ('kind',))
+
+
+# System prompt shared by every fact-checking request
+SYSTEM_PROMPT = """
+                    You are a factual assistant. Use only the documents provided via file_search.
+                    Evaluate the user's message for factual accuracy. Respond only using the following valid JSON format:
+                    {
+                        "result": "misinformation | unverifiable | verified",
+                        "rationale": "reasoning behind your decision",
+                        "counterargument": "persuasive correction if misinformation; otherwise empty string"
+                    }
+                    Do not include any explanation or text outside the JSON object.
+                """
+
+# System prompt used when the evidence is retrieved locally and included in the request
+LOCAL_CONTEXT_PROMPT = """
+                    You are a factual assistant. Use only the research excerpts provided in the user's message.
+                    Evaluate the user's message for factual accuracy. Respond only using the following valid JSON format:
+                    {
+                        "result": "misinformation | unverifiable | verified",
+                        "rationale": "reasoning behind your decision",
+                        "counterargument": "persuasive correction if misinformation; otherwise empty string"
+                    }
+                    Do not include any explanation or text outside the JSON object.
+                """
+
+
+def format_passages(passages: list[Passage]) -> str:
+    """
+    Format retrieved passages as a block of numbered research excerpts.
+
+    Args:
+        passages (list[Passage]): Passages returned by RetrievalIndex.search()
+
+    Returns:
+        str: The excerpts, each headed by the title and URL of its paper
+    """
+    return "\n\n".join(f"[{number}] {passage.title} ({passage.url})\n{passage.text}"
+                        for number, passage in enumerate(passages, start=1))
+
+
+def build_request(text: str, passages: Optional[list[Passage]] = None) -> dict:
+    """
+    Build the arguments of a fact-checking request for the Responses API.
+
+    Shared by the synchronous and asynchronous query functions so that both
+    send exactly the same prompt, model and tool configuration.
+
+    Args:
+        text (str): The text to analyze for factual accuracy
+        passages (Optional[list[Passage]]): Locally retrieved evidence. When given, the
+                                            excerpts are included in the prompt and the
+                                            remote file_search tool is not used.
+
+    Returns:
+        dict: Keyword arguments for client.responses.create
+    """
+    if passages is not None:
+        return dict(
+            input=[
+                {"role": "system", "content": LOCAL_CONTEXT_PROMPT},
+                {"role": "user", "content": "Research excerpts:\n" + format_passages(passages)
+                                            + "\n\nMessage:\n" + text}
+            ],
+            model="gpt-4-turbo",
+            temperature=0,  # Use deterministic responses for consistency
+            text={"format": {"type": "json_object"}},  # Ensure JSON response format
+        )
+
+    return dict(
+        input=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": text}
+        ],
+        model="gpt-4-turbo",
+        temperature=0,  # Use deterministic responses for consistency
+        tools=[{
+            "type": "file_search",
+            "vector_store_ids": ["vs_6893d8d854208191b38588df803cd8e9"],  # Research papers database
+            "max_num_results": 1,  # Limit to most relevant result
+        }],
+        tool_choice="auto",
+        text={"format": {"type": "json_object"}},  # Ensure JSON response format
+    )
+
+
+def _record_request(started: float, response=None, error: Optional[Exception] = None):
+    """
+    Record the metrics of one OpenAI request.
+
+    Args:
+        started (float): time.perf_counter() value taken before the request
+        response: Response of a successful request
+        error (Optional[Exception]): Exception raised by a failed request
+    """
+    OPENAI_LATENCY.observe(time.perf_counter() - started)
+    if error is not None:
+        OPENAI_REQUESTS.labels(outcome='error').inc()
+        OPENAI_ERRORS.labels(error=type(error).__name__).inc()
+        return
+
+    OPENAI_REQUESTS.labels(outcome='ok').inc()
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        OPENAI_TOKENS.labels(kind='input').inc(getattr(usage, 'input_tokens', 0) or 0)
+        OPENAI_TOKENS.labels(kind='output').inc(getattr(usage, 'output_tokens', 0) or 0)
 
 
 # noinspection PyTypeChecker
-def query(client: OpenAI, text: str):
+def query(client: OpenAI, text: str, retrieval_index: Optional[RetrievalIndex] = None, top_k: int = 3):
     """
     Analyze text for misinformation using OpenAI's GPT-4 with file search capabilities.
     
@@ -17,6 +134,9 @@ def query(client: OpenAI, text: str):
     Args:
         client (OpenAI): Authenticated OpenAI client instance
         text (str): The text to analyze for factual accuracy
+        retrieval_index (Optional[RetrievalIndex]): Local index to retrieve evidence from
+                                                    instead of the remote vector store
+        top_k (int): Number of passages to retrieve from the local index (default: 3)
         
     Returns:
         dict: A JSON object containing:
@@ -29,33 +149,54 @@ def query(client: OpenAI, text: str):
         on plant-based diets, sustainability, and related topics. The AI is configured
         to return responses in strict JSON format for consistent parsing.
     """
+    # Retrieve evidence locally when an index is available, otherwise let file search do it
+    passages = retrieval_index.search(text, k=top_k) if retrieval_index is not None else None
+
     # Create the AI response with specialized system prompt and file search
-    response = client.responses.create(
-        input=[
-            {"role": "system", "content":
-                """
-                    You are a factual assistant. Use only the documents provided via file_search.
-                    Evaluate the user's message for factual accuracy. Respond only using the following valid JSON format:
-                    {
-                        "result": "misinformation | unverifiable | verified",
-                        "rationale": "reasoning behind your decision",
-                        "counterargument": "persuasive correction if misinformation; otherwise empty string"
-                    }
-                    Do not include any explanation or text outside the JSON object.
-                """
-            },
-            {"role": "user", "content": text}
-        ],
-        model="gpt-4-turbo",
-        temperature=0,  # Use deterministic responses for consistency
-        tools=[{
-            "type": "file_search",
-            "vector_store_ids": ["vs_6893d8d854208191b38588df803cd8e9"],  # Research papers database
-            "max_num_results": 1,  # Limit to most relevant result
-        }],
-        tool_choice="auto",
-        text={"format": {"type": "json_object"}},  # Ensure JSON response format
-    )
+    started = time.perf_counter()
+    with OPENAI_IN_FLIGHT.track_inprogress(), span('openai.query', local_retrieval=passages is not None):
+        try:
+            response = client.responses.create(**build_request(text, passages))
+        except Exception as e:
+            _record_request(started, error=e)
+            raise
+    _record_request(started, response)
+
+    return json.loads(response.output_text)
+
+
+# noinspection PyTypeChecker
+async def async_query(client: AsyncOpenAI, text: str, retrieval_index: Optional[RetrievalIndex] = None,
+                      top_k: int = 3):
+    """
+    Analyze text for misinformation without blocking the event loop.
+
+    Asynchronous counterpart of query(), used by the bot pipeline to keep
+    several classification requests in flight at once.
+
+    Args:
+        client (AsyncOpenAI): Authenticated asynchronous OpenAI client instance
+        text (str): The text to analyze for factual accuracy
+        retrieval_index (Optional[RetrievalIndex]): Local index to retrieve evidence from
+                                                    instead of the remote vector store
+        top_k (int): Number of passages to retrieve from the local index (default: 3)
+
+    Returns:
+        dict: The same JSON object as query()
+    """
+    passages = None
+    if retrieval_index is not None:
+        # The query embedding is CPU-bound, so search in a worker thread
+        passages = await asyncio.to_thread(retrieval_index.search, text, top_k)
+
+    started = time.perf_counter()
+    with OPENAI_IN_FLIGHT.track_inprogress(), span('openai.query', local_retrieval=passages is not None):
+        try:
+            response = await client.responses.create(**build_request(text, passages))
+        except Exception as e:
+            _record_request(started, error=e)
+            raise
+    _record_request(started, response)
 
     return json.loads(response.output_text)
 
@@ -0,0 +1,489 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+
+from openai import AsyncOpenAI
+
+from fact_fetch.analysis.dedup import MinHashIndex
+from fact_fetch.bot.claim_filter import ClaimFilter
+from fact_fetch.bot.ledger import SKIPPED_FILTERED, SKIPPED_TOO_SHORT, Ledger, content_hash
+from fact_fetch.bot.openai_query import async_query
+from fact_fetch.bot.prompt_compaction import PromptCompactor
+from fact_fetch.bot.reddit_bot import RedditBot
+from fact_fetch.bot.reply_queue import ReplyQueue
+from fact_fetch.bot.retrieval_index import RetrievalIndex
+from fact_fetch.bot.verdict_cache import VerdictCache, async_cached_query
+from fact_fetch.utils.metrics import Counter, Gauge, Histogram, span
+from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+logger = logging.getLogger(__name__)
+
+STAGE_LATENCY = Histogram('fact_fetch_pipeline_stage_seconds', "Time spent on a submission in each pipeline stage",
+                          ('stage',))
+STAGE_ERRORS = Counter('fact_fetch_pipeline_errors_total', "Submissions that failed in a pipeline stage", ('stage',))
+SKIPPED = Counter('fact_fetch_pipeline_skipped_total', "Submissions dropped before classification, by reason",
+                  ('reason',))
+VERDICTS = Counter('fact_fetch_verdicts_total', "Verdicts by subreddit", ('subreddit', 'verdict'))
+REPOSTS = Counter('fact_fetch_pipeline_reposts_total', "Near-duplicate posts answered with the verdict of the original")
+QUEUE_DEPTH = Gauge('fact_fetch_pipeline_queue_depth', "Items waiting in front of each pipeline stage", ('queue',))
+
+# Marker passed down the queues to tell a stage that no more work will arrive
+_STOP = object()
+
+
+class PipelineItem(NamedTuple):
+    """
+    A submission travelling through the pipeline.
+
+    Attributes:
+        submission (Any): The Reddit submission object
+        text (str): Combined title and body, as read from Reddit
+        normalized (Optional[str]): Normalized text, set by the normalize stage
+        result (Optional[dict]): Verdict returned by the classify stage
+    """
+    submission: Any
+    text: str
+    normalized: Optional[str] = None
+    result: Optional[dict] = None
+
+
+def _subreddit_name(submission: Any) -> Optional[str]:
+    """
+    Get the name of the subreddit a submission was posted in.
+
+    Args:
+        submission (Any): Reddit submission object
+
+    Returns:
+        Optional[str]: The subreddit name, or None if it is not available
+    """
+    subreddit = getattr(submission, 'subreddit', None)
+    return str(subreddit) if subreddit is not None else None
+
+
+class BotPipeline:
+    """
+    Concurrent pipeline that fact-checks submissions as they arrive.
+
+    The pipeline runs these stages connected by bounded queues:
+    - ingest: reads submissions from the (blocking) Reddit stream in a background thread
+    - normalize: drops posts already in the ledger, cleans the text and drops posts that are too short
+      to analyze; near-duplicates of a recently classified post (reposts, spam templates) reuse its
+      verdict and go straight to the reply stage
+    - gate (optional): drops posts that the local claim filter scores as off-topic, and
+      compacts long posts to a token budget
+    - classify: sends posts to OpenAI, with several requests in flight at once
+    - reply: posts counterarguments for posts classified as misinformation, or hands
+      them to a persistent reply queue that posts them within Reddit's rate limits
+
+    Bounded queues provide backpressure: when OpenAI is slow, the queues fill
+    up and ingestion pauses instead of buffering without limit. Stopping the
+    pipeline stops ingestion and lets every stage drain the work already queued.
+
+    With a ledger, every post the pipeline finishes with is recorded, so
+    posts replayed by the Reddit stream after a restart are skipped before
+    any work is done on them. Misinformation only counts as finished once
+    its reply is posted or queued; a post whose reply failed is checked
+    again after a restart.
+    """
+
+    def __init__(self, source: Iterable[Any], openai_client: AsyncOpenAI, bot: RedditBot,
+                 normalizer: Optional[RedditTextNormalizer] = None, concurrency: int = 4,
+                 queue_size: int = 100, min_words: int = 100, verdict_cache: Optional[VerdictCache] = None,
+                 claim_filter: Optional[ClaimFilter] = None, retrieval_index: Optional[RetrievalIndex] = None,
+                 ledger: Optional[Ledger] = None, compactor: Optional[PromptCompactor] = None,
+                 reply_queue: Optional[ReplyQueue] = None, repost_index: Optional[MinHashIndex] = None,
+                 stage_observer: Optional[Callable[[str, float], None]] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            source (Iterable[Any]): Blocking iterable of Reddit submissions, e.g. observe_subreddit()
+            openai_client (AsyncOpenAI): Authenticated asynchronous OpenAI client
+            bot (RedditBot): Bot used to post replies
+            normalizer (Optional[RedditTextNormalizer]): Text normalizer (default: a new instance)
+            concurrency (int): Maximum number of OpenAI requests in flight (default: 4)
+            queue_size (int): Capacity of each queue between stages (default: 100)
+            min_words (int): Posts with this many spaces or fewer are skipped (default: 100)
+            verdict_cache (Optional[VerdictCache]): Cache consulted before calling OpenAI (default: None)
+            claim_filter (Optional[ClaimFilter]): Local gate deciding which posts reach OpenAI (default: None)
+            retrieval_index (Optional[RetrievalIndex]): Local evidence index used instead of the remote
+                                                        vector store (default: None)
+            ledger (Optional[Ledger]): Record of handled submissions, used to skip posts seen before
+                                       a restart (default: None)
+            compactor (Optional[PromptCompactor]): Caps the text sent to OpenAI at a token budget (default: None)
+            reply_queue (Optional[ReplyQueue]): Queue that posts replies in the background; the
+                                                ledger is then updated by the queue's on_posted
+                                                callback (default: None, replies are posted directly)
+            repost_index (Optional[MinHashIndex]): Index of recent posts; near-duplicates of a classified
+                                                   post reuse its verdict instead of calling OpenAI,
+                                                   and are still replied to (default: None)
+            stage_observer (Optional[Callable]): Called with the stage name ('normalize', 'gate', 'compact',
+                                                 'classify' or 'reply') and the seconds spent on
+                                                 each submission in that stage (default: None)
+        """
+        self.source = source
+        self.openai_client = openai_client
+        self.bot = bot
+        self.normalizer = normalizer or RedditTextNormalizer()
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.min_words = min_words
+        self.verdict_cache = verdict_cache
+        self.claim_filter = claim_filter
+        self.retrieval_index = retrieval_index
+        self.ledger = ledger
+        self.compactor = compactor
+        self.reply_queue = reply_queue
+        self.repost_index = repost_index
+        self.stage_observer = stage_observer
+
+        # Verdicts of the recently classified posts, reused for their reposts
+        self._verdicts: OrderedDict[str, dict] = OrderedDict()
+
+        self._stop_requested = threading.Event()
+        self._stopping: Optional[asyncio.Event] = None
+        self._ingest_done: Optional[asyncio.Event] = None
+        self._queues: dict[str, asyncio.Queue] = {}
+
+    def stop(self):
+        """
+        Request a graceful shutdown.
+
+        Ingestion stops, and the run() call returns once every submission
+        already in the pipeline has been classified and replied to. Safe to
+        call from a signal handler running on the event loop.
+        """
+        self._stop_requested.set()
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def queue_depths(self) -> dict[str, int]:
+        """
+        Report the number of items waiting in front of each stage.
+
+        Returns:
+            dict: Stage name -> number of queued items
+        """
+        return {name: queue.qsize() for name, queue in self._queues.items()}
+
+    async def run(self):
+        """
+        Run the pipeline until the source is exhausted or stop() is called.
+        """
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._ingest_done = asyncio.Event()
+        if self._stop_requested.is_set():
+            self._stopping.set()
+        self._queues = {name: asyncio.Queue(maxsize=self.queue_size)
+                        for name in ('normalize', 'gate', 'classify', 'reply')}
+        for name, queue in self._queues.items():
+            QUEUE_DEPTH.labels(queue=name).set_function(queue.qsize)
+
+        # The Reddit stream blocks, so it is read in a daemon thread that cannot hold up shutdown
+        threading.Thread(target=self._read_source, args=(loop,), name='reddit-ingest', daemon=True).start()
+
+        normalize = asyncio.create_task(self._supervise('normalize', self._normalize))
+        gate = asyncio.create_task(self._supervise('gate', self._gate))
+        classifiers = [asyncio.create_task(self._supervise('classify', self._classify))
+                       for _ in range(self.concurrency)]
+        reply = asyncio.create_task(self._supervise('reply', self._reply))
+
+        await self._ingest()
+        await normalize
+        await gate
+        await asyncio.gather(*classifiers)
+        await self._queues['reply'].put(_STOP)
+        await reply
+
+        if self.compactor is not None:
+            logger.info(f"Prompt compaction: {self.compactor.stats()}")
+
+        if self.verdict_cache is not None:
+            try:
+                self.verdict_cache.save()
+            except Exception as e:
+                logger.error(f"Failed to save the verdict cache: {str(e)}")
+            logger.info(f"Verdict cache: {self.verdict_cache.stats()}")
+        if self.ledger is not None:
+            self.ledger.flush()
+
+    async def _supervise(self, stage: str, worker: Callable[[], Any]):
+        """
+        Run a stage worker, restarting it if it fails unexpectedly.
+
+        The stages hand work to each other through bounded queues, so a
+        worker that died would leave the stage before it blocked on a full
+        queue and hang the whole pipeline. The submission being handled
+        when the worker failed is lost; the others continue.
+
+        Args:
+            stage (str): Name of the stage, for logs and metrics
+            worker (Callable): Coroutine function running the stage until its stop marker
+        """
+        while True:
+            try:
+                await worker()
+                return
+            except Exception as e:
+                logger.exception(f"The {stage} worker failed and is restarted: {str(e)}")
+                STAGE_ERRORS.labels(stage=stage).inc()
+
+    def _observe(self, stage: str, started: float):
+        """
+        Record the time a submission spent in a stage and report it to the stage observer, if there is one.
+
+        Args:
+            stage (str): Name of the stage
+            started (float): time.perf_counter() value taken when the stage started work on the submission
+        """
+        seconds = time.perf_counter() - started
+        STAGE_LATENCY.labels(stage=stage).observe(seconds)
+        if self.stage_observer is not None:
+            self.stage_observer(stage, seconds)
+
+    def _record(self, item: PipelineItem, **fields):
+        """
+        Record the outcome of a submission in the ledger, if there is one.
+
+        Args:
+            item (PipelineItem): The submission
+            **fields: Fields passed to Ledger.record()
+        """
+        if self.ledger is not None:
+            self.ledger.record(item.submission.id, content_hash=content_hash(item.text), **fields)
+
+    def _read_source(self, loop: asyncio.AbstractEventLoop):
+        """
+        Read submissions from the source and hand them to the event loop.
+
+        Runs in the ingest thread. Reading the title and body may trigger a
+        lazy fetch from Reddit, so it happens here rather than on the loop.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): Loop running the pipeline
+        """
+        try:
+            for submission in self.source:
+                if self._stop_requested.is_set():
+                    break
+
+                # Combine title and body text for analysis
+                item = PipelineItem(submission, "title: " + submission.title + "\n body: " + submission.selftext)
+
+                # Blocks while the queue is full, which pauses reading from Reddit
+                asyncio.run_coroutine_threadsafe(self._queues['normalize'].put(item), loop).result()
+        except Exception as e:
+            logger.error(f"Failed to read submissions: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(self._ingest_done.set)
+
+    async def _ingest(self):
+        """
+        Wait until the source is exhausted or a stop is requested, then stop the next stage.
+        """
+        done_waiter = asyncio.create_task(self._ingest_done.wait())
+        stop_waiter = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait({done_waiter, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+        done_waiter.cancel()
+        stop_waiter.cancel()
+
+        await self._queues['normalize'].put(_STOP)
+
+    async def _normalize(self):
+        """
+        Normalize submissions and forward those long enough to analyze.
+
+        Submissions already in the ledger are dropped first, so a restart does
+        not repeat any work.
+        """
+        while True:
+            item = await self._queues['normalize'].get()
+            if item is _STOP:
+                break
+
+            if self.ledger is not None and self.ledger.seen(item.submission.id):
+                SKIPPED.labels(reason='seen').inc()
+                continue
+
+            started = time.perf_counter()
+            try:
+                normalized = self.normalizer.normalize_text(item.text)
+            except Exception as e:
+                logger.error(f"Failed to normalize submission {item.submission.id}: {str(e)}")
+                STAGE_ERRORS.labels(stage='normalize').inc()
+                continue
+            self._observe('normalize', started)
+
+            # Only analyze posts with sufficient content (more than 100 words)
+            if normalized.count(" ") <= self.min_words:
+                SKIPPED.labels(reason=SKIPPED_TOO_SHORT).inc()
+                self._record(item, verdict=SKIPPED_TOO_SHORT)
+                continue
+
+            item = item._replace(normalized=normalized)
+            if self.repost_index is not None:
+                original = self.repost_index.query_or_add(item.submission.id, normalized)
+                result = self._verdicts.get(original) if original is not None else None
+                if result is not None:
+                    # A repost of misinformation still gets a counterargument, without another OpenAI call.
+                    # Reposts of posts that are not classified yet go through the pipeline as usual.
+                    logger.info(f"Submission {item.submission.id} is a near-duplicate of {original}; "
+                                f"reusing its verdict")
+                    REPOSTS.inc()
+                    await self._handle_verdict(item, result)
+                    continue
+
+            await self._queues['gate'].put(item)
+
+        await self._queues['gate'].put(_STOP)
+
+    async def _gate(self):
+        """
+        Drop posts that the claim filter does not consider worth a fact-checking call.
+
+        Without a claim filter every post is forwarded.
+        """
+        while True:
+            item = await self._queues['gate'].get()
+            if item is _STOP:
+                break
+
+            if self.claim_filter is not None:
+                started = time.perf_counter()
+                try:
+                    # Embedding is CPU-bound, so score in a worker thread
+                    decision = await asyncio.to_thread(self.claim_filter.check, item.submission.id, item.normalized,
+                                                       _subreddit_name(item.submission))
+                except Exception as e:
+                    logger.error(f"Failed to score submission {item.submission.id}: {str(e)}")
+                    STAGE_ERRORS.labels(stage='gate').inc()
+                    decision = None
+                self._observe('gate', started)
+
+                if decision is not None and not decision.escalated:
+                    SKIPPED.labels(reason=SKIPPED_FILTERED).inc()
+                    self._record(item, verdict=SKIPPED_FILTERED)
+                    continue
+
+            if self.compactor is not None:
+                started = time.perf_counter()
+                try:
+                    # Ranking sentences may embed them, so compact in a worker thread
+                    compaction = await asyncio.to_thread(self.compactor.compact, item.normalized)
+                    item = item._replace(normalized=compaction.text)
+                except Exception as e:
+                    # Classify the full text rather than dropping the post
+                    logger.error(f"Failed to compact submission {item.submission.id}: {str(e)}")
+                    STAGE_ERRORS.labels(stage='compact').inc()
+                self._observe('compact', started)
+
+            await self._queues['classify'].put(item)
+
+        # One stop marker per classify worker
+        for _ in range(self.concurrency):
+            await self._queues['classify'].put(_STOP)
+
+    async def _classify(self):
+        """
+        Classify submissions with OpenAI and forward misinformation to the reply stage.
+        """
+        while True:
+            item = await self._queues['classify'].get()
+            if item is _STOP:
+                break
+
+            started = time.perf_counter()
+            try:
+                with span('pipeline.classify', submission_id=item.submission.id):
+                    # Use AI to analyze the post for misinformation, unless a similar post was already checked
+                    if self.verdict_cache is not None:
+                        result = await async_cached_query(self.openai_client, item.normalized, self.verdict_cache,
+                                                          self.retrieval_index)
+                    else:
+                        result = await async_query(self.openai_client, item.normalized, self.retrieval_index)
+
+                # The response format is a JSON object without a schema, so the keys are not guaranteed
+                verdict = result.get("result") if isinstance(result, dict) else None
+                if not isinstance(verdict, str) or not verdict:
+                    raise ValueError(f"Response has no verdict: {result!r}")
+            except Exception as e:
+                logger.error(f"Failed to classify submission {item.submission.id}: {str(e)}")
+                STAGE_ERRORS.labels(stage='classify').inc()
+                continue
+            self._observe('classify', started)
+
+            if self.claim_filter is not None:
+                self.claim_filter.record_verdict(item.submission.id, verdict)
+            if self.repost_index is not None:
+                self._verdicts[item.submission.id] = result
+                while self.repost_index.capacity is not None and len(self._verdicts) > self.repost_index.capacity:
+                    self._verdicts.popitem(last=False)
+            await self._handle_verdict(item, result)
+
+    async def _handle_verdict(self, item: PipelineItem, result: dict):
+        """
+        Count the verdict of a submission and forward misinformation to the reply stage.
+
+        Args:
+            item (PipelineItem): The submission
+            result (dict): Its validated classification result
+        """
+        verdict = result["result"]
+        logger.info(f"Submission {item.submission.id} classified as {verdict}")
+        VERDICTS.labels(subreddit=_subreddit_name(item.submission) or 'unknown', verdict=verdict).inc()
+
+        # If misinformation is detected, respond with counterargument. The post is only recorded
+        # once the reply is posted or queued, so a failed reply is retried after a restart.
+        if verdict == "misinformation":
+            await self._queues['reply'].put(item._replace(result=result))
+        else:
+            self._record(item, verdict=verdict)
+
+    async def _reply(self):
+        """
+        Post counterarguments, one at a time, without blocking the event loop.
+        """
+        while True:
+            item = await self._queues['reply'].get()
+            if item is _STOP:
+                break
+
+            counterargument = item.result.get("counterargument") or ""
+            if not isinstance(counterargument, str) or not counterargument.strip():
+                logger.error(f"Not replying to {item.submission.id}: the response has no counterargument")
+                STAGE_ERRORS.labels(stage='reply').inc()
+                continue
+
+            logger.debug(f"Counterargument for {item.submission.id}: {counterargument}")
+            started = time.perf_counter()
+            if self.reply_queue is not None:
+                # Queuing is a single local write, so classification never waits for Reddit
+                try:
+                    await asyncio.to_thread(self.reply_queue.enqueue, item.submission.id, counterargument,
+                                            created_utc=getattr(item.submission, 'created_utc', None),
+                                            score=getattr(item.submission, 'score', 0) or 0)
+                except Exception as e:
+                    logger.error(f"Failed to queue reply to {item.submission.id}: {str(e)}")
+                    STAGE_ERRORS.labels(stage='reply').inc()
+                    continue
+                self._observe('reply', started)
+                # The queue ignores a second reply to the same post, so this record need not be committed at once
+                self._record(item, verdict=item.result["result"])
+                continue
+
+            try:
+                reply = await asyncio.to_thread(self.bot.submit_response, submission_id=item.submission.id,
+                                                response=counterargument)
+            except Exception:
+                # submit_response already logged the failure; keep the pipeline running
+                STAGE_ERRORS.labels(stage='reply').inc()
+                continue
+            self._observe('reply', started)
+
+            # Commit at once: a reply lost from the ledger could be posted twice
+            self._record(item, verdict=item.result["result"], reply_id=getattr(reply, 'id', None), commit=True)
@@ -0,0 +1,302 @@
+import json
+import logging
+import re
+import sys
+import threading
+from collections import Counter as TermCounter
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+
+from fact_fetch.bot.claim_filter import DEFAULT_EXEMPLARS_PATH, DEFAULT_TOPICS_PATH
+from fact_fetch.utils.embeddings import DEFAULT_MODEL_NAME, encode_texts
+from fact_fetch.utils.metrics import Counter, Histogram
+
+try:
+    # Optional: exact token counts for OpenAI models
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Model whose tokenizer is used to count tokens
+DEFAULT_TOKENIZER_MODEL = 'gpt-4-turbo'
+
+# Ways of ranking sentences
+METHODS = ('embedding', 'extractive')
+
+# Sentence boundaries in normalized text
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# Approximate tokens when tiktoken is not available: words and individual punctuation marks
+_APPROXIMATE_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+# Separator between title and body in the text sent to query()
+_BODY_MARKER = ' body: '
+
+PROMPT_TOKENS = Histogram('fact_fetch_prompt_tokens', "Tokens of post text sent to OpenAI, before and after compaction",
+                          ('stage',), buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+TOKENS_SAVED = Counter('fact_fetch_prompt_tokens_saved_total', "Input tokens saved by prompt compaction")
+
+
+class CompactionResult(NamedTuple):
+    """
+    Outcome of compacting one post.
+
+    Attributes:
+        text (str): Text to send to query()
+        original_tokens (int): Tokens of the original text
+        tokens (int): Tokens of the compacted text
+        sentences_kept (int): Number of body sentences kept
+        sentences_total (int): Number of body sentences in the original text
+    """
+    text: str
+    original_tokens: int
+    tokens: int
+    sentences_kept: int
+    sentences_total: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding(model_name: str = DEFAULT_TOKENIZER_MODEL):
+    """
+    Load the tiktoken encoding of a model once per process.
+
+    Args:
+        model_name (str): OpenAI model name (default: 'gpt-4-turbo')
+
+    Returns:
+        The encoding, or None if tiktoken is missing or its data cannot be loaded
+    """
+    global _encoding
+    if tiktoken is None:
+        return None
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.encoding_for_model(model_name)
+            except Exception as e:
+                # The encoding is downloaded on first use, which fails offline
+                logger.warning(f"Falling back to approximate token counts: {str(e)}")
+                _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the tokenizer of the model query() uses.
+
+    Without tiktoken, words and punctuation marks are counted instead,
+    which is close to the real count for English text.
+
+    Args:
+        text (str): Text to count
+
+    Returns:
+        int: Number of tokens
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode_ordinary(text))
+    return len(_APPROXIMATE_TOKEN.findall(text))
+
+
+def _truncate_tokens(text: str, budget: int) -> str:
+    """
+    Cut a text down to at most budget tokens.
+
+    Args:
+        text (str): Text to cut
+        budget (int): Maximum number of tokens
+
+    Returns:
+        str: The beginning of the text
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode_ordinary(text)[:budget])
+    matches = list(_APPROXIMATE_TOKEN.finditer(text))
+    return text[:matches[budget - 1].end()] if len(matches) > budget > 0 else text if budget > 0 else ""
+
+
+class PromptCompactor:
+    """
+    Caps the post text sent to query() at a token budget.
+
+    Short posts pass through unchanged. For longer posts the title is kept
+    and body sentences are ranked, then the best ranked sentences that fit
+    the budget are kept in their original order. Blind truncation would
+    keep the preamble of a wall of text and drop the claims at its end.
+
+    Sentences are ranked either by embedding similarity to example claims
+    and the research topics ('embedding', the same exemplars the claim
+    filter uses), or by a cheap extractive score favouring sentences that
+    share words with the title and use words rare within the post
+    ('extractive').
+    """
+
+    def __init__(self, token_budget: int = 1000, method: str = 'embedding',
+                 exemplars_path: str = DEFAULT_EXEMPLARS_PATH, topics_path: str = DEFAULT_TOPICS_PATH,
+                 embed: Optional[Callable[[list[str]], np.ndarray]] = None):
+        """
+        Initialize the compactor.
+
+        Args:
+            token_budget (int): Maximum number of tokens of the compacted text (default: 1000)
+            method (str): 'embedding' or 'extractive' sentence ranking (default: 'embedding')
+            exemplars_path (str): JSON file with 'claims' example sentences
+            topics_path (str): JSON list of research papers whose titles and descriptions are topic exemplars
+            embed (Optional[Callable]): Function returning unit-length embeddings for a list of
+                                        texts (default: the shared MiniLM model)
+
+        Raises:
+            ValueError: If the method is unknown
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}; expected one of {METHODS}")
+
+        self.token_budget = token_budget
+        self.method = method
+        self.embed = embed or (lambda texts: encode_texts(texts, DEFAULT_MODEL_NAME))
+        self._lock = threading.Lock()
+
+        self.posts = 0
+        self.compacted = 0
+        self.original_tokens = 0
+        self.tokens = 0
+
+        self._topic_vectors = None
+        if method == 'embedding':
+            with open(exemplars_path, 'r', encoding='utf-8') as file:
+                claims = json.load(file)['claims']
+            with open(topics_path, 'r', encoding='utf-8') as file:
+                topics = [f"{paper['title']}. {paper['description']}" for paper in json.load(file)]
+            self._topic_vectors = self.embed(claims + topics)
+
+    def _rank(self, title: str, sentences: list[str]) -> np.ndarray:
+        """
+        Score body sentences; higher scores are kept first.
+
+        Args:
+            title (str): Title of the post
+            sentences (list[str]): Body sentences
+
+        Returns:
+            np.ndarray: One score per sentence
+        """
+        if self.method == 'embedding':
+            return (self.embed(sentences) @ self._topic_vectors.T).max(axis=1)
+
+        # Extractive: words shared with the title, plus the average rarity of the sentence's words
+        # within the post, so that repeated boilerplate ranks below specific statements
+        words = [set(re.findall(r'\w{4,}', sentence)) for sentence in sentences]
+        title_words = set(re.findall(r'\w{4,}', title))
+        frequencies = TermCounter(word for sentence_words in words for word in sentence_words)
+        return np.array([len(sentence_words & title_words)
+                         + sum(np.log(len(sentences) / frequencies[word]) for word in sentence_words)
+                         / (len(sentence_words) + 1)
+                         for sentence_words in words])
+
+    def compact(self, text: str) -> CompactionResult:
+        """
+        Compact a normalized post to the token budget.
+
+        Args:
+            text (str): Normalized "title: ... body: ..." text
+
+        Returns:
+            CompactionResult: The text to send and the token counts
+        """
+        original_tokens = count_tokens(text)
+        if original_tokens <= self.token_budget:
+            result = CompactionResult(text, original_tokens, original_tokens, 0, 0)
+            self._record(result)
+            return result
+
+        title, _, body = text.partition(_BODY_MARKER)
+        if not body:
+            title, body = "", text
+        title = _truncate_tokens(title, self.token_budget // 4)
+
+        sentences = [sentence for sentence in _SENTENCE_END.split(body) if sentence.strip()]
+        costs = [count_tokens(sentence) + 1 for sentence in sentences]
+        remaining = self.token_budget - (count_tokens(title + _BODY_MARKER) if title else 0)
+
+        # Greedily keep the best ranked sentences that still fit
+        kept = []
+        for index in np.argsort(-self._rank(title, sentences), kind='stable'):
+            if costs[index] <= remaining:
+                kept.append(int(index))
+                remaining -= costs[index]
+
+        compacted_body = " ".join(sentences[index] for index in sorted(kept))
+        if not kept and sentences:
+            # Not even one sentence fits: fall back to the start of the body
+            compacted_body = _truncate_tokens(body, remaining)
+        compacted = title + _BODY_MARKER + compacted_body if title else compacted_body
+
+        result = CompactionResult(compacted, original_tokens, count_tokens(compacted), len(kept), len(sentences))
+        self._record(result)
+        logger.info(f"Compacted post from {result.original_tokens} to {result.tokens} tokens "
+                    f"({result.sentences_kept}/{result.sentences_total} sentences)")
+        return result
+
+    def _record(self, result: CompactionResult):
+        """
+        Add a result to the statistics and metrics.
+
+        Args:
+            result (CompactionResult): Outcome of compacting one post
+        """
+        with self._lock:
+            self.posts += 1
+            self.compacted += result.saved_tokens > 0
+            self.original_tokens += result.original_tokens
+            self.tokens += result.tokens
+
+        PROMPT_TOKENS.labels(stage='original').observe(result.original_tokens)
+        PROMPT_TOKENS.labels(stage='compacted').observe(result.tokens)
+        TOKENS_SAVED.inc(result.saved_tokens)
+
+    def stats(self) -> dict:
+        """
+        Report the token savings so far.
+
+        Returns:
+            dict: Number of posts and of compacted posts, tokens before and after, and the saved share
+        """
+        return {
+            'posts': self.posts,
+            'compacted': self.compacted,
+            'original_tokens': self.original_tokens,
+            'tokens': self.tokens,
+            'saved_ratio': 1 - self.tokens / self.original_tokens if self.original_tokens else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    """
+    Compact a text file and print the result.
+
+    Usage:
+        python -m fact_fetch.bot.prompt_compaction file.txt [token_budget] [method]
+    """
+    from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+    logging.basicConfig(level=logging.INFO)
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as file:
+        normalized = RedditTextNormalizer().normalize_text(file.read())
+    compactor = PromptCompactor(int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+                                sys.argv[3] if len(sys.argv) > 3 else 'embedding')
+    compaction = compactor.compact(normalized)
+    print(compaction.text)
+    print(compactor.stats())
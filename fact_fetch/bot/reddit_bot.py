@@ -2,10 +2,14 @@ import logging
 from datetime import datetime
 
 from fact_fetch.bot.reddit_client import get_reddit_client
+from fact_fetch.utils.metrics import Counter, Histogram, span
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REPLIES = Counter('fact_fetch_reddit_replies_total', "Replies posted to Reddit by outcome", ('outcome',))
+REPLY_LATENCY = Histogram('fact_fetch_reddit_reply_seconds', "Latency of posting a reply to Reddit")
+
 class RedditBot:
     """
     A Reddit bot class that handles posting and responding to Reddit submissions.
@@ -43,6 +47,9 @@ class RedditBot:
             submission_id (str): The Reddit submission ID to reply to
             response (str): The counterargument text to post as a reply
             
+        Returns:
+            praw.models.Comment: The posted reply
+            
         Raises:
             Exception: If the reply submission fails
             
@@ -51,12 +58,17 @@ class RedditBot:
             containing misinformation with evidence-based counterarguments.
         """
         try:
-            # Get the submission object and post the reply
-            submission = self.reddit.submission(submission_id)
-            submission.reply(response)
+            with REPLY_LATENCY.time(), span('reddit.submit_response', submission_id=submission_id):
+                # Get the submission object and post the reply
+                submission = self.reddit.submission(submission_id)
+                reply = submission.reply(response)
             logger.info(f"Successfully replied to post: {submission.url}")
+            REPLIES.labels(outcome='ok').inc()
+
+            return reply
         except Exception as e:
             logger.error(f"Failed to submit response: {str(e)}")
+            REPLIES.labels(outcome='error').inc()
             raise
 
     def submit_post(self, subreddit_name: str, title: str, content: str):
@@ -1,7 +1,8 @@
 import os
 
 import praw
-from dotenv import load_dotenv
+
+from fact_fetch.utils.environment import load_environment
 
 
 def get_reddit_client() -> praw.Reddit:
@@ -29,7 +30,7 @@ def get_reddit_client() -> praw.Reddit:
         The .env file should be created in the project root directory
         with the appropriate Reddit API credentials.
     """
-    load_dotenv()
+    load_environment()
 
     return praw.Reddit(
         client_id=os.getenv("REDDIT_CLIENT_ID"),
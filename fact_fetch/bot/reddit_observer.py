@@ -1,6 +1,58 @@
+import sys
+from collections import OrderedDict
+from typing import Hashable, Iterable, Iterator, Optional
+
 import praw
+from praw.models import Submission
 
 from fact_fetch.bot.reddit_client import get_reddit_client
+from fact_fetch.utils.metrics import Counter
+
+# Subreddits monitored by default
+DEFAULT_SUBREDDITS = ("vegan",)
+
+SUBMISSIONS_OBSERVED = Counter('fact_fetch_submissions_observed_total', "New submissions read from the stream",
+                               ('subreddit',))
+DUPLICATES_SKIPPED = Counter('fact_fetch_duplicate_submissions_total',
+                             "Submissions skipped as already seen or crossposts of a seen post")
+
+
+class BoundedSeenSet:
+    """
+    Set of recently seen keys with a fixed capacity.
+
+    Once full, the key seen least recently is forgotten, so memory stays
+    bounded however long the stream runs. Reddit streams only ever show
+    recent posts, so old ids never need to be remembered.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        """
+        Create an empty set.
+
+        Args:
+            capacity (int): Maximum number of keys remembered (default: 10,000)
+        """
+        self.capacity = capacity
+        self._keys: OrderedDict[Hashable, None] = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable):
+        """
+        Remember a key, forgetting the oldest one if the set is full.
+
+        Args:
+            key (Hashable): Key to remember
+        """
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
 
 
 def observe_subreddit(reddit: praw.Reddit, subreddit_name: str):
@@ -29,17 +81,75 @@ def observe_subreddit(reddit: praw.Reddit, subreddit_name: str):
     return subreddit.stream.submissions()
 
 
+def _crosspost_parent_id(submission: Submission) -> Optional[str]:
+    """
+    Get the id of the post a submission was crossposted from.
+
+    Reads the attribute from the listing data directly: accessing a missing
+    attribute on a praw object would trigger a fetch from Reddit.
+
+    Args:
+        submission (Submission): Reddit submission
+
+    Returns:
+        Optional[str]: The id of the original post (without the "t3_" prefix), or None
+    """
+    parent = vars(submission).get('crosspost_parent')
+    return parent.split('_', 1)[-1] if parent else None
+
+
+def observe_subreddits(reddit: praw.Reddit, subreddit_names: Iterable[str] = DEFAULT_SUBREDDITS,
+                       dedupe_capacity: int = 10_000) -> Iterator[Submission]:
+    """
+    Stream new submissions from several subreddits at once.
+
+    The subreddits are polled as a single combined listing ("a+b+c"), so
+    monitoring more subreddits does not cost more API requests. Posts are
+    deduplicated across subreddits and crossposts: a crosspost is skipped
+    when its original was already seen, and the original is skipped when
+    a crosspost of it was already seen.
+
+    Args:
+        reddit (praw.Reddit): Authenticated Reddit client instance
+        subreddit_names (Iterable[str]): Names of the subreddits to monitor (default: DEFAULT_SUBREDDITS)
+        dedupe_capacity (int): Number of recent post ids remembered for deduplication (default: 10,000)
+
+    Yields:
+        Submission: New submissions, already populated with the listing data
+                    (title, selftext, subreddit, ...) so reading them needs no
+                    further request
+
+    Note:
+        Like observe_subreddit(), the stream continues indefinitely until interrupted.
+    """
+    seen = BoundedSeenSet(dedupe_capacity)
+
+    for submission in observe_subreddit(reddit, "+".join(subreddit_names)):
+        parent_id = _crosspost_parent_id(submission)
+        if submission.id in seen or (parent_id is not None and parent_id in seen):
+            DUPLICATES_SKIPPED.inc()
+            continue
+
+        seen.add(submission.id)
+        if parent_id is not None:
+            seen.add(parent_id)
+
+        # The subreddit comes with the listing data, so reading it does not trigger a fetch
+        SUBMISSIONS_OBSERVED.labels(subreddit=vars(submission).get('subreddit', 'unknown')).inc()
+        yield submission
+
+
 if __name__ == '__main__':
     """
     Test function to verify subreddit observation functionality.
     
-    Tests the observe_subreddit function by monitoring the "PlantBasedDiet"
-    subreddit and printing details of new submissions to verify the
-    streaming functionality works correctly.
+    Tests the observe_subreddits function by monitoring the subreddits given
+    on the command line (default: "PlantBasedDiet") and printing details of
+    new submissions to verify the streaming functionality works correctly.
     """
     reddit = get_reddit_client()
 
-    for i in observe_subreddit(reddit, "PlantBasedDiet"):
-        print("result: " + str(i))
-        print(reddit.submission(i).title)
-        print(reddit.submission(i).selftext)
\ No newline at end of file
+    for submission in observe_subreddits(reddit, sys.argv[1:] or ["PlantBasedDiet"]):
+        print("result: " + str(submission) + " in r/" + str(submission.subreddit))
+        print(submission.title)
+        print(submission.selftext)
\ No newline at end of file
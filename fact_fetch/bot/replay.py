@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import logging
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from fact_fetch.analysis.json_data_loader import load_json_line_by_line
+from fact_fetch.analysis.sharded_loader import find_submission_dumps, subreddit_from_path
+from fact_fetch.bot.pipeline import BotPipeline
+
+logger = logging.getLogger(__name__)
+
+# Fields of the dump records needed to replay a submission
+REPLAY_FIELDS = ['id', 'title', 'selftext']
+
+
+class ReplaySubmission(NamedTuple):
+    """
+    Submission read from a dump, with the attributes the pipeline uses.
+
+    Attributes:
+        id (str): Reddit submission ID
+        title (str): Title of the submission
+        selftext (str): Body text of the submission
+        subreddit (str): Subreddit the submission was posted in
+    """
+    id: str
+    title: str
+    selftext: str
+    subreddit: str
+
+
+class ReplayReply(NamedTuple):
+    """
+    Reply "posted" by the RecordingBot.
+
+    Attributes:
+        id (str): Fake reply ID
+        submission_id (str): ID of the submission replied to
+        response (str): Text of the reply
+    """
+    id: str
+    submission_id: str
+    response: str
+
+
+class FakeOpenAIError(Exception):
+    """
+    Error raised by FakeAsyncOpenAI to simulate a failed request.
+    """
+
+
+def fake_verdict(prompt: str, misinformation_rate: float = 0.3) -> dict:
+    """
+    Derive a verdict from a hash of the prompt, so the same post always gets the same verdict.
+
+    Args:
+        prompt (str): The user message of the request
+        misinformation_rate (float): Share of prompts classified as misinformation (default: 0.3)
+
+    Returns:
+        dict: A result in the format of query()
+    """
+    bucket = int(hashlib.sha1(prompt.encode('utf-8')).hexdigest(), 16) % 1000
+    result = "misinformation" if bucket < misinformation_rate * 1000 else "unverifiable"
+    return {"result": result, "rationale": "replay",
+            "counterargument": "replay counterargument" if result == "misinformation" else ""}
+
+
+def iter_dump_submissions(file_paths: Optional[list[str]] = None, limit: Optional[int] = None
+                          ) -> Iterator[ReplaySubmission]:
+    """
+    Read submissions from NDJSON dumps for replay.
+
+    Args:
+        file_paths (Optional[list[str]]): Dump files (default: every dump in analysis/resources)
+        limit (Optional[int]): Maximum number of submissions (default: all)
+
+    Yields:
+        ReplaySubmission: Submissions in file order
+    """
+    def read():
+        for file_path in file_paths or find_submission_dumps():
+            subreddit = subreddit_from_path(file_path)
+            for record in load_json_line_by_line(file_path, fields=REPLAY_FIELDS):
+                yield ReplaySubmission(str(record.get('id') or ''), record.get('title') or '',
+                                       record.get('selftext') or '', subreddit)
+
+    return itertools.islice(read(), limit)
+
+
+class FakeAsyncOpenAI:
+    """
+    Local stand-in for AsyncOpenAI with configurable latency and error rate.
+
+    Only client.responses.create() is implemented. Each request sleeps for
+    a random latency, fails with probability error_rate, and otherwise
+    returns a verdict derived from a hash of the prompt, so the same post
+    always gets the same verdict regardless of timing.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, error_rate: float = 0.0,
+                 misinformation_rate: float = 0.3, seed: Optional[int] = None):
+        """
+        Initialize the fake client.
+
+        Args:
+            latency (float): Mean request latency in seconds (default: 0.5)
+            jitter (float): Standard deviation of the latency in seconds (default: 0.2)
+            error_rate (float): Share of requests that fail (default: 0.0)
+            misinformation_rate (float): Share of posts classified as misinformation (default: 0.3)
+            seed (Optional[int]): Seed for latencies and errors
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.misinformation_rate = misinformation_rate
+        self._random = random.Random(seed)
+        self.responses = self
+
+        self.requests = 0
+        self.errors = 0
+
+    async def create(self, **kwargs):
+        """
+        Simulate client.responses.create().
+
+        Args:
+            **kwargs: Request built by build_request()
+
+        Returns:
+            object: An object whose output_text is the JSON verdict
+
+        Raises:
+            FakeOpenAIError: For the simulated share of failed requests
+        """
+        self.requests += 1
+        await asyncio.sleep(max(0.0, self._random.gauss(self.latency, self.jitter)))
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            raise FakeOpenAIError("Simulated OpenAI error")
+
+        output = fake_verdict(kwargs['input'][-1]['content'], self.misinformation_rate)
+        return argparse.Namespace(output_text=json.dumps(output))
+
+
+class RecordingBot:
+    """
+    Stand-in for RedditBot that records replies instead of posting them.
+    """
+
+    def __init__(self):
+        """
+        Initialize the bot with an empty list of replies.
+        """
+        self.replies: list[ReplayReply] = []
+
+    def submit_response(self, submission_id: str, response: str) -> ReplayReply:
+        """
+        Record a reply.
+
+        Args:
+            submission_id (str): The Reddit submission ID to reply to
+            response (str): The counterargument text
+
+        Returns:
+            ReplayReply: The recorded reply
+        """
+        reply = ReplayReply(f"replay{len(self.replies)}", submission_id, response)
+        self.replies.append(reply)
+        return reply
+
+
+def _percentiles(samples: list[float]) -> dict:
+    """
+    Summarize latency samples.
+
+    Args:
+        samples (list[float]): Latencies in seconds
+
+    Returns:
+        dict: Count, p50 and p99 in milliseconds
+    """
+    if not samples:
+        return {'count': 0, 'p50_ms': None, 'p99_ms': None}
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return {'count': len(samples), 'p50_ms': round(float(p50), 3), 'p99_ms': round(float(p99), 3)}
+
+
+async def replay(pipeline: BotPipeline, sample_interval: float = 0.05) -> dict:
+    """
+    Run a pipeline to completion and measure it.
+
+    The pipeline's stage observer is replaced by one collecting latencies,
+    and queue depths are sampled while it runs.
+
+    Args:
+        pipeline (BotPipeline): Pipeline whose source is a finite iterable
+        sample_interval (float): Seconds between queue depth samples (default: 0.05)
+
+    Returns:
+        dict: Elapsed time, per-stage latency percentiles and mean/max queue depths
+    """
+    latencies = defaultdict(list)
+    pipeline.stage_observer = lambda stage, seconds: latencies[stage].append(seconds)
+    depths = defaultdict(list)
+
+    started = time.perf_counter()
+    run = asyncio.create_task(pipeline.run())
+    while not run.done():
+        for name, depth in pipeline.queue_depths().items():
+            depths[name].append(depth)
+        await asyncio.wait({run}, timeout=sample_interval)
+    await run
+    elapsed = time.perf_counter() - started
+
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'stages': {stage: _percentiles(samples) for stage, samples in latencies.items()},
+        'queue_depths': {name: {'mean': round(float(np.mean(samples)), 2), 'max': int(max(samples))}
+                         for name, samples in depths.items()},
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the replay.
+
+    Args:
+        argv (Optional[list[str]]): Arguments to parse (default: sys.argv[1:])
+
+    Returns:
+        argparse.Namespace: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Replay submission dumps through the bot pipeline "
+                                                 "against local stand-ins for OpenAI and Reddit.")
+    parser.add_argument("files", nargs="*", help="NDJSON dumps to replay (default: every dump in analysis/resources)")
+    parser.add_argument("--limit", type=int, default=1000, help="Number of submissions to replay (default: 1000)")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean fake OpenAI latency in seconds (default: 0.5)")
+    parser.add_argument("--jitter", type=float, default=0.2,
+                        help="Standard deviation of the fake OpenAI latency in seconds (default: 0.2)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of fake OpenAI requests that fail (default: 0.0)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of OpenAI requests in flight (default: 4)")
+    parser.add_argument("--queue-size", type=int, default=100,
+                        help="Capacity of each queue between pipeline stages (default: 100)")
+    parser.add_argument("--verdict-cache", action="store_true",
+                        help="Use a fresh verdict cache in a temporary directory")
+    parser.add_argument("--claim-filter", action="store_true", help="Gate posts with the claim filter")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake OpenAI client (default: 0)")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's output")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Replay dumps through the pipeline and print a throughput report.
+
+    Verdicts and replies are produced by FakeAsyncOpenAI and RecordingBot,
+    so runs are reproducible and cost nothing, while normalization, the
+    optional claim filter and verdict cache, and the pipeline's concurrency
+    and backpressure behave exactly as in production.
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    client = FakeAsyncOpenAI(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    bot = RecordingBot()
+
+    with contextlib.ExitStack() as stack:
+        verdict_cache = claim_filter = None
+        if args.verdict_cache:
+            from fact_fetch.bot.verdict_cache import VerdictCache
+            verdict_cache = VerdictCache(stack.enter_context(tempfile.TemporaryDirectory()))
+        if args.claim_filter:
+            from fact_fetch.bot.claim_filter import ClaimFilter
+            claim_filter = ClaimFilter(log_path=None)
+
+        # Count submissions as they are read, including those dropped by the pipeline
+        source = iter_dump_submissions(args.files or None, args.limit)
+        counted = [0]
+
+        def counting_source():
+            for submission in source:
+                counted[0] += 1
+                yield submission
+
+        pipeline = BotPipeline(counting_source(), client, bot, concurrency=args.concurrency,
+                               queue_size=args.queue_size, verdict_cache=verdict_cache, claim_filter=claim_filter)
+
+        # The pipeline prints every verdict and reply; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext():
+            report = asyncio.run(replay(pipeline))
+
+    report = {
+        'submissions': counted[0],
+        'posts_per_second': round(counted[0] / report['elapsed_seconds'], 2) if report['elapsed_seconds'] else None,
+        **report,
+        'openai_requests': client.requests,
+        'openai_errors': client.errors,
+        'replies': len(bot.replies),
+        'verdict_cache': verdict_cache.stats() if verdict_cache is not None else None,
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
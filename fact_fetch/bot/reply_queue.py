@@ -0,0 +1,487 @@
+import logging
+import math
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+from fact_fetch.bot.reddit_bot import RedditBot
+from fact_fetch.utils.metrics import Counter, Gauge
+from fact_fetch.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+# Default location of the queue database
+DEFAULT_QUEUE_PATH = cache_path('reply_queue.sqlite3')
+
+# States of a queued reply
+PENDING = "pending"
+POSTING = "posting"
+POSTED = "posted"
+FAILED = "failed"
+EXPIRED = "expired"
+
+# Reddit errors that no retry can fix
+_PERMANENT_ERRORS = {'DELETED_LINK', 'THREAD_LOCKED', 'TOO_OLD', 'USER_REQUIRED'}
+
+# "Take a break for 9 minutes", "try again in 30 seconds"
+_RATE_LIMIT_DELAY = re.compile(r'(\d+(?:\.\d+)?)\s*(millisecond|second|minute|hour)s?', re.IGNORECASE)
+_UNIT_SECONDS = {'millisecond': 0.001, 'second': 1, 'minute': 60, 'hour': 3600}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    submission_id TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    priority REAL NOT NULL,
+    created_utc REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    reply_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS replies_due_index ON replies (status, priority);
+"""
+
+RETRIES = Counter('fact_fetch_reply_queue_retries_total', "Replies rescheduled after a failed attempt", ('reason',))
+PENDING_REPLIES = Gauge('fact_fetch_reply_queue_pending', "Replies waiting to be posted")
+
+
+class QueuedReply(NamedTuple):
+    """
+    A reply waiting in (or done with) the queue.
+
+    Attributes:
+        submission_id (str): Reddit submission ID to reply to
+        response (str): Text of the reply
+        priority (float): Higher priorities are posted first
+        created_utc (float): Creation time of the submission
+        status (str): PENDING, POSTING, POSTED, FAILED or EXPIRED
+        attempts (int): Number of failed attempts so far
+        not_before (float): Earliest time of the next attempt
+        reply_id (Optional[str]): ID of the posted reply
+        error (Optional[str]): Last error
+    """
+    submission_id: str
+    response: str
+    priority: float
+    created_utc: float
+    status: str
+    attempts: int
+    not_before: float
+    reply_id: Optional[str]
+    error: Optional[str]
+
+
+def parse_rate_limit_delay(error: Exception) -> Optional[float]:
+    """
+    Read how long Reddit asks to wait from a rate limit error.
+
+    Handles praw's RedditAPIException with a RATELIMIT item ("Take a break
+    for 9 minutes before trying again.") and prawcore's TooManyRequests
+    with a retry-after header.
+
+    Args:
+        error (Exception): Error raised while posting
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the error is not a rate limit
+    """
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+
+    messages = [item.message or "" for item in getattr(error, 'items', None) or []
+                if getattr(item, 'error_type', None) == 'RATELIMIT']
+    if not messages and 'RATELIMIT' in str(error):
+        messages = [str(error)]
+    if not messages and type(error).__name__ != 'TooManyRequests':
+        return None
+
+    # A delay may have several parts ("1 minute and 30 seconds"); with several items, wait for the longest
+    delays = [sum(float(amount) * _UNIT_SECONDS[unit.lower()] for amount, unit in _RATE_LIMIT_DELAY.findall(message))
+              for message in messages]
+    delays = [delay for delay in delays if delay > 0]
+    if not delays:
+        # A rate limit without a usable delay: wait a minute
+        return 60.0
+    return max(delays)
+
+
+def _permanent_error(error: Exception) -> bool:
+    """
+    Check whether an error means the reply can never be posted.
+
+    Args:
+        error (Exception): Error raised while posting
+
+    Returns:
+        bool: True for locked, archived or deleted submissions
+    """
+    return any(getattr(item, 'error_type', None) in _PERMANENT_ERRORS for item in getattr(error, 'items', None) or [])
+
+
+class TokenBucket:
+    """
+    Token bucket limiting how often replies are posted.
+
+    Tokens are added at a constant rate up to a capacity; each reply takes
+    one. A burst of up to capacity replies can go out at once, after which
+    replies are spaced by 1/rate seconds. pause() empties the bucket for a
+    given time, which is how Reddit's rate limit feedback is applied.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Create a full bucket.
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of tokens (default: 1)
+            clock (Callable[[], float]): Monotonic clock in seconds (default: time.monotonic)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self._paused_until:
+            self._tokens = min(self.capacity, self._tokens + (now - max(self._updated, self._paused_until)) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """
+        Report how long until a token is available.
+
+        Returns:
+            float: Seconds to wait; 0 if a token is available now
+        """
+        now = self.clock()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now + max(0.0, 1 - self._tokens) / self.rate
+        return max(0.0, 1 - self._tokens) / self.rate
+
+    def take(self) -> bool:
+        """
+        Take a token if one is available.
+
+        Returns:
+            bool: True if a token was taken
+        """
+        if self.delay() > 0:
+            return False
+        self._tokens -= 1
+        return True
+
+    def pause(self, seconds: float):
+        """
+        Empty the bucket and add no tokens for a while.
+
+        Args:
+            seconds (float): Length of the pause
+        """
+        now = self.clock()
+        self._refill(now)
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, now + seconds)
+
+
+class ReplyQueue:
+    """
+    Persistent outbound queue that posts replies within Reddit's rate limits.
+
+    enqueue() only writes the reply to an SQLite database, so the pipeline
+    never waits for Reddit. A worker thread posts queued replies one at a
+    time, highest priority first, as a token bucket allows. Priority
+    favours recent and well scored posts, where a reply is seen by the
+    most readers; replies to posts older than max_age are dropped.
+
+    When Reddit answers with a rate limit ("try again in N minutes"), the
+    whole queue pauses for that long, since limits apply to the account.
+    Other failures are retried with exponential backoff up to max_attempts.
+    Pending replies survive restarts. A reply interrupted while being
+    posted is marked failed rather than retried, since it may have been
+    posted already.
+    """
+
+    def __init__(self, bot: RedditBot, path: str = DEFAULT_QUEUE_PATH, replies_per_minute: float = 1.0,
+                 burst: int = 1, max_attempts: int = 5, base_backoff: float = 30.0, max_backoff: float = 3600.0,
+                 max_age: Optional[float] = 2 * 24 * 3600, score_weight: float = 3600.0,
+                 on_posted: Optional[Callable[[str, Any], None]] = None):
+        """
+        Open (or create) the queue.
+
+        Args:
+            bot (RedditBot): Bot used to post replies
+            path (str): Path of the SQLite database (default: DEFAULT_QUEUE_PATH)
+            replies_per_minute (float): Sustained posting rate (default: 1)
+            burst (int): Number of replies that may be posted back to back (default: 1)
+            max_attempts (int): Failed attempts after which a reply is given up; rate limits
+                                do not count (default: 5)
+            base_backoff (float): Seconds before the first retry, doubled on each failure (default: 30)
+            max_backoff (float): Maximum seconds between retries (default: 3600)
+            max_age (Optional[float]): Age in seconds of a submission after which its reply is
+                                       dropped; None never drops replies (default: 2 days)
+            score_weight (float): Seconds of recency one e-fold of submission score is worth in the
+                                  priority (default: 3600)
+            on_posted (Optional[Callable]): Called from the worker thread with the submission ID
+                                            and the reply once a reply is posted (default: None)
+        """
+        self.bot = bot
+        self.path = path
+        self.bucket = TokenBucket(replies_per_minute / 60, burst)
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_age = max_age
+        self.score_weight = score_weight
+        self.on_posted = on_posted
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        # enqueue() is called from the pipeline and the worker runs in its own thread
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        with self._lock, self._connection:
+            interrupted = self._connection.execute(
+                "UPDATE replies SET status = ?, error = 'interrupted while posting' WHERE status = ?",
+                (FAILED, POSTING)).rowcount
+        if interrupted:
+            logger.warning(f"{interrupted} replies were interrupted while posting and will not be retried")
+
+        PENDING_REPLIES.set_function(self.pending_count)
+
+    def enqueue(self, submission_id: str, response: str, created_utc: Optional[float] = None,
+                score: float = 0) -> bool:
+        """
+        Queue a reply without waiting for it to be posted.
+
+        Args:
+            submission_id (str): Reddit submission ID to reply to
+            response (str): Text of the reply
+            created_utc (Optional[float]): Creation time of the submission (default: now)
+            score (float): Score of the submission (default: 0)
+
+        Returns:
+            bool: False if a reply to the submission was already queued
+        """
+        now = time.time()
+        created_utc = created_utc or now
+        priority = created_utc + self.score_weight * math.log1p(max(score, 0))
+        with self._lock, self._connection:
+            added = self._connection.execute(
+                "INSERT OR IGNORE INTO replies (submission_id, response, priority, created_utc, enqueued_at, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (submission_id, response, priority, created_utc, now, PENDING)).rowcount
+        if added:
+            self._wakeup.set()
+        else:
+            logger.info(f"A reply to {submission_id} is already queued")
+        return bool(added)
+
+    def get(self, submission_id: str) -> Optional[QueuedReply]:
+        """
+        Look up a queued reply.
+
+        Args:
+            submission_id (str): Reddit submission ID
+
+        Returns:
+            Optional[QueuedReply]: The reply, or None if none was queued
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT submission_id, response, priority, created_utc, status, attempts, not_before, reply_id, error "
+                "FROM replies WHERE submission_id = ?", (submission_id,)).fetchone()
+        return QueuedReply(*row) if row is not None else None
+
+    def pending_count(self) -> int:
+        """
+        Count the replies waiting to be posted.
+
+        Returns:
+            int: Number of pending replies
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM replies WHERE status = ?", (PENDING,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        """
+        Count the replies in each state.
+
+        Returns:
+            dict: Status -> number of replies
+        """
+        with self._lock:
+            return dict(self._connection.execute("SELECT status, COUNT(*) FROM replies GROUP BY status").fetchall())
+
+    def _next_due(self) -> tuple[Optional[QueuedReply], Optional[float]]:
+        """
+        Pick the pending reply to post next, expiring replies that are too old.
+
+        Returns:
+            tuple: The highest priority reply that is due (or None), and the time
+                   the next pending reply becomes due (or None if nothing is pending)
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            if self.max_age is not None:
+                expired = self._connection.execute(
+                    "UPDATE replies SET status = ? WHERE status = ? AND created_utc < ?",
+                    (EXPIRED, PENDING, now - self.max_age)).rowcount
+                if expired:
+                    logger.info(f"Dropped {expired} queued replies to posts older than {self.max_age:.0f} seconds")
+            row = self._connection.execute(
+                "SELECT submission_id, response, priority, created_utc, status, attempts, not_before, reply_id, error "
+                "FROM replies WHERE status = ? AND not_before <= ? ORDER BY priority DESC LIMIT 1",
+                (PENDING, now)).fetchone()
+            next_due = self._connection.execute("SELECT MIN(not_before) FROM replies WHERE status = ?",
+                                                (PENDING,)).fetchone()[0]
+        return (QueuedReply(*row) if row is not None else None), next_due
+
+    def _update(self, submission_id: str, **fields):
+        """
+        Set fields of a queued reply.
+
+        Args:
+            submission_id (str): Reddit submission ID
+            **fields: Column values
+        """
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connection:
+            self._connection.execute(f"UPDATE replies SET {assignments} WHERE submission_id = ?",
+                                     (*fields.values(), submission_id))
+
+    def _post(self, queued: QueuedReply):
+        """
+        Post one reply and record the outcome.
+
+        Args:
+            queued (QueuedReply): The reply to post
+        """
+        self._update(queued.submission_id, status=POSTING)
+        try:
+            reply = self.bot.submit_response(submission_id=queued.submission_id, response=queued.response)
+        except Exception as e:
+            delay = parse_rate_limit_delay(e)
+            if delay is not None:
+                # Rate limits apply to the account, so every reply waits
+                logger.warning(f"Rate limited by Reddit; pausing replies for {delay:.0f} seconds")
+                RETRIES.labels(reason='rate_limit').inc()
+                self.bucket.pause(delay)
+                self._update(queued.submission_id, status=PENDING, not_before=time.time() + delay, error=str(e))
+                return
+
+            attempts = queued.attempts + 1
+            if _permanent_error(e) or attempts >= self.max_attempts:
+                logger.error(f"Giving up on reply to {queued.submission_id} after {attempts} attempts: {str(e)}")
+                self._update(queued.submission_id, status=FAILED, attempts=attempts, error=str(e))
+                return
+
+            # Exponential backoff with jitter, so retries of several replies spread out
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+            RETRIES.labels(reason='error').inc()
+            self._update(queued.submission_id, status=PENDING, attempts=attempts,
+                         not_before=time.time() + backoff, error=str(e))
+            return
+
+        reply_id = getattr(reply, 'id', None)
+        self._update(queued.submission_id, status=POSTED, reply_id=reply_id, error=None)
+        if self.on_posted is not None:
+            try:
+                self.on_posted(queued.submission_id, reply)
+            except Exception as e:
+                logger.error(f"Failed to record reply to {queued.submission_id}: {str(e)}")
+
+    def process_once(self) -> Optional[float]:
+        """
+        Post the next due reply if the rate limit allows.
+
+        Returns:
+            Optional[float]: Seconds to wait before calling again, or None when nothing is pending
+        """
+        queued, next_due = self._next_due()
+        if queued is None:
+            return None if next_due is None else max(0.0, next_due - time.time())
+
+        delay = self.bucket.delay()
+        if delay > 0:
+            return delay
+        self.bucket.take()
+        self._post(queued)
+        return 0.0
+
+    def _run(self):
+        """
+        Post replies until stop() is called. Runs in the worker thread.
+        """
+        while not self._stop.is_set():
+            try:
+                delay = self.process_once()
+            except Exception as e:
+                logger.error(f"Reply queue failed: {str(e)}")
+                delay = self.base_backoff
+            if delay == 0:
+                continue
+            # Wake up early when a reply is queued; it may outrank the one being waited for
+            self._wakeup.wait(timeout=delay if delay is not None else 60.0)
+            self._wakeup.clear()
+
+    def start(self):
+        """
+        Start posting replies in a background thread.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='reply-queue', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the worker after the reply being posted, if any. Pending replies stay queued.
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait for the worker (default: no limit)
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def close(self):
+        """
+        Stop the worker and close the database.
+        """
+        self.stop()
+        with self._lock:
+            self._connection.close()
+
+
+if __name__ == "__main__":
+    """
+    Print the number of replies in each state.
+
+    Usage:
+        python -m fact_fetch.bot.reply_queue [queue_path]
+    """
+    queue_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_QUEUE_PATH
+    connection = sqlite3.connect(queue_path)
+    for status, count in connection.execute("SELECT status, COUNT(*) FROM replies GROUP BY status"):
+        print(f"{status}: {count}")
@@ -0,0 +1,389 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+
+from fact_fetch.utils.embeddings import DEFAULT_MODEL_NAME, encode_texts
+from fact_fetch.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+RESOURCES_DIR = os.path.join(os.path.dirname(__file__), 'resources')
+
+# Bundled research papers and their metadata
+DEFAULT_FILES_DIR = os.path.join(RESOURCES_DIR, 'files')
+DEFAULT_RESOURCES_PATH = os.path.join(RESOURCES_DIR, 'resources.json')
+
+# Default location of the index artifact
+DEFAULT_INDEX_DIR = cache_path('retrieval_index')
+
+# Bump when the on-disk layout changes
+INDEX_FORMAT = 1
+
+# BM25 parameters
+_K1 = 1.5
+_B = 0.75
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# Very common words that carry no meaning for retrieval
+_STOP_WORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have how i if in into is it its
+just may might more most no not of on or our should so such than that the their them then there these they
+this those to was we were what when where which while who why will with would you your
+""".split())
+
+
+class Passage(NamedTuple):
+    """
+    A passage returned by a search.
+
+    Attributes:
+        text (str): Passage text
+        title (str): Title of the paper the passage comes from
+        url (str): URL of the paper
+        filename (str): PDF file name of the paper
+        score (float): Relevance score of the passage
+    """
+    text: str
+    title: str
+    url: str
+    filename: str
+    score: float
+
+
+def _tokenize(text: str) -> list[str]:
+    """
+    Split text into lowercase BM25 terms.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list[str]: Terms, without stop words
+    """
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOP_WORDS]
+
+
+def _sha256(file_path: str) -> str:
+    """
+    Hash the contents of a file.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_passages(pdf_path: str, chunk_words: int = 180, overlap_words: int = 40) -> list[str]:
+    """
+    Extract the text of a PDF and split it into overlapping passages.
+
+    Args:
+        pdf_path (str): Path to the PDF file
+        chunk_words (int): Number of words per passage (default: 180)
+        overlap_words (int): Number of words shared by consecutive passages (default: 40)
+
+    Returns:
+        list[str]: Passages in document order
+    """
+    # Deferred so that the bot does not need pypdf unless the index is (re)built
+    from pypdf import PdfReader
+
+    words = []
+    for page in PdfReader(pdf_path).pages:
+        words.extend((page.extract_text() or "").split())
+
+    step = max(1, chunk_words - overlap_words)
+    return [" ".join(words[start:start + chunk_words])
+            for start in range(0, max(len(words) - overlap_words, 1), step)
+            if words[start:start + chunk_words]]
+
+
+class RetrievalIndex:
+    """
+    Local hybrid search index over the bundled research papers.
+
+    Papers are split into overlapping passages that are indexed two ways:
+    a BM25 inverted index for keyword matches and sentence embeddings for
+    semantic matches. Both are stored as numpy files and memory-mapped when
+    the index is opened, so retrieval runs in-process in milliseconds
+    without a round-trip to a remote vector store.
+
+    Use RetrievalIndex.build() to create or refresh the artifact; only
+    PDFs that were added or changed since the last build are re-extracted
+    and re-embedded.
+    """
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR,
+                 embed: Optional[Callable[[list[str]], np.ndarray]] = None):
+        """
+        Open an index artifact written by build().
+
+        Args:
+            directory (str): Directory of the artifact (default: DEFAULT_INDEX_DIR)
+            embed (Optional[Callable]): Function returning unit-length embeddings for a list of
+                                        texts (default: the shared MiniLM model)
+
+        Raises:
+            FileNotFoundError: If the directory does not contain an index
+        """
+        manifest_path = os.path.join(directory, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No retrieval index in {directory}")
+
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            self.manifest = json.load(file)
+        with open(os.path.join(directory, 'vocabulary.json'), 'r', encoding='utf-8') as file:
+            self._vocabulary = json.load(file)
+
+        self.directory = directory
+        self.embed = embed or (lambda texts: encode_texts(texts, self.manifest['model']))
+        self._documents = self.manifest['documents']
+
+        def load(name):
+            return np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+
+        self._text_offsets = load('text_offsets')
+        self._passage_document = load('passage_document')
+        self._passage_length = load('passage_length')
+        self._vectors = load('vectors')
+        self._postings_offsets = load('postings_offsets')
+        self._postings_passages = load('postings_passages')
+        self._postings_counts = load('postings_counts')
+        with open(os.path.join(directory, 'passages.bin'), 'rb') as file:
+            self._text = file.read()
+
+        self._average_length = float(self._passage_length.mean()) if len(self._passage_length) else 0.0
+
+    def __len__(self) -> int:
+        return len(self._passage_document)
+
+    def passage_text(self, index: int) -> str:
+        """
+        Get the text of a passage.
+
+        Args:
+            index (int): Position of the passage in the index
+
+        Returns:
+            str: The passage text
+        """
+        return self._text[self._text_offsets[index]:self._text_offsets[index + 1]].decode('utf-8')
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """
+        Score every passage against a query with BM25.
+
+        Args:
+            query (str): Query text
+
+        Returns:
+            np.ndarray: BM25 score of each passage
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        length_norm = _K1 * (1 - _B + _B * self._passage_length / max(self._average_length, 1e-9))
+        for term in set(_tokenize(query)):
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+
+            start, end = self._postings_offsets[term_id], self._postings_offsets[term_id + 1]
+            passages = self._postings_passages[start:end]
+            counts = self._postings_counts[start:end].astype(np.float32)
+            idf = np.log(1 + (len(self) - len(passages) + 0.5) / (len(passages) + 0.5))
+            scores[passages] += idf * counts * (_K1 + 1) / (counts + length_norm[passages])
+        return scores
+
+    def search(self, query: str, k: int = 3, semantic_weight: float = 0.5) -> list[Passage]:
+        """
+        Find the passages most relevant to a query.
+
+        BM25 scores are scaled to [0, 1] and blended with the cosine
+        similarity between the query and passage embeddings.
+
+        Args:
+            query (str): Query text, e.g. a normalized Reddit post
+            k (int): Number of passages to return (default: 3)
+            semantic_weight (float): Weight of the embedding similarity; 0 gives pure BM25 (default: 0.5)
+
+        Returns:
+            list[Passage]: Up to k passages, most relevant first
+        """
+        if len(self) == 0:
+            return []
+
+        scores = self.bm25_scores(query)
+        if scores.max() > 0:
+            scores /= scores.max()
+        scores *= 1 - semantic_weight
+        if semantic_weight > 0:
+            scores += semantic_weight * (self._vectors @ self.embed([query])[0])
+
+        k = min(k, len(self))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        passages = []
+        for index in top.tolist():
+            document = self._documents[self._passage_document[index]]
+            passages.append(Passage(self.passage_text(index), document['title'], document['url'],
+                                    document['filename'], float(scores[index])))
+        return passages
+
+    @classmethod
+    def build(cls, files_dir: str = DEFAULT_FILES_DIR, resources_path: str = DEFAULT_RESOURCES_PATH,
+              directory: str = DEFAULT_INDEX_DIR, chunk_words: int = 180, overlap_words: int = 40,
+              model_name: str = DEFAULT_MODEL_NAME,
+              embed: Optional[Callable[[list[str]], np.ndarray]] = None) -> 'RetrievalIndex':
+        """
+        Build or incrementally refresh the index artifact.
+
+        Papers are listed in resources.json. A paper whose PDF has the same
+        content hash as in the previous build reuses its passages and
+        embeddings; only new or changed PDFs are extracted and embedded.
+        The BM25 index is always rebuilt since it is cheap.
+
+        Args:
+            files_dir (str): Directory containing the PDFs (default: the bundled papers)
+            resources_path (str): JSON list of papers with title, url and filename
+            directory (str): Directory of the artifact (default: DEFAULT_INDEX_DIR)
+            chunk_words (int): Number of words per passage (default: 180)
+            overlap_words (int): Number of words shared by consecutive passages (default: 40)
+            model_name (str): Sentence embedding model (default: 'all-MiniLM-L6-v2')
+            embed (Optional[Callable]): Function returning unit-length embeddings for a list of texts
+
+        Returns:
+            RetrievalIndex: The opened index
+        """
+        embed = embed or (lambda texts: encode_texts(texts, model_name))
+        settings = {'format': INDEX_FORMAT, 'chunk_words': chunk_words, 'overlap_words': overlap_words,
+                    'model': model_name}
+
+        # Passages and embeddings of the previous build, if it used the same settings
+        previous = None
+        try:
+            previous = cls(directory, embed)
+            if any(previous.manifest.get(key) != value for key, value in settings.items()):
+                previous = None
+        except (FileNotFoundError, ValueError, KeyError):
+            previous = None
+
+        with open(resources_path, 'r', encoding='utf-8') as file:
+            papers = json.load(file)
+
+        documents, passages, passage_document, vectors, files = [], [], [], [], {}
+        reused = 0
+        for paper in papers:
+            pdf_path = os.path.join(files_dir, paper['filename'])
+            if not os.path.exists(pdf_path):
+                logger.warning(f"Skipping {paper['filename']}: file not found")
+                continue
+
+            digest = _sha256(pdf_path)
+            old = previous.manifest['files'].get(paper['filename']) if previous is not None else None
+            if old is not None and old['sha256'] == digest:
+                # Unchanged paper: copy its passages and embeddings from the previous build
+                rows = range(old['first'], old['first'] + old['count'])
+                paper_passages = [previous.passage_text(row) for row in rows]
+                paper_vectors = np.asarray(previous._vectors[old['first']:old['first'] + old['count']])
+                reused += 1
+            else:
+                paper_passages = extract_passages(pdf_path, chunk_words, overlap_words)
+                paper_vectors = embed(paper_passages) if paper_passages else None
+
+            files[paper['filename']] = {'sha256': digest, 'first': len(passages), 'count': len(paper_passages)}
+            passage_document.extend([len(documents)] * len(paper_passages))
+            passages.extend(paper_passages)
+            if paper_vectors is not None and len(paper_passages):
+                vectors.append(np.asarray(paper_vectors, dtype=np.float32))
+            documents.append({'title': paper['title'], 'url': paper['url'], 'filename': paper['filename']})
+
+        cls._write(directory, settings, documents, files, passages, passage_document, vectors)
+        logger.info(f"Indexed {len(passages)} passages from {len(documents)} papers ({reused} unchanged)")
+        return cls(directory, embed)
+
+    @staticmethod
+    def _write(directory: str, settings: dict, documents: list[dict], files: dict, passages: list[str],
+               passage_document: list[int], vectors: list[np.ndarray]):
+        """
+        Write a complete artifact to a temporary directory and move it into place.
+
+        Args:
+            directory (str): Directory of the artifact
+            settings (dict): Build settings recorded in the manifest
+            documents (list[dict]): Title, url and filename of each indexed paper
+            files (dict): Per-file content hash and passage range
+            passages (list[str]): Passage texts
+            passage_document (list[int]): Document index of each passage
+            vectors (list[np.ndarray]): Passage embeddings, one array per paper
+        """
+        tmp_directory = directory + '.tmp'
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+
+        def save(name, array):
+            np.save(os.path.join(tmp_directory, name + '.npy'), array)
+
+        encoded = [passage.encode('utf-8') for passage in passages]
+        with open(os.path.join(tmp_directory, 'passages.bin'), 'wb') as file:
+            file.write(b''.join(encoded))
+        save('text_offsets', np.concatenate([[0], np.cumsum([len(text) for text in encoded])]).astype(np.int64))
+        save('passage_document', np.asarray(passage_document, dtype=np.int32))
+        save('vectors', np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32))
+
+        # Inverted index: for each term, the passages containing it and how often
+        postings = {}
+        lengths = []
+        for passage_id, passage in enumerate(passages):
+            tokens = _tokenize(passage)
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((passage_id, count))
+
+        vocabulary = {term: term_id for term_id, term in enumerate(sorted(postings))}
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in vocabulary])
+        entries = [entry for term in vocabulary for entry in postings[term]]
+        save('postings_offsets', offsets)
+        save('postings_passages', np.asarray([passage_id for passage_id, _ in entries], dtype=np.int32))
+        save('postings_counts', np.asarray([count for _, count in entries], dtype=np.int32))
+        save('passage_length', np.asarray(lengths, dtype=np.int32))
+
+        with open(os.path.join(tmp_directory, 'vocabulary.json'), 'w', encoding='utf-8') as file:
+            json.dump(vocabulary, file)
+        with open(os.path.join(tmp_directory, 'manifest.json'), 'w', encoding='utf-8') as file:
+            json.dump({**settings, 'documents': documents, 'files': files}, file, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_directory, directory)
+
+
+if __name__ == "__main__":
+    """
+    Build (or refresh) the index and run a test query.
+
+    Usage:
+        python -m fact_fetch.bot.retrieval_index ["query text"]
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    index = RetrievalIndex.build()
+    for passage in index.search(sys.argv[1] if len(sys.argv) > 1 else "vegans cant get necessary nutrients"):
+        print(f"[{passage.score:.3f}] {passage.title}: {passage.text[:200]}...")
@@ -0,0 +1,357 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+
+from fact_fetch.bot.openai_query import async_query, query
+from fact_fetch.bot.retrieval_index import RetrievalIndex
+from fact_fetch.utils.embeddings import DEFAULT_MODEL_NAME, encode_texts
+from fact_fetch.utils.paths import cache_path
+
+logger = logging.getLogger(__name__)
+
+# Default location of the persisted cache
+DEFAULT_CACHE_DIR = cache_path('verdicts')
+
+# Fields of a query() result that are stored and returned
+VERDICT_FIELDS = ('result', 'rationale', 'counterargument')
+
+
+class VerdictCache:
+    """
+    Cache of fact-checking verdicts keyed by normalized post text.
+
+    Lookups first try an exact match on the hash of the text, then a
+    nearest-neighbour search over sentence embeddings of previously checked
+    texts, so reposts and recycled talking points reuse an earlier verdict
+    instead of paying for another OpenAI call. Entries expire after a
+    time-to-live and the least recently used entries are evicted once the
+    cache is full. The cache is persisted to local disk as a single file
+    holding the entries and their embeddings, so they cannot get out of
+    step.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, similarity_threshold: float = 0.93,
+                 ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 10_000, save_every: int = 20,
+                 embed: Optional[Callable[[list[str]], np.ndarray]] = None):
+        """
+        Open (or create) the cache.
+
+        Args:
+            directory (str): Directory the cache is persisted to (default: DEFAULT_CACHE_DIR)
+            similarity_threshold (float): Minimum cosine similarity for a semantic hit;
+                                          None disables semantic lookups (default: 0.93)
+            ttl_seconds (float): Age after which an entry is ignored and dropped (default: 7 days)
+            max_entries (int): Maximum number of cached verdicts (default: 10,000)
+            save_every (int): Persist to disk after this many new entries (default: 20)
+            embed (Optional[Callable]): Function returning unit-length embeddings for a list of
+                                        texts (default: the shared MiniLM model)
+        """
+        self.directory = directory
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self.embed = embed or (lambda texts: encode_texts(texts, DEFAULT_MODEL_NAME))
+
+        # key -> (created timestamp, verdict), in least to most recently used order
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        # Embedding matrix and the key of each row
+        self._vectors: Optional[np.ndarray] = None
+        self._keys: list[str] = []
+        self._rows: dict[str, int] = {}
+        # Embeddings computed by get(), reused by the following put()
+        self._recent_vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        # Saves run outside the main lock, so that lookups do not wait for the disk, but one at a time
+        self._save_lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._load()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        """
+        Hash a text into a cache key.
+
+        Args:
+            text (str): Normalized text
+
+        Returns:
+            str: Hex digest of the text
+        """
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        """
+        Check whether an entry is past its time-to-live.
+
+        Args:
+            created (float): Creation timestamp of the entry
+
+        Returns:
+            bool: True if the entry must not be used anymore
+        """
+        return time.time() - created > self.ttl_seconds
+
+    def get(self, text: str) -> Optional[dict]:
+        """
+        Look up the verdict of a text.
+
+        Args:
+            text (str): Normalized post text
+
+        Returns:
+            Optional[dict]: The cached result, rationale and counterargument, or None on a miss
+        """
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.exact_hits += 1
+                    return dict(entry[1])
+                self._remove(key)
+
+            if self.similarity_threshold is None or not self._keys:
+                self.misses += 1
+                return None
+
+        # Embedding is the slow part, so it runs without holding the lock
+        vector = self.embed([text])[0]
+
+        with self._lock:
+            self._recent_vectors[key] = vector
+            while len(self._recent_vectors) > 64:
+                self._recent_vectors.popitem(last=False)
+
+            hit = None
+            if self._keys:
+                similarities = self._vectors[:len(self._keys)] @ vector
+                candidates = np.flatnonzero(similarities >= self.similarity_threshold)
+                # Take the most similar entry that has not expired, dropping the expired ones on the way
+                expired = []
+                for row in candidates[np.argsort(-similarities[candidates], kind='stable')].tolist():
+                    candidate_key = self._keys[row]
+                    if not self._expired(self._entries[candidate_key][0]):
+                        hit = candidate_key
+                        break
+                    expired.append(candidate_key)
+                for expired_key in expired:
+                    self._remove(expired_key)
+
+            if hit is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(hit)
+            self.semantic_hits += 1
+            return dict(self._entries[hit][1])
+
+    def put(self, text: str, verdict: dict):
+        """
+        Store the verdict of a text.
+
+        Args:
+            text (str): Normalized post text
+            verdict (dict): Result returned by query()
+        """
+        key = self._key(text)
+        with self._lock:
+            vector = self._recent_vectors.pop(key, None)
+        if vector is None and self.similarity_threshold is not None:
+            vector = self.embed([text])[0]
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time(), {field: verdict.get(field, "") for field in VERDICT_FIELDS})
+            if vector is not None:
+                self._add_vector(key, vector)
+
+            # Evict the least recently used entries
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+            self._unsaved += 1
+            save = self._unsaved >= self.save_every
+
+        if save:
+            # The verdict is cached in memory either way; a failed save must not lose it for the caller
+            try:
+                self.save()
+            except Exception as e:
+                logger.error(f"Failed to save the verdict cache: {str(e)}")
+
+    def _add_vector(self, key: str, vector: np.ndarray):
+        """
+        Append the embedding of an entry to the matrix, growing it as needed.
+
+        Args:
+            key (str): Cache key of the entry
+            vector (np.ndarray): Unit-length embedding of its text
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        if self._vectors is None:
+            self._vectors = np.zeros((16, len(vector)), dtype=np.float32)
+        elif len(self._keys) == len(self._vectors):
+            self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+
+        self._rows[key] = len(self._keys)
+        self._vectors[len(self._keys)] = vector
+        self._keys.append(key)
+
+    def _remove(self, key: str):
+        """
+        Remove an entry and its embedding.
+
+        The last row of the matrix is moved into the freed row, so removal is O(1).
+
+        Args:
+            key (str): Cache key of the entry
+        """
+        self._entries.pop(key, None)
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+
+        last_key = self._keys.pop()
+        if last_key != key:
+            self._vectors[row] = self._vectors[len(self._keys)]
+            self._keys[row] = last_key
+            self._rows[last_key] = row
+
+    def _load(self):
+        """
+        Load a previously saved cache, dropping expired entries.
+
+        A missing or unreadable cache file starts an empty cache.
+        """
+        path = os.path.join(self.directory, 'verdicts.npz')
+        if not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as saved:
+                entries = json.loads(str(saved['entries']))
+                vectors = saved['vectors']
+            if len(vectors) != len(entries):
+                vectors = None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable verdict cache {path}: {str(e)}")
+            return
+
+        for row, (key, created, verdict) in enumerate(entries):
+            if self._expired(created):
+                continue
+            self._entries[key] = (created, verdict)
+            if vectors is not None:
+                self._add_vector(key, vectors[row])
+
+    def save(self):
+        """
+        Persist the cache to disk.
+
+        The entries and their embeddings are written together to a uniquely
+        named temporary file, which is then moved into place, so an
+        interrupted save never leaves a corrupted or mismatched cache behind.
+
+        Raises:
+            OSError: If the cache file cannot be written
+        """
+        with self._save_lock:
+            with self._lock:
+                keys = list(self._entries)
+                entries = [[key, created, verdict] for key, (created, verdict) in self._entries.items()]
+                if keys and all(key in self._rows for key in keys):
+                    vectors = self._vectors[[self._rows[key] for key in keys]]
+                else:
+                    # Without an embedding for every entry, semantic lookups start empty after a reload
+                    vectors = np.zeros((0, 0), dtype=np.float32)
+                self._unsaved = 0
+
+            os.makedirs(self.directory, exist_ok=True)
+            descriptor, tmp_path = tempfile.mkstemp(prefix='verdicts.', suffix='.tmp', dir=self.directory)
+            try:
+                with os.fdopen(descriptor, 'wb') as file:
+                    np.savez(file, entries=np.array(json.dumps(entries)), vectors=vectors)
+                os.replace(tmp_path, os.path.join(self.directory, 'verdicts.npz'))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def stats(self) -> dict:
+        """
+        Report how often the cache was hit.
+
+        Returns:
+            dict: Hit and miss counters, the overall hit rate and the number of entries
+        """
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+
+def cached_query(client: OpenAI, text: str, cache: VerdictCache,
+                 retrieval_index: Optional[RetrievalIndex] = None) -> dict:
+    """
+    Analyze text for misinformation, reusing a cached verdict when possible.
+
+    Args:
+        client (OpenAI): Authenticated OpenAI client instance
+        text (str): Normalized text to analyze
+        cache (VerdictCache): Cache consulted before calling OpenAI
+        retrieval_index (Optional[RetrievalIndex]): Local evidence index passed to query()
+
+    Returns:
+        dict: The same JSON object as query()
+    """
+    result = cache.get(text)
+    if result is None:
+        result = query(client, text, retrieval_index)
+        # Never reuse a malformed response for other posts
+        if isinstance(result, dict) and result.get("result"):
+            cache.put(text, result)
+    return result
+
+
+async def async_cached_query(client: AsyncOpenAI, text: str, cache: VerdictCache,
+                             retrieval_index: Optional[RetrievalIndex] = None) -> dict:
+    """
+    Asynchronous counterpart of cached_query().
+
+    Cache lookups compute embeddings, so they run in a worker thread to keep
+    the event loop responsive.
+
+    Args:
+        client (AsyncOpenAI): Authenticated asynchronous OpenAI client instance
+        text (str): Normalized text to analyze
+        cache (VerdictCache): Cache consulted before calling OpenAI
+        retrieval_index (Optional[RetrievalIndex]): Local evidence index passed to async_query()
+
+    Returns:
+        dict: The same JSON object as async_query()
+    """
+    result = await asyncio.to_thread(cache.get, text)
+    if result is None:
+        result = await async_query(client, text, retrieval_index)
+        if isinstance(result, dict) and result.get("result"):
+            await asyncio.to_thread(cache.put, text, result)
+    return result
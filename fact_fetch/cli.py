@@ -0,0 +1,97 @@
+import argparse
+import importlib
+import sys
+from typing import NamedTuple, Optional, Union
+
+from fact_fetch.utils.environment import load_environment
+
+# Program name shown in usage messages
+PROG = 'fact_fetch'
+
+
+class Command(NamedTuple):
+    """
+    A subcommand implemented by the main() function of a module.
+
+    Attributes:
+        module (str): Module whose main(argv) runs the command
+        help (str): One-line description shown in the command list
+    """
+    module: str
+    help: str
+
+
+# Subcommands, grouped where there are several of a kind. The modules are
+# only imported when their command runs, so that listing the commands (or
+# running a light one) does not pay for scikit-learn, OpenAI or PRAW.
+COMMANDS: dict[str, Union[Command, dict[str, Command]]] = {
+    'bot': {
+        'run': Command('fact_fetch.bot.main', "Monitor subreddits and reply to posts"),
+        'replay': Command('fact_fetch.bot.replay', "Replay dumps through the pipeline without API calls"),
+        'classify': Command('fact_fetch.bot.batch_classify', "Classify archived posts with the OpenAI Batch API"),
+    },
+    'analyze': Command('fact_fetch.analysis.main', "Extract and cluster keywords from a dump"),
+    'ingest': Command('fact_fetch.analysis.submission_store', "Ingest dumps into the columnar cache"),
+    'sample': Command('fact_fetch.analysis.sampling', "Draw a uniform or stratified sample of the dumps"),
+    'dedup': Command('fact_fetch.analysis.dedup', "Find near-duplicate submissions in the dumps"),
+    'terms': Command('fact_fetch.analysis.distinctive_terms', "Rank the distinctive terms of each subreddit"),
+    'benchmark': Command('fact_fetch.benchmarks.run', "Run the benchmark suite"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser of the command names.
+
+    The options of each command are parsed by the command's own module;
+    the command parsers are created without help so that '--help' after a
+    command reaches that module.
+
+    Returns:
+        argparse.ArgumentParser: Parser setting 'command' to the selected Command
+    """
+    parser = argparse.ArgumentParser(prog=PROG, description="Fact Fetch command line interface.")
+    subparsers = parser.add_subparsers(title="commands", metavar="<command>", required=True)
+    for name, command in COMMANDS.items():
+        if isinstance(command, Command):
+            subparsers.add_parser(name, help=command.help, add_help=False).set_defaults(command=command)
+            continue
+
+        group = subparsers.add_parser(name, help=f"{name} commands: {', '.join(command)}")
+        group_subparsers = group.add_subparsers(title="commands", metavar="<command>", required=True)
+        for sub_name, sub_command in command.items():
+            group_subparsers.add_parser(sub_name, help=sub_command.help,
+                                        add_help=False).set_defaults(command=sub_command)
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run a subcommand.
+
+    Loads the .env file once, imports the module of the selected command
+    and passes it the remaining arguments.
+
+    Usage:
+        python -m fact_fetch <command> [options]
+        python -m fact_fetch bot run --subreddits vegan
+        python -m fact_fetch analyze --help
+
+    Args:
+        argv (Optional[list[str]]): Arguments (default: sys.argv[1:])
+
+    Returns:
+        int: Exit status of the command
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    args, remaining = build_parser().parse_known_args(argv)
+
+    load_environment()
+    command: Command = args.command
+    module = importlib.import_module(command.module)
+
+    # Let the command's usage messages show how it was invoked
+    invoked = argv[:len(argv) - len(remaining)]
+    sys.argv = [" ".join([PROG, *invoked])] + remaining
+    status = module.main(remaining)
+    return status if isinstance(status, int) else 0
@@ -0,0 +1,53 @@
+import threading
+
+import numpy as np
+
+# Sentence embedding model used across the project
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Loaded models, shared by the whole process
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_sentence_model(model_name: str = DEFAULT_MODEL_NAME):
+    """
+    Get a process-wide SentenceTransformer instance, loading it on first use.
+
+    Loading a model takes seconds and hundreds of MB, so each model is
+    loaded at most once per process and shared by every caller.
+
+    Args:
+        model_name (str): Name of the sentence-transformers model (default: 'all-MiniLM-L6-v2')
+
+    Returns:
+        SentenceTransformer: The loaded model
+    """
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            # Deferred so that importing this module does not pull in torch
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name)
+            _models[model_name] = model
+    return model
+
+
+def encode_texts(texts: list[str], model_name: str = DEFAULT_MODEL_NAME, normalize: bool = True) -> np.ndarray:
+    """
+    Encode texts with the shared sentence embedding model.
+
+    Args:
+        texts (list[str]): Texts to encode
+        model_name (str): Name of the sentence-transformers model (default: 'all-MiniLM-L6-v2')
+        normalize (bool): Scale every vector to unit length (default: True)
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dimension)
+    """
+    model = get_sentence_model(model_name)
+    return np.asarray(
+        model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=normalize),
+        dtype=np.float32,
+    )
@@ -0,0 +1,21 @@
+import threading
+
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_environment():
+    """
+    Load variables from the .env file into os.environ, once per process.
+
+    The Reddit and OpenAI client factories and the command line entry point
+    all need the credentials; after the first call the file is not read
+    again. Variables already set in the environment are not overridden.
+    """
+    global _loaded
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
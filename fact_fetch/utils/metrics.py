@@ -0,0 +1,475 @@
+import bisect
+import contextlib
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional
+
+try:
+    # Optional: spans are only recorded when OpenTelemetry is installed and tracing is enabled
+    from opentelemetry import trace as _otel_trace
+except ImportError:
+    _otel_trace = None
+
+logger = logging.getLogger(__name__)
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a sample value for the Prometheus text format.
+
+    Args:
+        value (float): Sample value
+
+    Returns:
+        str: The value, with infinities spelled as Prometheus expects
+    """
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """
+    Format label pairs for the Prometheus text format.
+
+    Args:
+        names (tuple[str, ...]): Label names
+        values (tuple[str, ...]): Label values
+
+    Returns:
+        str: '{name="value",...}', or an empty string without labels
+    """
+    if not names:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together on the metrics endpoint.
+    """
+
+    def __init__(self):
+        """
+        Create an empty registry.
+        """
+        self._metrics: dict[str, '_Metric'] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: '_Metric'):
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric (_Metric): The metric
+
+        Raises:
+            ValueError: If a metric with the same name is already registered
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Registry used by the metrics of the bot
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    """
+    Base class of metrics: a family of children, one per combination of label values.
+    """
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 registry: Optional[MetricsRegistry] = REGISTRY):
+        """
+        Create the metric and register it.
+
+        Args:
+            name (str): Metric name, e.g. 'fact_fetch_replies_total'
+            documentation (str): Help text
+            labelnames (tuple[str, ...]): Names of the labels (default: none)
+            registry (Optional[MetricsRegistry]): Registry to add the metric to, or None (default: REGISTRY)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+        # Metrics without labels have a single child, created up front so updates skip the lookup
+        self._default = self.labels() if not self.labelnames else None
+
+        if registry is not None:
+            registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **labels):
+        """
+        Get the child for a combination of label values, creating it on first use.
+
+        Args:
+            *values: Label values, in the order of labelnames
+            **labels: Label values by name
+
+        Returns:
+            The child metric, with the same update methods as an unlabeled metric
+
+        Raises:
+            ValueError: If the label values do not match the label names
+        """
+        if labels:
+            values = tuple(str(labels[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _unlabeled(self):
+        """
+        Get the single child of a metric without labels.
+
+        Raises:
+            ValueError: If the metric has labels
+        """
+        if self._default is None:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use labels()")
+        return self._default
+
+    def samples(self) -> Iterator[str]:
+        """
+        Render the samples of every child.
+
+        Yields:
+            str: Lines of the Prometheus text format
+        """
+        for values, child in list(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, values)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        """
+        Increase the counter.
+
+        Args:
+            amount (float): Non-negative increment (default: 1)
+        """
+        with self._lock:
+            self._value += amount
+
+    def get(self) -> float:
+        return self._value
+
+    def samples(self, name, labelnames, values):
+        yield f"{name}{_format_labels(labelnames, values)} {_format_value(self._value)}"
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, e.g. of requests or errors.
+    """
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """
+        Increase a counter without labels.
+
+        Args:
+            amount (float): Non-negative increment (default: 1)
+        """
+        self._unlabeled().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Optional[Callable[[], float]]):
+        """
+        Compute the value with a function whenever the metrics are rendered.
+
+        Args:
+            function (Optional[Callable]): Function returning the current value, or None to stop
+        """
+        self._function = function
+
+    @contextlib.contextmanager
+    def track_inprogress(self):
+        """
+        Count the code running inside the context, e.g. requests in flight.
+        """
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def get(self) -> float:
+        function = self._function
+        return float(function()) if function is not None else self._value
+
+    def samples(self, name, labelnames, values):
+        yield f"{name}{_format_labels(labelnames, values)} {_format_value(self.get())}"
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down, e.g. requests in flight or queue depth.
+    """
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._unlabeled().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._unlabeled().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._unlabeled().dec(amount)
+
+    def set_function(self, function: Optional[Callable[[], float]]):
+        self._unlabeled().set_function(function)
+
+    def track_inprogress(self):
+        return self._unlabeled().track_inprogress()
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets = buckets
+        # Non-cumulative count per bucket; the last one is +Inf
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Record an observation.
+
+        Args:
+            value (float): Observed value, e.g. a latency in seconds
+        """
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextlib.contextmanager
+    def time(self):
+        """
+        Observe the number of seconds spent inside the context.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self, name, labelnames, values):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        cumulative = 0
+        for bound, count in zip(self._buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(labelnames + ('le',), values + (_format_value(bound),))
+            yield f"{name}_bucket{labels} {cumulative}"
+        labels = _format_labels(labelnames, values)
+        yield f"{name}_sum{labels} {_format_value(total)}"
+        yield f"{name}_count{labels} {cumulative}"
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values, e.g. latencies, counted in buckets.
+    """
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS, registry: Optional[MetricsRegistry] = REGISTRY):
+        """
+        Create the histogram and register it.
+
+        Args:
+            name (str): Metric name, e.g. 'fact_fetch_openai_request_seconds'
+            documentation (str): Help text
+            labelnames (tuple[str, ...]): Names of the labels (default: none)
+            buckets (tuple[float, ...]): Upper bounds of the buckets, in increasing order (default: DEFAULT_BUCKETS)
+            registry (Optional[MetricsRegistry]): Registry to add the metric to, or None (default: REGISTRY)
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabeled().observe(value)
+
+    def time(self):
+        return self._unlabeled().time()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves the registry on /metrics.
+    """
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the bot's log
+        pass
+
+
+def start_metrics_server(port: int = 9108, host: str = '127.0.0.1',
+                         registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serve the metrics in the Prometheus text format from a daemon thread.
+
+    Metrics are only rendered when scraped, so serving them costs nothing
+    on the bot's hot path.
+
+    Args:
+        port (int): Port to listen on; 0 picks a free port (default: 9108)
+        host (str): Address to bind to (default: '127.0.0.1', local only)
+        registry (MetricsRegistry): Registry to serve (default: REGISTRY)
+
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# Tracer used by span(); None while tracing is disabled
+_tracer = None
+
+
+def enable_tracing(service_name: str = 'fact_fetch') -> bool:
+    """
+    Record OpenTelemetry spans around instrumented operations.
+
+    Spans are exported by whatever tracer provider the application
+    configures with the OpenTelemetry SDK.
+
+    Args:
+        service_name (str): Name of the tracer (default: 'fact_fetch')
+
+    Returns:
+        bool: True if tracing is enabled, False if OpenTelemetry is not installed
+    """
+    global _tracer
+    if _otel_trace is None:
+        logger.warning("Tracing requested but opentelemetry-api is not installed")
+        return False
+    _tracer = _otel_trace.get_tracer(service_name)
+    return True
+
+
+def span(name: str, **attributes):
+    """
+    Open a tracing span, or do nothing while tracing is disabled.
+
+    Args:
+        name (str): Name of the span
+        **attributes: Span attributes; None values are left out
+
+    Returns:
+        A context manager
+    """
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.start_as_current_span(name, attributes={key: value for key, value in attributes.items()
+                                                           if value is not None})
+
+
+if __name__ == "__main__":
+    """
+    Serve a few example metrics to check the endpoint.
+
+    Usage:
+        python -m fact_fetch.utils.metrics, then open http://127.0.0.1:9108/metrics
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    example = Histogram('fact_fetch_example_seconds', "Example latency", ('kind',))
+    start_metrics_server()
+    while True:
+        with example.labels(kind='sleep').time():
+            time.sleep(1)
@@ -0,0 +1,77 @@
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, Iterator
+
+
+def bounded_map(executor: Executor, fn: Callable[[Any], Any], iterable: Iterable[Any],
+                max_in_flight: int, ordered: bool = True) -> Iterator[Any]:
+    """
+    Lazily map a function over an iterable using an executor.
+
+    Unlike Executor.map, the input is consumed incrementally and at most
+    'max_in_flight' tasks are submitted at any time, so memory stays bounded
+    no matter how large the input is.
+
+    Args:
+        executor (Executor): Thread or process pool used to run the tasks
+        fn (Callable): Function applied to each item (must be picklable for process pools)
+        iterable (Iterable): Items to process
+        max_in_flight (int): Maximum number of submitted but unconsumed tasks
+        ordered (bool): Yield results in input order (default: True). When False,
+                        results are yielded as soon as they complete.
+
+    Returns:
+        generator: Yields fn(item) for every item
+
+    Note:
+        If the consumer stops early, tasks that have not started yet are cancelled.
+    """
+    max_in_flight = max(1, max_in_flight)
+    pending = deque() if ordered else set()
+
+    try:
+        for item in iterable:
+            future = executor.submit(fn, item)
+            if ordered:
+                pending.append(future)
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            else:
+                pending.add(future)
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        yield finished.result()
+
+        # Drain the remaining tasks
+        while pending:
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for finished in done:
+                    yield finished.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def chunked(iterable: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """
+    Split an iterable into lists of a fixed size.
+
+    Args:
+        iterable (Iterable): Items to split
+        size (int): Number of items per chunk; the last chunk may be shorter
+
+    Returns:
+        generator: Yields lists of up to 'size' items
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,19 @@
+import os
+
+
+def cache_path(*parts: str) -> str:
+    """
+    Build a path inside the local Fact Fetch cache directory.
+
+    The cache lives in ~/.cache/fact_fetch unless the FACT_FETCH_CACHE_DIR
+    environment variable points somewhere else. Parent directories are not
+    created; callers create what they need.
+
+    Args:
+        *parts (str): Path components appended to the cache directory
+
+    Returns:
+        str: Absolute path inside the cache directory
+    """
+    root = os.environ.get('FACT_FETCH_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'fact_fetch')
+    return os.path.join(root, *parts)
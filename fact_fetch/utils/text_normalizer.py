@@ -1,9 +1,48 @@
+import os
 import re
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
 from unicodedata import normalize as unicode_normalize
 from bs4 import BeautifulSoup
 import emoji
 
+from fact_fetch.utils.parallel import bounded_map, chunked
+
+# Runs of whitespace, collapsed to a single space
+_WHITESPACE = re.compile(r'\s+')
+
+# The entities Reddit itself escapes. Text whose only markup is these
+# entities is decoded directly instead of being parsed by BeautifulSoup.
+_SIMPLE_ENTITIES = re.compile(r'&(amp|lt|gt|quot);')
+_SIMPLE_ENTITY_VALUES = {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"'}
+
+# Normalizer used by worker processes of normalize_iter
+_worker_normalizer: Optional['RedditTextNormalizer'] = None
+
+
+def _init_worker(normalizer: 'RedditTextNormalizer'):
+    """
+    Store the normalizer sent to a worker process.
+
+    Args:
+        normalizer (RedditTextNormalizer): Normalizer to use in this process
+    """
+    global _worker_normalizer
+    _worker_normalizer = normalizer
+
+
+def _normalize_chunk(texts: list[Optional[str]]) -> list[str]:
+    """
+    Normalize a chunk of texts inside a worker process.
+
+    Args:
+        texts (list[Optional[str]]): Texts to normalize
+
+    Returns:
+        list[str]: Normalized texts in the same order
+    """
+    return [_worker_normalizer.normalize_text(text) for text in texts]
+
 
 class RedditTextNormalizer:
     """
@@ -22,6 +61,10 @@ class RedditTextNormalizer:
     - Unicode normalization
     - Whitespace normalization
     """
+
+    # Version of the normalization output. Bump whenever a change alters the
+    # normalized text, so caches of previously normalized text are rebuilt.
+    VERSION = 1
     
     def __init__(self):
         """
@@ -40,6 +83,9 @@ class RedditTextNormalizer:
             'html_entities': r'&[a-z]+;',                  # HTML entities like &amp;
         }
 
+        # Compile every pattern once instead of on each call
+        self._compiled_patterns = {name: re.compile(pattern) for name, pattern in self.reddit_patterns.items()}
+
     def remove_urls(self, text: str) -> str:
         """
         Remove URLs from text content.
@@ -50,7 +96,7 @@ class RedditTextNormalizer:
         Returns:
             str: Text with URLs replaced by spaces
         """
-        return re.sub(self.reddit_patterns['url'], ' ', text)
+        return self._compiled_patterns['url'].sub(' ', text)
 
     def remove_reddit_formatting(self, text: str) -> str:
         """
@@ -67,13 +113,13 @@ class RedditTextNormalizer:
             str: Text with Reddit formatting removed
         """
         # Remove subreddit references (e.g., /r/vegan)
-        text = re.sub(self.reddit_patterns['subreddit'], ' ', text)
+        text = self._compiled_patterns['subreddit'].sub(' ', text)
         # Remove user mentions (e.g., /u/username)
-        text = re.sub(self.reddit_patterns['user'], ' ', text)
+        text = self._compiled_patterns['user'].sub(' ', text)
         # Remove markdown links but keep the link text
-        text = re.sub(self.reddit_patterns['markdown_links'], r'\1', text)
+        text = self._compiled_patterns['markdown_links'].sub(r'\1', text)
         # Remove markdown formatting characters (*bold*, _italic_, etc.)
-        text = re.sub(self.reddit_patterns['markdown_formatting'], '', text)
+        text = self._compiled_patterns['markdown_formatting'].sub('', text)
         return text
 
     def remove_html(self, text: str) -> str:
@@ -92,7 +138,7 @@ class RedditTextNormalizer:
         # Remove HTML tags using BeautifulSoup
         text = BeautifulSoup(text, 'html.parser').get_text()
         # Remove HTML entities (e.g., &amp;, &lt;, etc.)
-        text = re.sub(self.reddit_patterns['html_entities'], ' ', text)
+        text = self._compiled_patterns['html_entities'].sub(' ', text)
         return text
 
     def remove_deleted(self, text: str) -> str:
@@ -132,11 +178,9 @@ class RedditTextNormalizer:
         Returns:
             str: Text with normalized whitespace
         """
-        # Replace newlines and tabs with spaces
-        text = re.sub(r'[\n\t\r]+', ' ', text)
-        # Remove multiple consecutive spaces
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        # Replace newlines, tabs and runs of spaces with a single space. A separate
+        # pass for newlines and tabs is not needed since they are whitespace too.
+        return _WHITESPACE.sub(' ', text).strip()
 
     def normalize_unicode(self, text: str) -> str:
         """
@@ -173,7 +217,84 @@ class RedditTextNormalizer:
             If input text is None or empty, returns an empty string.
             The normalization process is designed to preserve meaningful
             content while removing formatting that could interfere with
-            AI text analysis.
+            AI text analysis. Steps that cannot apply to a given text (HTML
+            parsing without markup, emoji and Unicode handling for pure
+            ASCII) are skipped, which makes plain posts several times faster
+            to normalize without changing the output.
+        """
+        if not text:
+            return ""
+
+        text = str(text)
+
+        # Same steps as _normalize_text_reference, fused into one function. Each
+        # step is skipped when a cheap substring test shows it cannot match, and
+        # the output is byte-identical to running the steps one after another.
+        patterns = self._compiled_patterns
+
+        # HTML: parsing is only needed when there is a tag or an entity
+        if '<' in text:
+            text = BeautifulSoup(text, 'html.parser').get_text()
+        elif '&' in text:
+            text = self._decode_entities(text)
+        if '&' in text:
+            text = patterns['html_entities'].sub(' ', text)
+
+        # URLs and Reddit formatting
+        if 'http' in text:
+            text = patterns['url'].sub(' ', text)
+        if '/r/' in text:
+            text = patterns['subreddit'].sub(' ', text)
+        if '/u/' in text:
+            text = patterns['user'].sub(' ', text)
+        if '](' in text:
+            text = patterns['markdown_links'].sub(r'\1', text)
+        text = patterns['markdown_formatting'].sub('', text)
+
+        # Emojis and accents only exist outside of ASCII
+        is_ascii = text.isascii()
+        if not is_ascii:
+            text = emoji.replace_emoji(text, '')
+
+        text = text.replace("[removed]", "").replace("[deleted]", "")
+
+        if not is_ascii:
+            text = unicode_normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+        return _WHITESPACE.sub(' ', text).strip().lower()
+
+    def _decode_entities(self, text: str) -> str:
+        """
+        Decode HTML entities in text that contains no tags.
+
+        The entities Reddit escapes (&amp;, &lt;, &gt; and &quot;) are decoded
+        directly. Any other use of '&' falls back to BeautifulSoup, whose
+        handling of unusual or malformed entities differs from html.unescape.
+
+        Args:
+            text (str): Input text without '<'
+
+        Returns:
+            str: The same text BeautifulSoup(text, 'html.parser').get_text() returns
+        """
+        decoded, count = _SIMPLE_ENTITIES.subn(lambda match: _SIMPLE_ENTITY_VALUES[match.group(1)], text)
+        if count == text.count('&'):
+            return decoded
+        return BeautifulSoup(text, 'html.parser').get_text()
+
+    def _normalize_text_reference(self, text: Optional[str]) -> str:
+        """
+        Normalize text by running each step one after another.
+
+        This is the straightforward version of normalize_text. It is kept as
+        the reference that the optimized normalize_text must match byte for
+        byte, and as a baseline for benchmarks.
+
+        Args:
+            text (Optional[str]): Input text to normalize
+
+        Returns:
+            str: Fully normalized text string
         """
         if not text:
             return ""
@@ -190,3 +311,49 @@ class RedditTextNormalizer:
         text = text.lower()
 
         return text
+
+    def normalize_iter(self, texts: Iterable[Optional[str]], processes: Optional[int] = 1,
+                       chunk_size: int = 1000) -> Iterator[str]:
+        """
+        Lazily normalize a stream of texts, optionally across several processes.
+
+        Results are yielded in input order as they become available. The input
+        is consumed incrementally and only a few chunks per process are in
+        flight at any time, so memory stays bounded even for million-post corpora.
+
+        Args:
+            texts (Iterable[Optional[str]]): Texts to normalize
+            processes (Optional[int]): Number of worker processes; 1 normalizes in
+                                       the current process, None uses every CPU (default: 1)
+            chunk_size (int): Number of texts sent to a worker at a time (default: 1000)
+
+        Returns:
+            generator: Yields the normalized form of each text
+        """
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        if processes <= 1:
+            for text in texts:
+                yield self.normalize_text(text)
+            return
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(self,)) as executor:
+            for normalized in bounded_map(executor, _normalize_chunk, chunked(texts, chunk_size), 2 * processes):
+                yield from normalized
+
+    def normalize_batch(self, texts: Iterable[Optional[str]], processes: Optional[int] = 1,
+                        chunk_size: int = 1000) -> list[str]:
+        """
+        Normalize a collection of texts, optionally across several processes.
+
+        Args:
+            texts (Iterable[Optional[str]]): Texts to normalize
+            processes (Optional[int]): Number of worker processes; 1 normalizes in
+                                       the current process, None uses every CPU (default: 1)
+            chunk_size (int): Number of texts sent to a worker at a time (default: 1000)
+
+        Returns:
+            list[str]: Normalized texts in input order
+        """
+        return list(self.normalize_iter(texts, processes, chunk_size))
@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fact_fetch.benchmarks.run import IMPORT_BUDGETS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that must only be imported by the commands that use them
+HEAVY_MODULES = ('sklearn', 'torch', 'sentence_transformers')
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'elapsed': elapsed, 'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def _import_in_fresh_interpreter(module: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+                               cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', ['fact_fetch.cli', 'fact_fetch.analysis.keyword_extraction'])
+def test_import_is_light(module):
+    # The fastest of a few runs, so that a busy machine does not fail the budget
+    results = [_import_in_fresh_interpreter(module) for _ in range(3)]
+
+    assert results[0]['loaded'] == []
+    assert min(result['elapsed'] for result in results) < IMPORT_BUDGETS[module]
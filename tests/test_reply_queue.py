@@ -0,0 +1,148 @@
+import types
+
+import pytest
+from praw.exceptions import RedditAPIException
+from prawcore.exceptions import TooManyRequests
+
+from fact_fetch.bot.reply_queue import FAILED, PENDING, POSTED, ReplyQueue, TokenBucket, parse_rate_limit_delay
+
+
+def _ratelimit(message):
+    return RedditAPIException([["RATELIMIT", message, "ratelimit"]])
+
+
+def _too_many_requests(headers):
+    return TooManyRequests(types.SimpleNamespace(headers=headers, status_code=429, text='', request=None))
+
+
+@pytest.mark.parametrize('message, expected', [
+    ("Take a break for 9 minutes before trying again.", 540),
+    ("You are doing that too much. Try again in 30 seconds.", 30),
+    ("Take a break for 1 minute and 30 seconds before trying again.", 90),
+    ("Try again in 1 hour, 2 minutes and 3 seconds.", 3723),
+    ("Try again in 500 milliseconds.", 0.5),
+    ("You are doing that too much.", 60),
+])
+def test_parse_rate_limit_delay_reads_ratelimit_items(message, expected):
+    assert parse_rate_limit_delay(_ratelimit(message)) == pytest.approx(expected)
+
+
+def test_parse_rate_limit_delay_waits_for_the_longest_item():
+    error = RedditAPIException([["RATELIMIT", "Try again in 2 minutes.", "ratelimit"],
+                                ["RATELIMIT", "Try again in 1 minute and 30 seconds.", "ratelimit"]])
+    assert parse_rate_limit_delay(error) == 120
+
+
+def test_parse_rate_limit_delay_reads_too_many_requests():
+    assert parse_rate_limit_delay(_too_many_requests({'retry-after': '42'})) == 42
+    # Without a retry-after header the default wait applies
+    assert parse_rate_limit_delay(_too_many_requests({})) == 60
+
+
+def test_parse_rate_limit_delay_ignores_other_errors():
+    assert parse_rate_limit_delay(RedditAPIException([["THREAD_LOCKED", "Thread is locked", None]])) is None
+    assert parse_rate_limit_delay(RuntimeError("connection reset")) is None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_allows_a_burst_then_spaces_tokens():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, capacity=2, clock=clock)
+
+    assert bucket.take() and bucket.take()
+    assert not bucket.take()
+    assert bucket.delay() == pytest.approx(2.0)
+
+    clock.now += 2.0
+    assert bucket.take()
+    clock.now += 100.0
+    # Refilling stops at the capacity
+    assert bucket.take() and bucket.take()
+    assert not bucket.take()
+
+
+def test_token_bucket_pause_empties_the_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=clock)
+
+    bucket.pause(60)
+    assert bucket.delay() == pytest.approx(61.0)
+    clock.now += 30
+    assert not bucket.take()
+    # No tokens accrue during the pause
+    clock.now += 30
+    assert bucket.delay() == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.take()
+
+
+class InterruptingBot:
+    """
+    Bot whose process dies while posting, leaving the reply in the POSTING state.
+    """
+
+    def submit_response(self, submission_id, response):
+        raise KeyboardInterrupt
+
+
+class RecordingBot:
+    def __init__(self, error=None):
+        self.error = error
+        self.posted = []
+
+    def submit_response(self, submission_id, response):
+        if self.error is not None:
+            raise self.error
+        self.posted.append(submission_id)
+        return types.SimpleNamespace(id='reply_' + submission_id)
+
+
+def test_reply_interrupted_while_posting_is_not_retried(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    queue = ReplyQueue(InterruptingBot(), path, replies_per_minute=60)
+    queue.enqueue('abc', "counterargument")
+    with pytest.raises(KeyboardInterrupt):
+        queue.process_once()
+    queue.close()
+
+    bot = RecordingBot()
+    reopened = ReplyQueue(bot, path, replies_per_minute=60)
+    assert reopened.get('abc').status == FAILED
+    assert reopened.process_once() is None
+    assert bot.posted == []
+    reopened.close()
+
+
+def test_pending_reply_survives_a_restart_and_is_posted(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    queue = ReplyQueue(RecordingBot(), path)
+    queue.enqueue('abc', "counterargument")
+    queue.close()
+
+    posted = []
+    bot = RecordingBot()
+    reopened = ReplyQueue(bot, path, on_posted=lambda submission_id, reply: posted.append(reply.id))
+    assert reopened.process_once() == 0.0
+    assert reopened.get('abc').status == POSTED
+    assert bot.posted == ['abc'] and posted == ['reply_abc']
+    reopened.close()
+
+
+def test_rate_limited_reply_is_rescheduled(tmp_path):
+    queue = ReplyQueue(RecordingBot(_ratelimit("Try again in 1 minute and 30 seconds.")),
+                       str(tmp_path / 'queue.sqlite3'))
+    queue.enqueue('abc', "counterargument")
+    queue.process_once()
+
+    queued = queue.get('abc')
+    assert queued.status == PENDING
+    assert queued.attempts == 0
+    assert queue.bucket.delay() > 80
+    queue.close()
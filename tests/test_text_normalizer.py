@@ -0,0 +1,35 @@
+import json
+import os
+
+import pytest
+
+from fact_fetch.benchmarks.synthetic import generate_posts
+from fact_fetch.utils.text_normalizer import RedditTextNormalizer
+
+# Inputs covering markup, entities, URLs, emoji and NFKD cases, with the output of the step-by-step reference
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'resources', 'normalizer_golden.json')
+
+with open(GOLDEN_PATH, 'r', encoding='utf-8') as file:
+    GOLDEN_CASES = json.load(file)
+
+
+@pytest.fixture(scope='module')
+def normalizer():
+    return RedditTextNormalizer()
+
+
+@pytest.mark.parametrize('case', GOLDEN_CASES, ids=lambda case: case['input'][:30])
+def test_normalize_text_matches_golden_output(normalizer, case):
+    assert normalizer._normalize_text_reference(case['input']) == case['expected']
+    assert normalizer.normalize_text(case['input']) == case['expected']
+
+
+def test_normalize_text_matches_reference_on_synthetic_posts(normalizer):
+    # Small giant posts keep the run short while still covering them
+    for text in generate_posts(500, seed=0, giant_every=100, giant_paragraphs=20):
+        assert normalizer.normalize_text(text) == normalizer._normalize_text_reference(text)
+
+
+def test_normalize_text_handles_empty_input(normalizer):
+    assert normalizer.normalize_text(None) == ""
+    assert normalizer.normalize_text("") == ""